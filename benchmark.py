@@ -0,0 +1,224 @@
+"""End-to-end benchmark of bot.py against local fake Mailgun, Bybit and Telegram servers.
+
+Starts the fakes from fake_servers.py, runs real Traderbot instances in Real
+mode against them and publishes Buy/Sell alerts in rounds. Measures the time
+from an alert being stored at Mailgun to its order reaching the exchange, API
+calls per bot per minute, and CPU / RSS of the process. Results are written as
+JSON; ``--compare`` checks them against an earlier run.
+
+    python benchmark.py --bots 20 --rounds 6 --output run.json
+    python benchmark.py --bots 20 --rounds 6 --compare baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from fake_servers import FakeBybit, FakeMailgun, FakeTelegram
+
+# Lower is better for every compared metric
+COMPARED_METRICS = [
+    ("signal_to_order_ms", "p50"),
+    ("signal_to_order_ms", "p95"),
+    ("signal_to_order_ms", "p99"),
+    ("api_calls_per_bot_per_minute", "total"),
+    ("process", "cpu_percent"),
+    ("process", "max_rss_mb"),
+]
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None}
+    pick = lambda q: round(values[int(q * (len(values) - 1))], 3)
+    return {"count": len(values), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(values[-1], 3)}
+
+
+def current_rss_mb():
+    """Resident set size from /proc, falling back to the peak where /proc is missing"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return max_rss_mb()
+
+
+def max_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def configure_bot(bot, mailgun, bybit, telegram, workdir, poll_interval):
+    """Point the bot module at the fake servers and keep its state files out of the tree"""
+    bot.MAILGUN_API_BASE = mailgun.api_base
+    bot.TELEGRAM_API_BASE = telegram.base_url
+    bot.BYBIT_ENDPOINT = bybit.base_url
+    bot.domain_name = mailgun.domain
+    bot.API_KEY = "benchmark"
+    bot.BB_API_KEY = "benchmark"
+    bot.BB_SECRET_KEY = "benchmark"
+    bot.signal_index_path = os.path.join(workdir, "processed_signals.db")
+    bot.signal_tracer.enabled = True
+    bot.signal_tracer.path = None
+    bot.get_event_poller(mailgun.domain).interval = poll_interval
+
+
+def wait_for(condition, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def run_benchmark(args):
+    mailgun = FakeMailgun("bench.example.com", latency=args.latency_ms / 1000, error_rate=args.error_rate).start()
+    bybit = FakeBybit(latency=args.latency_ms / 1000, error_rate=args.error_rate).start()
+    telegram = FakeTelegram(latency=args.latency_ms / 1000).start()
+    workdir = tempfile.mkdtemp(prefix="bot-benchmark-")
+
+    import bot
+    configure_bot(bot, mailgun, bybit, telegram, workdir, args.poll_interval)
+    bot.instrument_cache.refresh()  # the Telegram app warms this in on_startup
+
+    bots = [bot.Traderbot(id_t=f"bench{i}", symbol=args.symbol, amount=args.amount, mode="Real",
+                          listener_email=f"bench{i}") for i in range(args.bots)]
+    cpu_started, wall_started = cpu_seconds(), time.time()
+    threads_peak, rss_peak = threading.active_count(), current_rss_mb()
+    for trader in bots:
+        trader.start()
+    wait_for(lambda: all(trader._signal_queue is not None for trader in bots), 10)
+
+    latencies = []
+    missed = 0
+    for round_number in range(args.rounds):
+        command = "Buy" if round_number % 2 == 0 else "Sell"
+        orders_before = len(bybit.order_times())
+        published_at = time.time()
+        for i in range(args.bots):
+            mailgun.publish(f"bench{i}", f"TradingView alert: {command} {args.symbol}")
+        expected = orders_before + args.bots
+        wait_for(lambda: len(bybit.order_times()) >= expected, args.round_timeout)
+        arrived = bybit.order_times()[orders_before:expected]
+        latencies.extend((t - published_at) * 1000 for t in arrived)
+        missed += args.bots - len(arrived)
+        threads_peak = max(threads_peak, threading.active_count())
+        rss_peak = max(rss_peak, current_rss_mb())
+        time.sleep(max(0.0, args.round_interval - (time.time() - published_at)))
+
+    elapsed = time.time() - wall_started
+    cpu_used = cpu_seconds() - cpu_started
+    minutes = elapsed / 60
+    calls = {"mailgun": mailgun.call_counts(), "bybit": bybit.call_counts(), "telegram": telegram.call_counts()}
+    per_bot_minute = {api: round(sum(routes.values()) / args.bots / minutes, 2) for api, routes in calls.items()}
+    per_bot_minute["total"] = round(sum(per_bot_minute.values()), 2)
+
+    for trader in bots:
+        trader.stop()
+    for server in (mailgun, bybit, telegram):
+        server.stop()
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": vars(args),
+        },
+        "signal_to_order_ms": percentiles(latencies),
+        "missed_orders": missed,
+        "api_calls_per_bot_per_minute": per_bot_minute,
+        "calls_by_route": calls,
+        "stages_ms": bot.signal_tracer.percentiles(len(latencies) or 1),
+        "process": {
+            "duration_s": round(elapsed, 2),
+            "cpu_seconds": round(cpu_used, 3),
+            "cpu_percent": round(100 * cpu_used / elapsed, 1),
+            "max_rss_mb": round(max(rss_peak, current_rss_mb()), 1),
+            "peak_threads": threads_peak,
+        },
+    }
+
+
+def compare(result, baseline, tolerance):
+    """Return ``(metric, baseline, current, change)`` rows and whether any regressed past ``tolerance``"""
+    rows, regressed = [], False
+    for section, key in COMPARED_METRICS:
+        old = baseline.get(section, {}).get(key)
+        new = result.get(section, {}).get(key)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old if old else 0.0
+        rows.append((f"{section}.{key}", old, new, change))
+        regressed = regressed or change > tolerance
+    if result.get("missed_orders", 0) > baseline.get("missed_orders", 0):
+        rows.append(("missed_orders", baseline.get("missed_orders", 0), result["missed_orders"], None))
+        regressed = True
+    return rows, regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bots", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=6, help="alert rounds, alternating Buy and Sell")
+    parser.add_argument("--round-interval", type=float, default=3.0, help="seconds between alert rounds")
+    parser.add_argument("--round-timeout", type=float, default=30.0)
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Mailgun events poll interval")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="added latency of every fake API call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of Mailgun/Bybit calls failing with 503")
+    parser.add_argument("--symbol", default="BTCUSDT")
+    parser.add_argument("--amount", type=float, default=0.001)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown before failing")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    latency = result["signal_to_order_ms"]
+    print(f"signal -> order: p50 {latency['p50']} ms  p95 {latency['p95']} ms  p99 {latency['p99']} ms  "
+          f"({latency['count']} orders, {result['missed_orders']} missed)")
+    print(f"API calls per bot per minute: {result['api_calls_per_bot_per_minute']}")
+    print(f"process: {result['process']}")
+    print(f"results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows, regressed = compare(result, baseline, args.tolerance)
+        for metric, old, new, change in rows:
+            change_str = f"{change:+.1%}" if change is not None else ""
+            print(f"{metric:<40} {old:>12} -> {new:<12} {change_str}")
+        if regressed:
+            print(f"REGRESSION: a metric got worse by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,14 +5,32 @@ import re
 import os 
 import sys
 import asyncio
+import logging
+import bisect
+import mmap
+import itertools
+import hmac
+import hashlib
+import json
+import sqlite3
+import queue
+import multiprocessing
+from collections import deque, OrderedDict
+from email.parser import BytesParser
+from email.policy import default as default_email_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from requests.adapters import HTTPAdapter
+import numpy as np
 from pybit import exceptions
 from pybit.unified_trading import HTTP
 from math import floor
+from decimal import Decimal
 from datetime import datetime , timedelta
 from telegram import Update , InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes , ConversationHandler, CallbackContext,CallbackQueryHandler
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from functools import wraps
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from functools import partial
 
 # Define a common interface for trading
 class Trader:
@@ -76,59 +94,126 @@ class OrderExecutor:
         self.symbol = symbol
         self.amount = amount
         self.simulation_flag = simulation_flag
+        self._sell_quantity = None  # exchange-ready sell size, taken from the last buy's fill
+        self._generation = 0  # bumped by every order, so a late fill or prepare_sell cannot store a stale size
+        self._lock = threading.Lock()
         
     def execute_order(self, command, last_price=None):
-        if command == "Buy":
-            side = command
+        """Place a market order; returns ``(success, message, fill)``"""
+        if command not in ("Buy", "Sell"):
+            return None, "Invalid command", None
+        side = command
+        with self._lock:
+            # Taking the prepared size and bumping the generation together keeps a late store out
+            self._generation += 1
+            generation = self._generation
+            prepared, self._sell_quantity = self._sell_quantity, None
+        if self.simulation_flag == 1:
             quantity = float(self.amount)
-            return self._place_order(side, quantity, last_price)
-        elif command == "Sell":
-            side = command
-            if self.simulation_flag == 0:  
-                pair = self.symbol
-                baseCoin = pair[:pair.index('USDT')] 
-                prec = self.client.get_coin_info(coin=baseCoin)['result']['rows'][0]['chains'][0]['minAccuracy']
-                quantity = self._get_assets(baseCoin)
-                quantity = self._truncate_float(quantity, int(prec)) 
-            else:
-                quantity = float(self.amount)
-            return self._place_order(side, quantity, last_price)
+        elif side == "Buy":
+            quantity = self._quantize(float(self.amount))
         else:
-            return None, "Invalid command"
+            quantity = prepared if prepared is not None else self._get_sell_quantity()
+        if quantity is None:
+            return False, f"{side} quantity is below the minimum order size of {self.symbol}", None
+        success, message, fill = self._place_order(side, quantity, last_price)
+        if fill is not None:
+            fill.update(side=side, generation=generation)
+        return success, message, fill
+
+    def _quantize(self, quantity):
+        return instrument_cache.quantize_qty(self.symbol, quantity, price_hub.get_price(self.symbol, max_age=60))
+
+    def _get_sell_quantity(self):
+        pair = self.symbol
+        baseCoin = pair[:pair.index('USDT')] 
+        return self._quantize(self._get_assets(baseCoin))
+
+    def _store_sell_quantity(self, quantity, generation):
+        with self._lock:
+            # Another order went out since, its own fill decides the next sell size
+            if generation == self._generation:
+                self._sell_quantity = quantity
+
+    def prepare_sell(self):
+        """Precompute the sell size of a position held before this bot was armed"""
+        if self.simulation_flag == 0:
+            with self._lock:
+                generation = self._generation
+            self._store_sell_quantity(self._get_sell_quantity(), generation)
+
+    def prepare_sell_in_background(self):
+        if self.simulation_flag == 0:
+            bot_runtime.submit_blocking(self._safe_prepare_sell)
+
+    def _safe_prepare_sell(self):
+        try:
+            self.prepare_sell()
+        except Exception as e:
+            log_event('error', f"Error preparing sell quantity for {self.symbol}: {e}")
     
     def _place_order(self, side, quantity, last_price):
         try:
             if self.simulation_flag == 0:
-                r = self.client.place_order(
-                    category="spot",
-                    symbol=f"{self.symbol}",
-                    side=side,
-                    orderType="Market",
-                    qty=quantity,
-                    marketUnit="baseCoin",
-                )
-                return True, r['retMsg']
+                with signal_tracer.span('place_order'):
+                    r = self.client.place_order(
+                        category="spot",
+                        symbol=f"{self.symbol}",
+                        side=side,
+                        orderType="Market",
+                        qty=quantity,
+                        marketUnit="baseCoin",
+                    )
+                get_wallet_snapshot(self.client).invalidate()
+                return True, r['retMsg'], {'order_id': r['result']['orderId'], 'qty': quantity}
             
-            current_utc_time = datetime.utcnow()
-            gmt_plus_7_time = current_utc_time + timedelta(hours=7)
-            timestamp_of_order = gmt_plus_7_time.strftime("%Y-%m-%d %H:%M:%S")
-            return True, "Simulation order placed"
+            return True, "Simulation order placed", {'order_id': None, 'qty': quantity}
             
         except Exception as e:
-            return False, str(e)
+            return False, str(e), None
+
+    def get_fill_price(self, fill):
+        """Price an order is booked at until the exchange reports its average fill price.
+
+        Read from the price hub's current snapshot; the order path never waits
+        for a ticker download.
+        """
+        return price_hub.get_price(self.symbol)
+
+    def resolve_fill_in_background(self, fill, on_fill):
+        """Read a placed order back from the exchange off the hot path and call ``on_fill(avg_price)``.
+
+        ``on_fill(None)`` is called when the average price cannot be read.
+        """
+        if fill.get('order_id') is not None:
+            bot_runtime.spawn(self._resolve_fill(fill, on_fill))
+
+    async def _resolve_fill(self, fill, on_fill, attempts=5, delay=0.2):
+        try:
+            bucket = rate_limiter_for("/v5/order/history")
+            for _ in range(attempts):
+                await bucket.acquire_async()
+                order = await bot_runtime.run_blocking(run_with_tokens, [bucket], self._get_order, fill['order_id'])
+                if order is not None and float(order.get('avgPrice') or 0) > 0:
+                    if fill['side'] == "Buy":
+                        # Spot buy fees are charged in the base coin, what is left is what we can sell
+                        executed = Decimal(order.get('cumExecQty') or fill['qty']) - Decimal(order.get('cumExecFee') or 0)
+                        quantity = await bot_runtime.run_blocking(self._quantize, executed)
+                        self._store_sell_quantity(quantity, fill['generation'])
+                    on_fill(float(order['avgPrice']))
+                    return
+                await asyncio.sleep(delay)
+            log_event('error', f"No fill price for order {fill['order_id']}, keeping last traded price")
+        except Exception as e:
+            log_event('error', f"Error reading fill of order {fill['order_id']}: {e}")
+        on_fill(None)
+
+    def _get_order(self, order_id):
+        orders = self.client.get_order_history(category="spot", orderId=order_id)['result']['list']
+        return orders[0] if orders else None
     
     def _get_assets(self, coin):
         return get_assets(self.client, coin)
-    
-    def _truncate_float(self, value, precision):
-        if precision > 4:
-            precision = precision - 2
-        str_value = f"{value:.{precision + 2}f}"
-        if '.' in str_value:
-            integer_part, decimal_part = str_value.split('.')
-            truncated_decimal = decimal_part[:precision]
-            return f"{integer_part}.{truncated_decimal}" if truncated_decimal else integer_part
-        return str_value
 
 class MarketMonitor:
     def __init__(self, client, symbol):
@@ -136,57 +221,521 @@ class MarketMonitor:
         self.symbol = symbol
         
     def get_current_price(self):
-        response = self.client.get_tickers(category="spot", symbol=self.symbol)
-        return float(response['result']['list'][0]['lastPrice'])
+        return price_hub.get_price(self.symbol)
         
-    def check_stop_loss(self, last_price, current_price, stop_loss_percent):
+    def stop_loss_price(self, last_price, stop_loss_percent):
         if stop_loss_percent == 0:
+            return None
+        return last_price * (1 - (stop_loss_percent / 100))
+
+    def take_profit_price(self, last_price, take_profit_percent):
+        if take_profit_percent == 0:
+            return None
+        return last_price * (1 + (take_profit_percent / 100))
+
+    def check_stop_loss(self, last_price, current_price, stop_loss_percent):
+        stop_loss_price = self.stop_loss_price(last_price, stop_loss_percent)
+        if stop_loss_price is None:
             return False
-        stop_loss_price = last_price * (1 - (stop_loss_percent / 100))
         return current_price <= stop_loss_price
         
     def check_take_profit(self, last_price, current_price, take_profit_percent):
-        if take_profit_percent == 0:
+        take_profit_price = self.take_profit_price(last_price, take_profit_percent)
+        if take_profit_price is None:
             return False
-        take_profit_price = last_price * (1 + (take_profit_percent / 100))
         return current_price >= take_profit_price
 
+def interval_to_ms(interval):
+    """Length of a kline interval ("1", "15", "D", "W" or "1h" style) in ms, None if it varies"""
+    interval = str(interval)
+    if interval.isdigit():
+        return int(interval) * 60000
+    fixed = {"D": 86400000, "W": 604800000}
+    if interval in fixed:
+        return fixed[interval]
+    match = re.fullmatch(r'(\d+)([mhdw])', interval)
+    if match is None:
+        return None
+    return int(match.group(1)) * {"m": 60000, "h": 3600000, "d": 86400000, "w": 604800000}[match.group(2)]
+
+class KlineStore:
+    """Local kline history of one symbol/interval in memory-mapped column files.
+
+    Every column is a file of float64 values, oldest candle first, so any
+    range (e.g. the last N candles) is a zero-copy memoryview slice that
+    ``numpy.frombuffer`` turns into an array without copying. ``sync`` only
+    downloads candles newer than the last stored one, so a restart never
+    fetches history twice.
+    """
+    columns = ("time", "open", "high", "low", "close", "volume", "turnover")
+    page_limit = 1000
+
+    def __init__(self, directory, symbol, interval, capacity=4096):
+        self.symbol = symbol
+        self.interval = str(interval)
+        self.interval_ms = interval_to_ms(interval)
+        os.makedirs(directory, exist_ok=True)
+        self._prefix = os.path.join(directory, f"{symbol}_{self.interval}")
+        self._lock = threading.RLock()
+        self._files = {}
+        self._maps = {}
+        self._views = {}
+        self._retired = []  # old maps that slices handed out may still point into
+        self._capacity = 0
+        self._count = self._load_count()
+        for column in self.columns:
+            self._files[column] = open(f"{self._prefix}.{column}.f64", "a+b")
+        self._resize(max(capacity, self._count))
+
+    def _load_count(self):
+        try:
+            with open(f"{self._prefix}.json", encoding="utf-8") as f:
+                return int(json.load(f)["count"])
+        except (OSError, KeyError, ValueError):
+            return 0
+
+    def _save_count(self):
+        tmp_path = f"{self._prefix}.json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"count": self._count}, f)
+        os.replace(tmp_path, f"{self._prefix}.json")
+
+    def _resize(self, capacity):
+        for column, f in self._files.items():
+            capacity = max(capacity, os.fstat(f.fileno()).st_size // 8)
+        for column, f in self._files.items():
+            f.truncate(capacity * 8)
+            old = self._maps.get(column)
+            self._maps[column] = mmap.mmap(f.fileno(), capacity * 8)
+            self._views[column] = memoryview(self._maps[column]).cast('d')
+            if old is not None:
+                self._retired.append(old)
+        self._capacity = capacity
+
+    def __len__(self):
+        return self._count
+
+    def append(self, rows):
+        """Store candles given oldest first; one with the last stored start time replaces it"""
+        with self._lock:
+            count = self._count
+            for row in rows:
+                start = float(row[0])
+                last = self._views['time'][count - 1] if count else None
+                if last is not None and start < last:
+                    continue
+                index = count - 1 if start == last else count
+                if index == self._capacity:
+                    self._resize(self._capacity * 2)
+                for column, value in zip(self.columns, row):
+                    self._views[column][index] = float(value)
+                count = max(count, index + 1)
+            self._count = count
+            self._save_count()
+
+    def sync(self, client, since=None):
+        """Download the candles after the last stored one (or from ``since`` ms) up to now"""
+        with self._lock:
+            if self.interval_ms is None:
+                rows = client.get_kline(category="spot", symbol=self.symbol, interval=self.interval,
+                                        limit=self.page_limit)['result']['list']
+                self.append(reversed(rows))
+                return
+            now = int(time.time() * 1000)
+            if self._count:
+                # from the last stored candle, it may still have been open
+                cursor = int(self._views['time'][self._count - 1])
+            elif since is not None:
+                cursor = int(since)
+            else:
+                cursor = (now // self.interval_ms - self.page_limit + 1) * self.interval_ms
+            while cursor <= now:
+                end = cursor + (self.page_limit - 1) * self.interval_ms
+                rows = client.get_kline(category="spot", symbol=self.symbol, interval=self.interval,
+                                        start=cursor, end=end, limit=self.page_limit)['result']['list']
+                self.append(reversed(rows))  # newest first from Bybit
+                cursor = end + self.interval_ms
+
+    def column(self, name, start=0, stop=None):
+        """Zero-copy view of a column"""
+        with self._lock:
+            stop = self._count if stop is None else min(stop, self._count)
+            return self._views[name][start:stop]
+
+    def tail(self, n):
+        """Zero-copy views of every column for the last ``n`` candles"""
+        with self._lock:
+            start = max(0, self._count - n)
+            return {column: self.column(column, start) for column in self.columns}
+
+    def index_of(self, timestamp):
+        """Position of the first candle starting at or after ``timestamp``"""
+        return bisect.bisect_left(self.column("time"), timestamp)
+
+    def between(self, start_ms=None, end_ms=None):
+        """Zero-copy views of every column for candles starting in ``[start_ms, end_ms]``"""
+        with self._lock:
+            start = 0 if start_ms is None else self.index_of(start_ms)
+            stop = self._count if end_ms is None else bisect.bisect_right(self.column("time"), end_ms)
+            return {column: self.column(column, start, stop) for column in self.columns}
+
+    def rows(self, start=0):
+        """``(time, open, high, low, close, volume, turnover)`` tuples from position ``start``"""
+        with self._lock:
+            return list(zip(*(self.column(column, start) for column in self.columns)))
+
+_kline_stores = {}
+_kline_stores_lock = threading.Lock()
+
+def get_kline_store(symbol, interval):
+    """Return the shared kline store of a symbol/interval under ``kline_store_dir``"""
+    key = (symbol, str(interval))
+    with _kline_stores_lock:
+        store = _kline_stores.get(key)
+        if store is None:
+            store = _kline_stores[key] = KlineStore(kline_store_dir, symbol, interval)
+        return store
+
+class RollingMean:
+    """Simple moving average of the last ``period`` values.
+
+    The window is summed newest first when read, in the order a fresh
+    ``sum(closes) / len(closes)`` over Bybit klines adds them, so the result
+    is bit-for-bit the batch one. A running sum would drift from it in the
+    last bits. Every ``value`` method takes an optional ``pending`` value
+    standing in for the still open candle.
+    """
+    def __init__(self, period):
+        self.period = period
+        self._values = deque(maxlen=period)
+
+    def __len__(self):
+        return len(self._values)
+
+    def push(self, value):
+        self._values.append(value)
+
+    def value(self, pending=None):
+        values = self._values
+        if pending is not None:
+            skip = 1 if len(values) == self.period else 0
+            window = [pending] + [values[i] for i in range(len(values) - 1, skip - 1, -1)]
+        else:
+            window = list(reversed(values))
+        return sum(window) / len(window) if window else None
+
+    def head_mean(self, size, pending=None):
+        """Mean of the ``size`` oldest values of the window"""
+        values = self._values
+        skip = 1 if pending is not None and len(values) == self.period else 0
+        head = [values[i] for i in range(skip, min(skip + size, len(values)))]
+        if len(head) < size and pending is not None:
+            head.append(pending)
+        # newest first, the order Bybit lists klines in
+        return sum(reversed(head)) / len(head) if head else None
+
+def _seed_mean(values, pending=None):
+    """Mean of the first values of a smoothed average, summed oldest first like the batch seed"""
+    values = values + [pending] if pending is not None else values
+    return sum(values) / len(values) if values else None
+
+class ExponentialMean:
+    """EMA with ``alpha = 2 / (period + 1)``, seeded with the SMA of the first ``period`` values"""
+    def __init__(self, period):
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self._seed = []
+        self._ema = None
+
+    def push(self, value):
+        if self._ema is not None:
+            self._ema = self.alpha * value + (1 - self.alpha) * self._ema
+            return
+        self._seed.append(value)
+        if len(self._seed) == self.period:
+            self._ema = _seed_mean(self._seed)
+
+    def value(self, pending=None):
+        if self._ema is None:
+            return _seed_mean(self._seed, pending)
+        if pending is None:
+            return self._ema
+        return self.alpha * pending + (1 - self.alpha) * self._ema
+
+class WilderAverage:
+    """Wilder smoothing: the first value is the SMA of ``period`` inputs, then ``(prev * (period - 1) + x) / period``"""
+    def __init__(self, period):
+        self.period = period
+        self._seed = []
+        self._average = None
+
+    def push(self, value):
+        if self._average is not None:
+            self._average = (self._average * (self.period - 1) + value) / self.period
+            return
+        self._seed.append(value)
+        if len(self._seed) == self.period:
+            self._average = _seed_mean(self._seed)
+
+    def value(self, pending=None):
+        if self._average is None:
+            if pending is not None and len(self._seed) == self.period - 1:
+                return _seed_mean(self._seed, pending)
+            return None
+        if pending is None:
+            return self._average
+        return (self._average * (self.period - 1) + pending) / self.period
+
+class RelativeStrength:
+    """Wilder's RSI over closes"""
+    def __init__(self, period=14):
+        self._gains = WilderAverage(period)
+        self._losses = WilderAverage(period)
+        self._last_close = None
+
+    def push(self, close):
+        if self._last_close is not None:
+            change = close - self._last_close
+            self._gains.push(max(change, 0.0))
+            self._losses.push(max(-change, 0.0))
+        self._last_close = close
+
+    def value(self, pending=None):
+        if pending is None or self._last_close is None:
+            gain, loss = self._gains.value(), self._losses.value()
+        else:
+            change = pending - self._last_close
+            gain, loss = self._gains.value(max(change, 0.0)), self._losses.value(max(-change, 0.0))
+        if gain is None:
+            return None
+        if loss == 0:
+            return 100.0
+        return 100 - 100 / (1 + gain / loss)
+
+class AverageTrueRange:
+    """Wilder's ATR over ``(high, low, close)`` candles"""
+    def __init__(self, period=14):
+        self._ranges = WilderAverage(period)
+        self._last_close = None
+
+    def _true_range(self, high, low):
+        if self._last_close is None:
+            return high - low
+        return max(high - low, abs(high - self._last_close), abs(low - self._last_close))
+
+    def push(self, high, low, close):
+        self._ranges.push(self._true_range(high, low))
+        self._last_close = close
+
+    def value(self, pending=None):
+        if pending is None:
+            return self._ranges.value()
+        high, low, close = pending
+        return self._ranges.value(self._true_range(high, low))
+
+class RollingExtreme:
+    """Rolling max (``largest=True``) or min of the last ``period`` values, O(1) amortized per value.
+
+    A monotonic deque keeps only values that can still become the extreme, so
+    its front is the extreme of the window and the next entry is the extreme
+    of the window without its oldest value.
+    """
+    def __init__(self, period, largest=True):
+        self.period = period
+        self.largest = largest
+        self._entries = deque()  # (index, value)
+        self._count = 0
+
+    def _beats(self, a, b):
+        return a >= b if self.largest else a <= b
+
+    def push(self, value):
+        entries = self._entries
+        while entries and self._beats(value, entries[-1][1]):
+            entries.pop()
+        entries.append((self._count, value))
+        self._count += 1
+        if entries[0][0] < self._count - self.period:
+            entries.popleft()
+
+    def value(self, pending=None):
+        entries = self._entries
+        if pending is not None and entries and entries[0][0] == self._count - self.period:
+            best = entries[1][1] if len(entries) > 1 else None
+        else:
+            best = entries[0][1] if entries else None
+        if pending is None or (best is not None and self._beats(best, pending)):
+            return best
+        return pending
+
+class KlineIndicators:
+    """Incremental indicators over one symbol/interval kline stream.
+
+    Candles are fed oldest first. The newest one stays pending, like the still
+    open candle Bybit returns, and is folded in once a newer candle starts, so
+    every update is O(1) and values always cover the same candles as a fresh
+    ``get_kline(limit=period)``.
+    """
+    def __init__(self, period):
+        self.period = period
+        self.closes = RollingMean(period)
+        self.ema = ExponentialMean(period)
+        self.rsi = RelativeStrength(period)
+        self.atr = AverageTrueRange(period)
+        self.highs = RollingExtreme(period, largest=True)
+        self.lows = RollingExtreme(period, largest=False)
+        self.pending = None  # [start, open, high, low, close]
+        self._lock = threading.Lock()
+
+    def update(self, start, open_price, high, low, close):
+        with self._lock:
+            if self.pending is not None:
+                if start < self.pending[0]:
+                    return
+                if start > self.pending[0]:
+                    self._commit(self.pending)
+            self.pending = [start, open_price, high, low, close]
+
+    def update_rows(self, rows):
+        """Feed Bybit ``get_kline`` rows (newest first)"""
+        for row in reversed(rows):
+            self.update(int(row[0]), float(row[1]), float(row[2]), float(row[3]), float(row[4]))
+
+    def on_price(self, price):
+        """Move the pending candle with a ticker price, no kline call needed"""
+        with self._lock:
+            if self.pending is not None:
+                self.pending[2] = max(self.pending[2], price)
+                self.pending[3] = min(self.pending[3], price)
+                self.pending[4] = price
+
+    def _commit(self, candle):
+        _, _, high, low, close = candle
+        self.closes.push(close)
+        self.ema.push(close)
+        self.rsi.push(close)
+        self.atr.push(high, low, close)
+        self.highs.push(high)
+        self.lows.push(low)
+
+    def snapshot(self):
+        with self._lock:
+            if self.pending is None:
+                return None
+            _, _, high, low, close = self.pending
+            return {
+                'sma': self.closes.value(close),
+                'head_sma': self.closes.head_mean(5, close),
+                'ema': self.ema.value(close),
+                'rsi': self.rsi.value(close),
+                'atr': self.atr.value((high, low, close)),
+                'high': self.highs.value(high),
+                'low': self.lows.value(low),
+            }
+
+class IndicatorEngine:
+    """KlineIndicators per (symbol, interval, period), kept up to date by price hub ticks"""
+    def __init__(self):
+        self._indicators = {}
+        self._lock = threading.Lock()
+
+    def get(self, symbol, interval, period):
+        key = (symbol, str(interval), period)
+        with self._lock:
+            indicators = self._indicators.get(key)
+            if indicators is None:
+                indicators = self._indicators[key] = KlineIndicators(period)
+            return indicators
+
+    def reset(self, symbol, interval, period):
+        with self._lock:
+            indicators = self._indicators[(symbol, str(interval), period)] = KlineIndicators(period)
+            return indicators
+
+    def on_prices(self, tickers):
+        with self._lock:
+            items = list(self._indicators.items())
+        for (symbol, _, _), indicators in items:
+            ticker = tickers.get(symbol)
+            if ticker is not None:
+                indicators.on_price(float(ticker['lastPrice']))
+
+indicator_engine = IndicatorEngine()
+
+def trend_summary(values):
+    """Trend direction and strength from a KlineIndicators snapshot"""
+    # Bybit lists klines newest first, so the short MA has always been
+    # the mean of the five oldest candles of the window
+    short_ma = values['head_sma']
+    long_ma = values['sma']
+    
+    # Determine trend direction and strength
+    trend = 'bullish' if short_ma > long_ma else 'bearish'
+    strength = abs((short_ma / long_ma - 1) * 100)
+    
+    return {
+        'trend': trend,
+        'strength': strength,
+        'short_ma': short_ma,
+        'long_ma': long_ma,
+        'ema': values['ema'],
+        'rsi': values['rsi'],
+        'atr': values['atr'],
+    }
+
 class MarketAnalyzer:
     def __init__(self, client, symbol):
         self.client = client
         self.symbol = symbol
+
+    def _indicators(self, timeframe, lookback_periods):
+        """Indicators of the last ``lookback_periods`` klines, fetching only candles not seen yet"""
+        if kline_store_dir:
+            return self._indicators_from_store(timeframe, lookback_periods)
+        indicators = indicator_engine.get(self.symbol, timeframe, lookback_periods)
+        interval_ms = interval_to_ms(timeframe)
+        limit = lookback_periods
+        if indicators.pending is not None and interval_ms:
+            missed = int(time.time() * 1000 - indicators.pending[0]) // interval_ms
+            if missed < lookback_periods:
+                limit = missed + 1
+        if limit == lookback_periods and indicators.pending is not None:
+            # Too far behind to catch up candle by candle, start over
+            indicators = indicator_engine.reset(self.symbol, timeframe, lookback_periods)
+        kline_data = self.client.get_kline(
+            category="spot",
+            symbol=self.symbol,
+            interval=timeframe,
+            limit=limit
+        )
+        if 'result' not in kline_data or 'list' not in kline_data['result']:
+            return None
+        indicators.update_rows(kline_data['result']['list'])
+        return indicators.snapshot()
+
+    def _indicators_from_store(self, timeframe, lookback_periods):
+        store = get_kline_store(self.symbol, timeframe)
+        store.sync(self.client)
+        indicators = indicator_engine.get(self.symbol, timeframe, lookback_periods)
+        start = max(0, len(store) - lookback_periods)
+        if indicators.pending is not None:
+            resume = store.index_of(indicators.pending[0])
+            if resume > start:
+                start = resume
+            else:
+                indicators = indicator_engine.reset(self.symbol, timeframe, lookback_periods)
+        for row in store.rows(start):
+            indicators.update(*row[:5])
+        return indicators.snapshot()
     
     def analyze_market_trends(self, timeframe='1h', lookback_periods=14):
         """Analyze market trends using price data"""
         try:
-            # Get historical price data
-            kline_data = self.client.get_kline(
-                category="spot",
-                symbol=self.symbol,
-                interval=timeframe,
-                limit=lookback_periods
-            )
-            
-            if 'result' not in kline_data or 'list' not in kline_data['result']:
+            values = self._indicators(timeframe, lookback_periods)
+            if values is None:
                 return {'trend': 'unknown', 'strength': 0}
             
-            # Extract closing prices
-            closes = [float(candle[4]) for candle in kline_data['result']['list']]
-            
-            # Calculate simple moving averages
-            short_ma = sum(closes[-5:]) / 5 if len(closes) >= 5 else sum(closes) / len(closes)
-            long_ma = sum(closes) / len(closes)
-            
-            # Determine trend direction and strength
-            trend = 'bullish' if short_ma > long_ma else 'bearish'
-            strength = abs((short_ma / long_ma - 1) * 100)
-            
-            return {
-                'trend': trend,
-                'strength': strength,
-                'short_ma': short_ma,
-                'long_ma': long_ma
-            }
+            return trend_summary(values)
             
         except Exception as e:
             log_event('error', f"Error analyzing market trends: {e}")
@@ -195,47 +744,133 @@ class MarketAnalyzer:
     def get_support_resistance_levels(self, timeframe='1d', lookback_periods=30):
         """Identify support and resistance levels"""
         try:
-            # Implementation of support/resistance detection
-            # This would be a simplified version
-            kline_data = self.client.get_kline(
-                category="spot",
-                symbol=self.symbol,
-                interval=timeframe,
-                limit=lookback_periods
-            )
-            
-            if 'result' not in kline_data or 'list' not in kline_data['result']:
+            values = self._indicators(timeframe, lookback_periods)
+            if values is None:
                 return {'support': [], 'resistance': []}
             
-            # Extract high and low prices
-            highs = [float(candle[2]) for candle in kline_data['result']['list']]
-            lows = [float(candle[3]) for candle in kline_data['result']['list']]
-            
             # Simple implementation - just use min/max as support/resistance
-            support = min(lows)
-            resistance = max(highs)
-            
             return {
-                'support': support,
-                'resistance': resistance
+                'support': values['low'],
+                'resistance': values['high']
             }
             
         except Exception as e:
             log_event('error', f"Error finding support/resistance: {e}")
             return {'support': [], 'resistance': []}
 
+SCAN_COLUMNS = {
+    'trend': ('trend', 'strength', 'short_ma', 'long_ma'),
+    'levels': ('support', 'resistance'),
+    'ema': ('ema',),
+    'rsi': ('rsi',),
+    'atr': ('atr',),
+}
+
+def scan_klines(symbol, rows, indicators, lookback_periods):
+    """Indicator values of one symbol from its ``get_kline`` rows"""
+    klines = KlineIndicators(lookback_periods)
+    klines.update_rows(rows)
+    values = klines.snapshot()
+    if values is None:
+        return symbol, None
+    summary = trend_summary(values)
+    summary['support'], summary['resistance'] = values['low'], values['high']
+    return symbol, {column: summary[column] for name in indicators for column in SCAN_COLUMNS[name]}
+
+class MarketScanner:
+    """Screens a whole watchlist at once.
+
+    Klines are downloaded by a bounded thread pool of the scanner's own, which
+    waits out the Bybit token bucket. ``processes`` > 0 (or None for one per
+    CPU) computes the indicators in a process pool started with ``spawn``,
+    since forking a process that runs the bot threads, the event loop and HTTP
+    servers is not safe.
+
+    The default, ``processes=0``, computes them in this process instead. The
+    indicators are O(candles) per symbol, so 200 symbols of 30 candles take
+    about 50 ms in-process. A spawned pool needs about 2 s to start and import
+    bot.py, and about 90 ms per scan once warm, as pickling the klines costs
+    more than computing them. A pool pays off only for long lookbacks or
+    heavier indicators. Results come back as one columnar table:
+    ``{'symbol': [...], 'trend': [...], ..., 'error': [...]}``.
+    """
+    def __init__(self, client=None, max_fetches=8, processes=0, mp_context=None):
+        self.client = client
+        self.max_fetches = max_fetches
+        self.processes = processes
+        self.mp_context = mp_context or multiprocessing.get_context("spawn")
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=self.mp_context)
+            return self._pool
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def fetch(self, symbols, timeframe, limit):
+        """``{symbol: rows}`` for every symbol, or the exception its download raised"""
+        client = self.client or get_bybit_client()
+
+        def fetch_one(symbol):
+            try:
+                # Our own threads, not the bot runtime pool, so they may wait
+                return call_rate_limited(client.get_kline, category="spot", symbol=symbol,
+                                         interval=timeframe, limit=limit)['result']['list']
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.max_fetches, thread_name_prefix="MarketScanner") as executor:
+            return dict(zip(symbols, executor.map(fetch_one, symbols)))
+
+    def scan(self, symbols, indicators=('trend', 'levels'), timeframe='1', lookback_periods=30):
+        indicators = list(indicators)
+        unknown = [name for name in indicators if name not in SCAN_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown indicators: {', '.join(unknown)}")
+        columns = [column for name in indicators for column in SCAN_COLUMNS[name]]
+        klines = self.fetch(symbols, timeframe, lookback_periods)
+
+        jobs = [(symbol, rows) for symbol, rows in klines.items() if not isinstance(rows, Exception)]
+        args = ([symbol for symbol, _ in jobs], [rows for _, rows in jobs],
+                [indicators] * len(jobs), [lookback_periods] * len(jobs))
+        if self.processes == 0:
+            results = dict(map(scan_klines, *args))
+        else:
+            chunksize = max(1, len(jobs) // (4 * (self.processes or os.cpu_count() or 1)))
+            results = dict(self._get_pool().map(scan_klines, *args, chunksize=chunksize))
+
+        table = {column: [] for column in ['symbol'] + columns + ['error']}
+        for symbol in symbols:
+            rows = klines[symbol]
+            values = results.get(symbol)
+            table['symbol'].append(symbol)
+            for column in columns:
+                table[column].append(values[column] if values else None)
+            if isinstance(rows, Exception):
+                table['error'].append(str(rows))
+            else:
+                table['error'].append(None if values else "no klines")
+        return table
+
 class MarketDataProcessor:
     def __init__(self, client):
         self.client = client
         
     def get_market_data(self, symbol):
-        """Get current market data for a symbol"""
-        return self.client.get_tickers(category="spot", symbol=symbol)
+        """Get current ticker data for a symbol from the shared price hub"""
+        return price_hub.get_ticker(symbol)
         
     def get_current_price(self, symbol):
         """Extract current price from market data"""
         market_data = self.get_market_data(symbol)
-        return float(market_data['result']['list'][0]['lastPrice'])
+        return float(market_data['lastPrice'])
         
     def calculate_price_change(self, symbol, reference_price):
         """Calculate percentage change from reference price"""
@@ -245,7 +880,7 @@ class MarketDataProcessor:
     def get_trade_volume(self, symbol, timeframe='24h'):
         """Get trading volume for a symbol"""
         market_data = self.get_market_data(symbol)
-        return float(market_data['result']['list'][0]['volume24h'])
+        return float(market_data['volume24h'])
 
 class OrderManager:
     def __init__(self, client, symbol, amount, simulation_flag=1):
@@ -279,6 +914,8 @@ class OrderManager:
         """Execute a sell order"""
         if self.simulation_flag == 0:
             quantity = self._get_available_quantity()
+            if quantity is None:
+                return False, f"Sell quantity is below the minimum order size of {self.symbol}"
         else:
             quantity = float(self.amount)
         
@@ -314,38 +951,26 @@ class OrderManager:
                 qty=quantity,
                 marketUnit="baseCoin",
             )
+            get_wallet_snapshot(self.client).invalidate()
             return True, response['retMsg']
         except Exception as e:
             return False, str(e)
     
     def _get_current_price(self):
         """Get the current price of the symbol"""
-        response = self.client.get_tickers(category="spot", symbol=self.symbol)
-        return float(response['result']['list'][0]['lastPrice'])
+        return price_hub.get_price(self.symbol)
     
     def _get_available_quantity(self):
-        """Get available quantity for trading"""
+        """Get available quantity for trading, None when it is below the exchange minimums"""
         pair = self.symbol
         baseCoin = pair[:pair.index('USDT')]
-        prec = self.client.get_coin_info(coin=baseCoin)['result']['rows'][0]['chains'][0]['minAccuracy']
         quantity = self._get_assets(baseCoin)
-        return self._truncate_float(quantity, int(prec))
+        return instrument_cache.quantize_qty(self.symbol, quantity)
     
     def _get_assets(self, coin):
         """Get available assets for a specific coin"""
         return get_assets(self.client, coin)
     
-    def _truncate_float(self, value, precision):
-        """Truncate a float to a specific precision"""
-        if precision > 4:
-            precision = precision - 2
-        str_value = f"{value:.{precision + 2}f}"
-        if '.' in str_value:
-            integer_part, decimal_part = str_value.split('.')
-            truncated_decimal = decimal_part[:precision]
-            return float(f"{integer_part}.{truncated_decimal}" if truncated_decimal else integer_part)
-        return float(str_value)
-    
     def _get_timestamp(self):
         """Get current timestamp in GMT+7"""
         current_utc_time = datetime.utcnow()
@@ -359,6 +984,22 @@ API_KEY = ""
 BB_API_KEY = ""
 BB_SECRET_KEY = ""
 secret_command = "secret_command"
+signal_source = "polling" # polling , webhook
+MAILGUN_WEBHOOK_SIGNING_KEY = ""
+webhook_host = "0.0.0.0"
+webhook_port = 8080
+message_cache_dir = None # directory for the on-disk message body cache, None keeps it in memory only
+signal_index_path = "processed_signals.db"
+EXCHANGE_RATE_API_KEY = ""
+fx_cache_path = "fx_rates.json"
+tracing_enabled = False
+trace_log_path = "signal_traces.jsonl"
+kline_store_dir = None # directory for the local kline history, None always asks Bybit
+bot_state_dir = None # directory for the bot state journal and snapshot, None disables restoring bots on restart
+MAILGUN_API_BASE = "https://api.mailgun.net/v3"
+TELEGRAM_API_BASE = "https://api.telegram.org"
+BYBIT_ENDPOINT = None # overrides the pybit REST endpoint, e.g. a local fake exchange for benchmarks
+TRADING_FEE = 0.001 # fee per order, used for the realized P/L
 
 def log_event(level, message):
     """Log an event at the specified level."""
@@ -369,30 +1010,413 @@ def log_event(level, message):
     elif level == 'error':
         logging.error(message)
 
-def rate_limit(calls_per_second):
-    interval = 1.0 / calls_per_second
-
-    def decorator(func):
-        last_called = [0.0]
+class RateLimitExceeded(requests.exceptions.RequestException):
+    """A request found its rate limiter empty; raised instead of sleeping on a worker thread"""
+    def __init__(self, bucket, retry_after):
+        super().__init__(f"{bucket.name} rate limit reached, retry in {retry_after:.2f}s")
+        self.bucket = bucket
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the request rate to one upstream endpoint.
+
+    Requests made on the shared worker pool never sleep here: ``try_acquire``
+    either takes a token or says how long until one is free. Coroutines wait
+    for their token with ``acquire_async`` before handing the call to the pool.
+    Wait times and rejections are recorded for monitoring.
+    """
+    def __init__(self, name, rate, capacity=None):
+        self.name = name
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.acquired = 0
+        self.rejected = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """Take ``tokens`` if they are available now; returns 0.0, or the seconds until they will be"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                self.acquired += 1
+                return 0.0
+            self.rejected += 1
+            return (tokens - self._tokens) / self.rate
+
+    async def acquire_async(self, tokens=1):
+        """Wait on the event loop until ``tokens`` are taken; returns the time waited"""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                break
+            await asyncio.sleep(wait)
+            waited += wait
+        if waited > 0:
+            with self._lock:
+                self.waited += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    def refund(self, tokens=1):
+        """Give back tokens taken for a request that was not made"""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + tokens)
+            self.acquired -= 1
+
+    def set_rate(self, rate, capacity=None):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+            self.capacity = float(capacity or rate)
+            self._tokens = min(self._tokens, self.capacity)
+
+    def update_from_headers(self, headers, safety=0.8):
+        """Follow Bybit's X-Bapi-Limit* response headers"""
+        limit = headers.get('X-Bapi-Limit')
+        if limit is None:
+            return
+        remaining = headers.get('X-Bapi-Limit-Status')
+        reset_at = headers.get('X-Bapi-Limit-Reset-Timestamp')
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(float(limit) * safety, 0.1)
+            self.capacity = max(float(limit) * safety, 1.0)
+            if remaining is not None:
+                self._tokens = min(self._tokens, float(remaining))
+                if float(remaining) <= 0 and reset_at is not None:
+                    # Out of quota: hold everyone until the window resets
+                    until_reset = max(0.0, int(reset_at) / 1000.0 - time.time())
+                    self._tokens = min(self._tokens, -until_reset * self.rate)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate": round(self.rate, 2),
+                "acquired": self.acquired,
+                "rejected": self.rejected,
+                "waited": self.waited,
+                "avg_wait_ms": round(self.total_wait / self.waited * 1000, 1) if self.waited else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 1),
+            }
 
-        @wraps(func)
-        def wrapped(*args, **kwargs):
-            elapsed = time.time() - last_called[0]
-            if elapsed < interval:
-                time.sleep(interval - elapsed)
-            last_called[0] = time.time()
+# Bybit limits private endpoints one by one, their buckets are added on first use
+rate_limiters = {
+    "mailgun_events": TokenBucket("mailgun_events", rate=2, capacity=5),
+    "mailgun_storage": TokenBucket("mailgun_storage", rate=5, capacity=10),
+    "bybit_market": TokenBucket("bybit_market", rate=10, capacity=20),
+    "telegram": TokenBucket("telegram", rate=30, capacity=30),
+}
+_rate_limiters_lock = threading.Lock()
+
+def rate_limiter_for(url):
+    """Pick the bucket of the upstream endpoint a request URL (or path) belongs to"""
+    path = urlsplit(url).path
+    if path.startswith('/v5/market/'):
+        return rate_limiters["bybit_market"]
+    if path.startswith('/v5/'):
+        name = f"bybit {path}"
+        with _rate_limiters_lock:
+            bucket = rate_limiters.get(name)
+            if bucket is None:
+                bucket = rate_limiters[name] = TokenBucket(name, rate=10, capacity=10)
+            return bucket
+    if path.endswith('/sendMessage'):
+        return rate_limiters["telegram"]
+    if path.endswith('/events'):
+        return rate_limiters["mailgun_events"]
+    if '/messages/' in path:
+        return rate_limiters["mailgun_storage"]
+    return None
+
+_reserved_tokens = threading.local()
+
+def run_with_tokens(buckets, func, *args, **kwargs):
+    """Run ``func`` on this thread with a token of each bucket already taken by ``acquire_async``.
+
+    The first request of ``func`` to each bucket uses the reserved token, the
+    ones left unused are refunded.
+    """
+    _reserved_tokens.buckets = list(buckets)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        for bucket in _reserved_tokens.buckets:
+            bucket.refund()
+        _reserved_tokens.buckets = []
+
+def call_rate_limited(func, *args, **kwargs):
+    """Call ``func``, sleeping out any rate limit it hits; only for threads outside the bot runtime pool"""
+    while True:
+        try:
             return func(*args, **kwargs)
+        except RateLimitExceeded as e:
+            time.sleep(e.retry_after)
+
+class RateLimitedAdapter(HTTPAdapter):
+    """Pooled adapter that takes a token from the endpoint's bucket before each request"""
+    def send(self, request, **kwargs):
+        bucket = rate_limiter_for(request.url)
+        if bucket is not None:
+            reserved = getattr(_reserved_tokens, 'buckets', None)
+            if reserved and bucket in reserved:
+                reserved.remove(bucket)
+            else:
+                retry_after = bucket.try_acquire()
+                if retry_after:
+                    raise RateLimitExceeded(bucket, retry_after)
+        response = super().send(request, **kwargs)
+        if bucket is not None:
+            bucket.update_from_headers(response.headers)
+        return response
+
+class HttpTransport:
+    """Shared keep-alive HTTP sessions, one connection pool per host.
+
+    Every outbound call goes through here so TCP/TLS connections are reused,
+    timeouts are always set and per-host latency can be reported.
+    """
+    def __init__(self, timeout=10, pool_maxsize=32, max_samples=1000):
+        self.timeout = timeout
+        self.pool_maxsize = pool_maxsize
+        self.max_samples = max_samples
+        self._sessions = {}
+        self._latencies = {}
+        self._calls = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def mount(self, session):
+        """Give a session a pooled adapter and latency recording"""
+        adapter = RateLimitedAdapter(pool_connections=4, pool_maxsize=self.pool_maxsize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.hooks['response'].append(self._record_response)
+        return session
+
+    def session(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._sessions[host] = self.mount(requests.Session())
+            return session
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            return self.session(url).request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            host = urlsplit(url).netloc
+            with self._lock:
+                self._errors[host] = self._errors.get(host, 0) + 1
+            raise
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def _record_response(self, response, *args, **kwargs):
+        host = urlsplit(response.url).netloc
+        with self._lock:
+            samples = self._latencies.get(host)
+            if samples is None:
+                samples = self._latencies[host] = deque(maxlen=self.max_samples)
+            samples.append(response.elapsed.total_seconds())
+            self._calls[host] = self._calls.get(host, 0) + 1
+        return response
+
+    def stats(self):
+        """Return per-host call counts, errors and p50/p99 latency in milliseconds"""
+        with self._lock:
+            hosts = set(self._calls) | set(self._errors)
+            snapshot = {host: sorted(self._latencies.get(host, ())) for host in hosts}
+            result = {}
+            for host in hosts:
+                samples = snapshot[host]
+                result[host] = {
+                    "calls": self._calls.get(host, 0),
+                    "errors": self._errors.get(host, 0),
+                    "p50_ms": round(samples[int(0.50 * (len(samples) - 1))] * 1000, 1) if samples else None,
+                    "p99_ms": round(samples[int(0.99 * (len(samples) - 1))] * 1000, 1) if samples else None,
+                }
+            return result
+
+http_transport = HttpTransport()
+
+_bybit_clients = {}
+_bybit_clients_lock = threading.Lock()
+
+def get_bybit_client(api_key=None, api_secret=None):
+    """Return the shared pybit client of an API key, creating it on first use"""
+    api_key = BB_API_KEY if api_key is None else api_key
+    api_secret = BB_SECRET_KEY if api_secret is None else api_secret
+    with _bybit_clients_lock:
+        client = _bybit_clients.get(api_key)
+        if client is None:
+            client = _bybit_clients[api_key] = HTTP(api_key=api_key, api_secret=api_secret, recv_window=60000)
+            if BYBIT_ENDPOINT:
+                client.endpoint = BYBIT_ENDPOINT
+            http_transport.mount(client.client)
+        return client
+
+class MessageCache:
+    """Bounded LRU of stored Mailgun message bodies keyed by storage key.
+
+    Stored messages never change, so entries are never invalidated. An optional
+    directory keeps bodies across restarts; files are written atomically and
+    the tier is pruned to ``max_files`` bodies younger than ``max_age`` seconds.
+    A missing body is downloaded once however many bots ask for it at the same
+    time, see ``join_fetch``.
+    """
+    def __init__(self, maxsize=512, directory=None, max_files=10000, max_age=7 * 86400, prune_every=100):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.max_files = max_files
+        self.max_age = max_age
+        self.prune_every = prune_every
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._fetches = {}  # storage_key -> Future of the download in progress
+        self._writes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.prune()
+
+    def __contains__(self, storage_key):
+        """Whether a body is held in memory; the disk tier is not checked"""
+        return storage_key in self._items
+
+    def _path(self, storage_key):
+        return os.path.join(self.directory, hashlib.sha256(storage_key.encode()).hexdigest() + ".txt")
+
+    def get(self, storage_key):
+        with self._lock:
+            body = self._items.get(storage_key)
+            if body is not None:
+                self._items.move_to_end(storage_key)
+                self.hits += 1
+                return body
+        if self.directory and os.path.exists(self._path(storage_key)):
+            with open(self._path(storage_key), encoding="utf-8") as f:
+                body = f.read()
+            self._remember(storage_key, body)
+            with self._lock:
+                self.hits += 1
+            return body
+        with self._lock:
+            self.misses += 1
+        return None
 
-        return wrapped
+    def put(self, storage_key, body):
+        self._remember(storage_key, body)
+        if self.directory:
+            path = self._path(storage_key)
+            # A crash mid-write must not leave a truncated body to be served as a hit
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % self.prune_every == 0
+            if prune:
+                self.prune()
+
+    def prune(self):
+        """Drop disk bodies older than ``max_age`` and the oldest ones beyond ``max_files``"""
+        files = []
+        for entry in os.scandir(self.directory):
+            try:
+                files.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+        files.sort(reverse=True)
+        now = time.time()
+        for i, (mtime, path) in enumerate(files):
+            # Old .tmp files are from writes that never finished
+            stale_tmp = path.endswith(".tmp") and mtime < now - 60
+            if i >= self.max_files or mtime < now - self.max_age or stale_tmp:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def _remember(self, storage_key, body):
+        with self._lock:
+            self._items[storage_key] = body
+            self._items.move_to_end(storage_key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def join_fetch(self, storage_key):
+        """``(future, owner)`` of the download of a body; only the owner downloads it and calls ``end_fetch``"""
+        with self._lock:
+            future = self._fetches.get(storage_key)
+            if future is not None:
+                return future, False
+            future = self._fetches[storage_key] = Future()
+            return future, True
+
+    def end_fetch(self, storage_key, body=None, error=None):
+        with self._lock:
+            future = self._fetches.pop(storage_key)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(body)
 
-    return decorator
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._items), "hits": self.hits, "misses": self.misses}
+
+message_cache = MessageCache(directory=message_cache_dir)
+
+async def load_message_body(storage_key):
+    """Body of a stored message for a bot on the runtime loop; bots asking for one key share a single download"""
+    if storage_key in message_cache:
+        return message_cache.get(storage_key)
+    future, owner = message_cache.join_fetch(storage_key)
+    if not owner:
+        return await asyncio.wrap_future(future)
+    try:
+        body = await bot_runtime.run_limited(getmessagedata, storage_key)
+    except BaseException as e:
+        message_cache.end_fetch(storage_key, error=e)
+        raise
+    message_cache.end_fetch(storage_key, body)
+    return body
 
-@rate_limit(calls_per_second=5)  
 def getmessagedata(storage_key):
+    """Return the plain body of a stored message, fetching it only on a cache miss"""
+    Body_plain = message_cache.get(storage_key)
+    if Body_plain is None:
+        Body_plain = _fetch_message_body(storage_key)
+        if Body_plain is not None:
+            message_cache.put(storage_key, Body_plain)
+    return Body_plain
+
+def _fetch_message_body(storage_key):
     # Construct the URL for the stored message
-    url = f"https://api.mailgun.net/v3/domains/{domain_name}/messages/{storage_key}"
+    url = f"{MAILGUN_API_BASE}/domains/{domain_name}/messages/{storage_key}"
     # Make the GET request to retrieve the stored message
-    response = requests.get(url, auth=("api", API_KEY))
+    response = http_transport.get(url, auth=("api", API_KEY))
     # Check the response status
     if response.status_code == 200:
         # Parse the JSON response
@@ -400,76 +1424,1432 @@ def getmessagedata(storage_key):
         Body_plain = data.get("body-plain")
         return Body_plain
 
+class WalletSnapshot:
+    """Cached UNIFIED wallet balances of one API key, keyed by coin.
+
+    The whole balance list is fetched in one call and reused until it is older
+    than ``ttl`` or invalidated by one of our own fills. Concurrent readers of
+    a stale snapshot share a single refresh.
+    """
+    def __init__(self, client, ttl=30):
+        self.client = client
+        self.ttl = ttl
+        self.fetches = 0
+        self._coins = {}
+        self._fetched_at = 0.0
+        self._generation = 0  # bumped by invalidate(), a fetch started before it is not stored
+        self._fetched_generation = -1
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+
+    def _is_fresh(self):
+        return self._fetched_generation == self._generation and time.time() - self._fetched_at < self.ttl
+
+    def refresh(self):
+        requested_at = time.time()
+        with self._fetch_lock:
+            # Someone else refreshed while we were waiting, reuse their result
+            if self._is_fresh() and self._fetched_at >= requested_at:
+                return
+            with self._lock:
+                generation = self._generation
+            r = self.client.get_wallet_balance(accountType="UNIFIED")
+            coins = {asset.get('coin'): asset for asset in r.get('result', {}).get('list', [])[0].get('coin', [])}
+            with self._lock:
+                self._coins = coins
+                self._fetched_at = time.time()
+                # If a fill invalidated the snapshot during the fetch, the balances may predate it: serve
+                # them to this reader but keep the snapshot stale
+                self._fetched_generation = generation
+                self.fetches += 1
+
+    def invalidate(self):
+        """Force the next read to refetch, e.g. right after an order filled"""
+        with self._lock:
+            self._generation += 1
+
+    def get_balances(self, *coins):
+        """Available-to-withdraw amount of several coins from one snapshot"""
+        if not self._is_fresh():
+            self.refresh()
+        with self._lock:
+            return {coin: float(self._coins.get(coin, {}).get('availableToWithdraw') or 0.0) for coin in coins}
+
+    def get_balance(self, coin):
+        return self.get_balances(coin)[coin]
+
+_wallet_snapshots = {}
+_wallet_snapshots_lock = threading.Lock()
+
+def get_wallet_snapshot(client):
+    """Return the wallet snapshot shared by every user of an API key"""
+    key = getattr(client, 'api_key', None) or id(client)
+    with _wallet_snapshots_lock:
+        snapshot = _wallet_snapshots.get(key)
+        if snapshot is None:
+            snapshot = _wallet_snapshots[key] = WalletSnapshot(client)
+        return snapshot
+
 def get_assets(client, coin):
-    """Get available assets for a specific coin directly from the client"""
+    """Get available assets for a specific coin from the shared wallet snapshot"""
     try:
-        r = client.get_wallet_balance(accountType="UNIFIED")
-        for asset in r.get('result', {}).get('list', [])[0].get('coin', []):
-            if asset.get('coin') == coin:
-                return float(asset.get('availableToWithdraw', '0.0'))
-        return 0.0
+        return get_wallet_snapshot(client).get_balance(coin)
     except Exception as e:
         log_event('error', f"Error getting assets: {e}")
         return 0.0
 
 def get_account_balance():
-    balance = get_assets(HTTP(api_key=BB_API_KEY, api_secret=BB_SECRET_KEY, recv_window=60000), "USDT")
+    balance = get_assets(get_bybit_client(), "USDT")
     balance = round(balance,3)
     return balance
 
-@rate_limit(calls_per_second=5)  
+class PriceHub:
+    """Process-wide spot ticker snapshot shared by every bot.
+
+    One batched ``get_tickers(category="spot")`` call (no symbol filter) refreshes
+    the prices of every symbol per interval, instead of one call per bot.
+    """
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self._client = None
+        self._tickers = {}
+        self._updated_at = 0.0
+        self._subscribers = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = get_bybit_client()
+        return self._client
+
+    def subscribe(self, symbol):
+        """Register interest in a symbol and make sure the refresh loop is running"""
+        with self._lock:
+            self._subscribers[symbol] = self._subscribers.get(symbol, 0) + 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._refresh_loop, name="PriceHub", daemon=True)
+                self._thread.start()
+
+    def unsubscribe(self, symbol):
+        with self._lock:
+            count = self._subscribers.get(symbol, 0) - 1
+            if count > 0:
+                self._subscribers[symbol] = count
+            else:
+                self._subscribers.pop(symbol, None)
+
+    def add_listener(self, callback):
+        """Call ``callback(tickers)`` with the new snapshot after every refresh"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def refresh(self):
+        """Fetch all spot tickers in a single request and swap in the new snapshot"""
+        started = time.time()
+        with self._refresh_lock:
+            # Another caller refreshed while we were waiting for the lock
+            if self._updated_at >= started:
+                return self._tickers
+            response = self._get_client().get_tickers(category="spot")
+            tickers = {item['symbol']: item for item in response['result']['list']}
+            with self._lock:
+                self._tickers = tickers
+                self._updated_at = time.time()
+                listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(tickers)
+            except Exception as e:
+                log_event('error', f"PriceHub listener failed: {e}")
+        return tickers
+
+    def _refresh_loop(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            try:
+                self.refresh()
+            except Exception as e:
+                log_event('error', f"PriceHub refresh failed: {e}")
+            time.sleep(self.interval)
+
+    def get_ticker(self, symbol, max_age=None):
+        """Return the ticker dict of a symbol from the snapshot, refreshing it if too old"""
+        max_age = self.interval * 2 if max_age is None else max_age
+        if time.time() - self._updated_at > max_age or symbol not in self._tickers:
+            self.refresh()
+        ticker = self._tickers.get(symbol)
+        if ticker is None:
+            raise KeyError(f"No ticker for symbol {symbol}")
+        return ticker
+
+    def get_price(self, symbol, max_age=None):
+        return float(self.get_ticker(symbol, max_age)['lastPrice'])
+
+    def get_prices(self, symbols, max_age=None):
+        """Last prices of several symbols from one snapshot, refreshed at most once; unknown symbols are left out"""
+        max_age = self.interval * 2 if max_age is None else max_age
+        if time.time() - self._updated_at > max_age or any(symbol not in self._tickers for symbol in symbols):
+            self.refresh()
+        tickers = self._tickers
+        return {symbol: float(tickers[symbol]['lastPrice']) for symbol in symbols if symbol in tickers}
+
+price_hub = PriceHub()
+
+class TriggerBook:
+    """Stop-loss and take-profit thresholds of every bot on one symbol, kept sorted.
+
+    Each price update pops only the crossed entries, O(log n + k).
+    """
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self._stop_losses = []  # ascending (price, seq, bot), fires when price <= level
+        self._take_profits = []  # ascending (price, seq, bot), fires when price >= level
+        self._entries = {}
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def index(self, bot, stop_loss_price, take_profit_price):
+        """Insert or replace the thresholds of a bot"""
+        self.remove(bot)
+        sl_entry = tp_entry = None
+        if stop_loss_price is not None:
+            sl_entry = (stop_loss_price, next(self._seq), bot)
+            bisect.insort(self._stop_losses, sl_entry)
+        if take_profit_price is not None:
+            tp_entry = (take_profit_price, next(self._seq), bot)
+            bisect.insort(self._take_profits, tp_entry)
+        if sl_entry or tp_entry:
+            self._entries[bot] = (sl_entry, tp_entry)
+
+    def remove(self, bot):
+        sl_entry, tp_entry = self._entries.pop(bot, (None, None))
+        if sl_entry is not None:
+            del self._stop_losses[bisect.bisect_left(self._stop_losses, sl_entry)]
+        if tp_entry is not None:
+            del self._take_profits[bisect.bisect_left(self._take_profits, tp_entry)]
+
+    def evaluate(self, price):
+        """Pop and return ``(bot, kind)`` for every threshold crossed by ``price``"""
+        fired = []
+        start = bisect.bisect_left(self._stop_losses, (price,))
+        if start < len(self._stop_losses):
+            fired.extend((entry[2], 'stop_loss') for entry in self._stop_losses[start:])
+        end = bisect.bisect_right(self._take_profits, (price, float('inf')))
+        if end:
+            fired.extend((entry[2], 'take_profit') for entry in self._take_profits[:end])
+        # A fired bot is re-indexed by its next fill, so drop both of its levels
+        for bot, _ in fired:
+            self.remove(bot)
+        return fired
+
+class TriggerEngine:
+    """Central SL/TP evaluation for all bots, fed by the price hub snapshots"""
+    def __init__(self):
+        self._books = {}
+        self._armed = set()
+        self._lock = threading.Lock()
+
+    def arm(self, bot):
+        """Index a bot's levels and keep the price hub refreshing its symbol"""
+        with self._lock:
+            subscribe = bot not in self._armed
+            self._armed.add(bot)
+        self.index(bot)
+        if subscribe:
+            price_hub.subscribe(bot.symbol)
+
+    def is_armed(self, bot):
+        return bot in self._armed
+
+    def index(self, bot):
+        """(Re)compute a bot's thresholds from its last fill price and percents"""
+        stop_loss_price = bot.market_monitor.stop_loss_price(bot.get_last_price(), bot.stop_loss_percent)
+        take_profit_price = bot.market_monitor.take_profit_price(bot.get_last_price(), bot.take_profit_percent)
+        with self._lock:
+            book = self._books.get(bot.symbol)
+            if book is None:
+                book = self._books[bot.symbol] = TriggerBook(bot.symbol)
+            book.index(bot, stop_loss_price, take_profit_price)
+
+    def remove(self, bot):
+        with self._lock:
+            book = self._books.get(bot.symbol)
+            if book is not None:
+                book.remove(bot)
+
+    def on_registry_change(self, event, bot):
+        """Drop a bot's levels and its price hub subscription once it leaves the registry"""
+        if event != 'removed':
+            return
+        self.remove(bot)
+        with self._lock:
+            unsubscribe = bot in self._armed
+            self._armed.discard(bot)
+        if unsubscribe:
+            price_hub.unsubscribe(bot.symbol)
+
+    def on_prices(self, tickers):
+        fired = []
+        with self._lock:
+            for symbol, book in self._books.items():
+                ticker = tickers.get(symbol)
+                if ticker is not None and len(book):
+                    fired.extend(book.evaluate(float(ticker['lastPrice'])))
+        for bot, kind in fired:
+            bot_runtime.submit_blocking(bot.on_trigger, kind)
+        return fired
+
+trigger_engine = TriggerEngine()
+price_hub.add_listener(trigger_engine.on_prices)
+price_hub.add_listener(indicator_engine.on_prices)
+
+class BotRegistry:
+    """Every running Traderbot, indexed by name, symbol, listener_email and Mailgun domain.
+
+    Writers rebuild the indexes under a lock and swap in a new immutable
+    snapshot, so readers never lock and never see a half-applied change.
+    Subscribers get ``callback(event, bot)`` for every "added"/"removed" bot.
+    """
+    def __init__(self):
+        self._snapshot = ({}, {}, {}, (), {})  # by name, by symbol, by listener_email, all, by domain
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _build(bots):
+        by_name, by_symbol, by_listener, by_domain = {}, {}, {}, {}
+        for bot in bots:
+            by_name[bot.name] = bot
+            by_symbol.setdefault(bot.symbol, []).append(bot)
+            by_listener.setdefault(bot.listener_email, []).append(bot)
+            by_domain.setdefault(bot.domain_name, []).append(bot)
+        by_symbol = {symbol: tuple(group) for symbol, group in by_symbol.items()}
+        by_listener = {email: tuple(group) for email, group in by_listener.items()}
+        by_domain = {domain: tuple(group) for domain, group in by_domain.items()}
+        return by_name, by_symbol, by_listener, tuple(bots), by_domain
+
+    def add(self, bot):
+        with self._lock:
+            if bot.name in self._snapshot[0]:
+                raise ValueError(f"A bot named {bot.name} is already running")
+            self._snapshot = self._build(self._snapshot[3] + (bot,))
+        self._notify('added', bot)
+
+    def remove(self, bot):
+        """Drop a bot; returns False when it was not registered"""
+        with self._lock:
+            bots = self._snapshot[3]
+            if bot not in bots:
+                return False
+            self._snapshot = self._build(tuple(other for other in bots if other is not bot))
+        self._notify('removed', bot)
+        return True
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def _notify(self, event, bot):
+        for callback in list(self._subscribers):
+            try:
+                callback(event, bot)
+            except Exception as e:
+                log_event('error', f"BotRegistry subscriber failed on {event} {bot.name}: {e}")
+
+    def get(self, name):
+        return self._snapshot[0].get(name)
+
+    def by_symbol(self, symbol):
+        return self._snapshot[1].get(symbol, ())
+
+    def by_listener(self, listener_email):
+        return self._snapshot[2].get(listener_email, ())
+
+    def by_domain(self, domain):
+        return self._snapshot[4].get(domain, ())
+
+    def names(self):
+        return [bot.name for bot in self._snapshot[3]]
+
+    def snapshot(self):
+        return self._snapshot[3]
+
+    def __iter__(self):
+        return iter(self._snapshot[3])
+
+    def __len__(self):
+        return len(self._snapshot[3])
+
+    def __contains__(self, name):
+        return name in self._snapshot[0]
+
+bot_registry = BotRegistry()
+bot_registry.subscribe(trigger_engine.on_registry_change)
+
+class BotStateTable:
+    """Numeric trading state of every bot, one contiguous column per field.
+
+    A bot owns one row and reads it through a ``BotState`` view. Columns are
+    float64 / int64 memoryviews, so fleet-wide figures are computed over whole
+    columns (``numpy.frombuffer`` wraps them without copying) instead of
+    walking bot objects. Rows of garbage-collected bots are reused.
+    """
+    columns = {
+        'last_price': 'd', 'last_buy_price': 'd', 'amount': 'd', 'take_profit_percent': 'd',
+        'stop_loss_percent': 'd', 'accumulated_percentage_change': 'd',
+        'order_counter': 'q', 'wins': 'q', 'losses': 'q',
+    }
+
+    def __init__(self, capacity=64):
+        self._lock = threading.Lock()
+        self._views = {}
+        self._capacity = 0
+        self._size = 0  # rows handed out so far, freed ones included
+        self._free = []
+        self._resize(capacity)
+
+    def _resize(self, capacity):
+        for column, code in self.columns.items():
+            view = memoryview(bytearray(capacity * 8)).cast(code)
+            old = self._views.get(column)
+            if old is not None:
+                # Slices handed out keep the old buffer alive, so readers never see it vanish
+                view[:self._capacity] = old
+            self._views[column] = view
+        self._capacity = capacity
+
+    def __len__(self):
+        return self._size - len(self._free)
+
+    def allocate(self):
+        """Hand out a zeroed row as a ``BotState``"""
+        with self._lock:
+            if self._free:
+                row = self._free.pop()
+            else:
+                if self._size == self._capacity:
+                    self._resize(self._capacity * 2)
+                row = self._size
+                self._size += 1
+            for view in self._views.values():
+                view[row] = 0
+        return BotState(self, row)
+
+    def release(self, row):
+        with self._lock:
+            self._free.append(row)
+
+    def get(self, row, column):
+        return self._views[column][row]
+
+    def set(self, row, column, value):
+        # Under the lock so a concurrent resize cannot drop the write
+        with self._lock:
+            self._views[column][row] = value
+
+    def column(self, name):
+        """Zero-copy view of a column over every row handed out so far"""
+        with self._lock:
+            return self._views[name][:self._size]
+
+def _state_column(column):
+    return property(lambda self: self._table.get(self.row, column),
+                    lambda self, value: self._table.set(self.row, column, value))
+
+class BotState:
+    """One bot's row of a BotStateTable"""
+    __slots__ = ('_table', 'row')
+
+    def __init__(self, table, row):
+        self._table = table
+        self.row = row
+
+    last_price = _state_column('last_price')
+    last_buy_price = _state_column('last_buy_price')
+    amount = _state_column('amount')
+    take_profit_percent = _state_column('take_profit_percent')
+    stop_loss_percent = _state_column('stop_loss_percent')
+    accumulated_percentage_change = _state_column('accumulated_percentage_change')
+    order_counter = _state_column('order_counter')
+    wins = _state_column('wins')
+    losses = _state_column('losses')
+
+bot_states = BotStateTable()
+
+def _bot_state(field):
+    """Traderbot attribute read and written through the bot's ``BotState`` view"""
+    return property(lambda self: getattr(self.state, field),
+                    lambda self, value: setattr(self.state, field, value))
+
+_market_helpers = {}
+_market_helpers_lock = threading.Lock()
+
+def get_market_helpers(client, symbol):
+    """MarketMonitor and MarketAnalyzer shared by every bot of a client and symbol; both are stateless"""
+    key = (getattr(client, 'api_key', None) or id(client), symbol)
+    with _market_helpers_lock:
+        helpers = _market_helpers.get(key)
+        if helpers is None:
+            helpers = _market_helpers[key] = (MarketMonitor(client, symbol), MarketAnalyzer(client, symbol))
+        return helpers
+
+def quantize_down(value, step):
+    """Round ``value`` down to a multiple of the Decimal ``step``, returned as a plain string"""
+    value = value if isinstance(value, Decimal) else Decimal(str(value))
+    return format((value // step) * step, 'f')
+
+class InstrumentCache:
+    """Bybit spot instrument rules (base precision, min qty/notional, tick size) per symbol.
+
+    Loaded once for every symbol and refreshed in the background when older
+    than ``ttl``, so the sell path never waits on ``get_coin_info``.
+    """
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self._instruments = {}
+        self._loaded_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        client = get_bybit_client()
+        instruments = {}
+        cursor = None
+        while True:
+            params = {"category": "spot"}
+            if cursor:
+                params["cursor"] = cursor
+            result = client.get_instruments_info(**params)['result']
+            for item in result['list']:
+                lot_size = item['lotSizeFilter']
+                instruments[item['symbol']] = {
+                    'base_precision': Decimal(lot_size['basePrecision']),
+                    'min_order_qty': Decimal(lot_size['minOrderQty']),
+                    'min_order_amt': Decimal(lot_size['minOrderAmt']),
+                    'tick_size': Decimal(item['priceFilter']['tickSize']),
+                }
+            cursor = result.get('nextPageCursor')
+            if not cursor:
+                break
+        with self._lock:
+            self._instruments = instruments
+            self._loaded_at = time.time()
+            self._refreshing = False
+        return instruments
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        bot_runtime.submit_blocking(self._safe_refresh)
+
+    def _safe_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            with self._lock:
+                self._refreshing = False
+            log_event('error', f"Error refreshing instrument info: {e}")
+
+    def get(self, symbol):
+        info = self._instruments.get(symbol)
+        if info is None:
+            self.refresh()
+            info = self._instruments[symbol]
+        elif time.time() - self._loaded_at > self.ttl:
+            self._refresh_in_background()
+        return info
+
+    def quantize_qty(self, symbol, quantity, price=None):
+        """Round a base-coin quantity down to the exchange step; None if it is below the minimums"""
+        info = self.get(symbol)
+        quantity = Decimal(quantize_down(quantity, info['base_precision']))
+        if quantity <= 0 or quantity < info['min_order_qty']:
+            return None
+        if price is not None and quantity * Decimal(str(price)) < info['min_order_amt']:
+            return None
+        return format(quantity, 'f')
+
+    def quantize_price(self, symbol, price):
+        tick_size = self.get(symbol)['tick_size']
+        return quantize_down(price, tick_size)
+
+instrument_cache = InstrumentCache()
+
+class BotRuntime:
+    """Runs every bot as coroutines on one shared asyncio event loop.
+
+    Blocking HTTP calls are pushed to a single bounded worker pool, so the number
+    of OS threads stays flat no matter how many bots are running.
+    """
+    def __init__(self, max_workers=16):
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="BotRuntime")
+
+    def attach(self, loop):
+        """Run bots on an existing loop, e.g. the one of the telegram Application"""
+        with self._lock:
+            self._loop = loop
+
+    def get_loop(self):
+        """Return the runtime loop, starting a background one if none is attached"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="BotRuntime", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def spawn(self, coro):
+        """Schedule a coroutine on the runtime loop from any thread"""
+        loop = self.get_loop()
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is loop:
+            return loop.create_task(coro)
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    async def run_blocking(self, func, *args, **kwargs):
+        """Await a blocking call executed on the shared worker pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def run_limited(self, func, *args, **kwargs):
+        """``run_blocking`` for a call making one rate-limited request.
+
+        When the request finds its bucket empty, the token is awaited on the
+        loop and the call is made again with it reserved, so no worker sleeps.
+        """
+        reserved = []
+        while True:
+            try:
+                return await self.run_blocking(run_with_tokens, reserved, func, *args, **kwargs)
+            except RateLimitExceeded as e:
+                await e.bucket.acquire_async()
+                reserved = [e.bucket]
+
+    def submit_blocking(self, func, *args, **kwargs):
+        return self._executor.submit(func, *args, **kwargs)
+
+bot_runtime = BotRuntime()
+
+class SignalIndex:
+    """Append-only SQLite (WAL) record of handled Mailgun alerts per listener_email.
+
+    Processed storage keys / event ids are loaded into a set at start-up, so
+    "already handled?" is an O(1) lookup. The events poller cursor is kept here
+    too, so a restart neither replays nor refetches old alerts.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS processed (listener_email TEXT, key TEXT, "
+                           "processed_at REAL, PRIMARY KEY (listener_email, key)) WITHOUT ROWID")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cursors (domain TEXT PRIMARY KEY, next_url TEXT, begin REAL)")
+        self._processed = set(self._conn.execute("SELECT listener_email, key FROM processed"))
+        self._pending = {}  # (listener_email, key) -> [bots still handling the alert, its keys]
+
+    def is_processed(self, listener_email, key):
+        return (listener_email, key) in self._processed
+
+    def mark_processed(self, listener_email, *keys):
+        with self._lock:
+            self._mark(listener_email, [key for key in keys if key])
+
+    def _mark(self, listener_email, keys):
+        self._processed.update((listener_email, key) for key in keys)
+        self._conn.executemany("INSERT OR IGNORE INTO processed VALUES (?, ?, ?)",
+                               [(listener_email, key, time.time()) for key in keys])
+
+    def claim(self, listener_email, keys, handlers):
+        """Hand an alert to ``handlers`` bots; False if it was handled already or is being handled"""
+        keys = [key for key in keys if key]
+        with self._lock:
+            if any((listener_email, key) in self._processed or (listener_email, key) in self._pending for key in keys):
+                return False
+            entry = [handlers, keys]
+            for key in keys:
+                self._pending[(listener_email, key)] = entry
+        return True
+
+    def release(self, listener_email, *keys):
+        """A bot is done with a claimed alert; the last one marks it processed"""
+        with self._lock:
+            entry = next((self._pending[(listener_email, key)] for key in keys
+                          if key and (listener_email, key) in self._pending), None)
+            if entry is None:
+                return
+            entry[0] -= 1
+            if entry[0] > 0:
+                return
+            for key in entry[1]:
+                del self._pending[(listener_email, key)]
+            self._mark(listener_email, entry[1])
+
+    def get_cursor(self, domain):
+        """Return ``(next_url, begin)`` saved for a domain, or ``(None, None)``"""
+        with self._lock:
+            row = self._conn.execute("SELECT next_url, begin FROM cursors WHERE domain = ?", (domain,)).fetchone()
+        return row if row else (None, None)
+
+    def save_cursor(self, domain, next_url, begin):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO cursors VALUES (?, ?, ?)", (domain, next_url, begin))
+
+_signal_index = None
+_signal_index_lock = threading.Lock()
+
+def get_signal_index():
+    """Open the processed-signal index on first use"""
+    global _signal_index
+    with _signal_index_lock:
+        if _signal_index is None:
+            _signal_index = SignalIndex(signal_index_path)
+        return _signal_index
+
+class BotJournal:
+    """Append-only journal of bot state changes with periodic compacted snapshots.
+
+    Every line of ``journal.jsonl`` holds the fields of one bot that changed,
+    or its removal. After ``compact_every`` lines the merged state of the whole
+    fleet is written to ``snapshot.json`` and the journal starts over, so
+    loading at start-up reads one small snapshot and a short tail.
+
+    ``record`` and ``remove`` only queue the change; one writer thread does
+    all file I/O, so callers on the event loop never wait on the disk.
+    """
+    def __init__(self, directory, compact_every=1000):
+        self.directory = directory
+        self.compact_every = compact_every
+        self.journal_path = os.path.join(directory, "journal.jsonl")
+        self.snapshot_path = os.path.join(directory, "snapshot.json")
+        self._bots = {}
+        self._seq = 0
+        self._pending = 0  # journal lines since the last snapshot
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+        with self._lock:
+            self._compact()
+        self._writer = threading.Thread(target=self._write_loop, name="BotJournal", daemon=True)
+        self._writer.start()
+
+    def _load(self):
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, encoding="utf-8") as f:
+                    snapshot = json.load(f)
+                self._bots, self._seq = snapshot['bots'], snapshot['seq']
+            except (OSError, KeyError, ValueError) as e:
+                log_event('error', f"Ignoring unreadable bot snapshot {self.snapshot_path}: {e}")
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A crash in the middle of a write leaves a torn last line
+                    log_event('error', f"Ignoring torn record at the end of {self.journal_path}")
+                    break
+                if record['seq'] <= self._seq:
+                    continue  # already in the snapshot, the crash came before the journal was reset
+                self._apply(record)
+
+    def _apply(self, record):
+        self._seq = record['seq']
+        if record['op'] == 'remove':
+            self._bots.pop(record['bot'], None)
+        else:
+            self._bots.setdefault(record['bot'], {}).update(record['state'])
+
+    def _compact(self):
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"seq": self._seq, "bots": self._bots}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._journal = open(self.journal_path, "w", encoding="utf-8")
+        self._pending = 0
+
+    def _append(self, record):
+        self._seq += 1
+        record['seq'] = self._seq
+        self._apply(record)
+        self._journal.write(json.dumps(record) + "\n")
+        self._journal.flush()
+        self._pending += 1
+        if self._pending >= self.compact_every:
+            self._journal.close()
+            self._compact()
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                op, name, state = item
+                with self._lock:
+                    if op == 'update':
+                        saved = self._bots.get(name, {})
+                        changes = {field: value for field, value in state.items()
+                                   if field not in saved or saved[field] != value}
+                        if changes:
+                            self._append({'op': 'update', 'bot': name, 'state': changes})
+                    elif name in self._bots:
+                        self._append({'op': 'remove', 'bot': name})
+            except Exception as e:
+                log_event('error', f"Error writing the bot journal: {e}")
+            finally:
+                self._queue.task_done()
+
+    def record(self, name, state):
+        """Queue ``state``; the writer journals the fields that differ from what is saved for the bot"""
+        self._queue.put(('update', name, dict(state)))
+
+    def remove(self, name):
+        self._queue.put(('remove', name, None))
+
+    def flush(self):
+        """Wait until every queued change is written"""
+        self._queue.join()
+
+    def bots(self):
+        """Saved state of every bot, by name"""
+        self.flush()
+        with self._lock:
+            return {name: dict(state) for name, state in self._bots.items()}
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join()
+        with self._lock:
+            self._journal.close()
+
+_bot_journal = None
+_bot_journal_lock = threading.Lock()
+
+def get_bot_journal():
+    """Open the bot state journal on first use; None when ``bot_state_dir`` is not set"""
+    global _bot_journal
+    if not bot_state_dir:
+        return None
+    with _bot_journal_lock:
+        if _bot_journal is None:
+            _bot_journal = BotJournal(bot_state_dir)
+        return _bot_journal
+
+def _journal_registry_change(event, bot):
+    """Registry subscriber: running bots are saved, stopped ones forgotten.
+
+    Runs on the event loop; the journal is opened by ``restore_bots`` at
+    start-up and only queues the change here.
+    """
+    journal = get_bot_journal()
+    if journal is None:
+        return
+    if event == 'added':
+        journal.record(bot.name, bot.export_state())
+    else:
+        journal.remove(bot.name)
+
+bot_registry.subscribe(_journal_registry_change)
+
+class _MailgunWebhookHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        try:
+            payload = _parse_webhook_body(self.headers.get('Content-Type', ''), body)
+            status = self.server.receiver.handle_payload(payload)
+        except Exception as e:
+            log_event('error', f"Invalid Mailgun webhook: {e}")
+            status = 400
+        self.send_response(status)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        log_event('debug', f"Mailgun webhook: {format % args}")
+
+def _parse_webhook_body(content_type, body):
+    """Decode a webhook body sent as JSON, urlencoded or multipart form data"""
+    if content_type.startswith('application/json'):
+        return json.loads(body)
+    if content_type.startswith('multipart/form-data'):
+        message = BytesParser(policy=default_email_policy).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+        return {part.get_param('name', header='content-disposition'): part.get_content()
+                for part in message.iter_parts()}
+    return {key: values[0] for key, values in parse_qs(body.decode()).items()}
+
+class MailgunWebhookReceiver:
+    """Local HTTP receiver for Mailgun "stored"/"delivered" webhooks.
+
+    Verified alerts are pushed straight to the bots whose ``listener_email``
+    matches the recipient, instead of every bot polling the events API.
+    """
+    accepted_events = ('stored', 'delivered')
+
+    def __init__(self, signing_key, host="0.0.0.0", port=8080, max_age=300):
+        self.signing_key = signing_key
+        self.host = host
+        self.port = port
+        self.max_age = max_age
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _MailgunWebhookHandler)
+        self._server.receiver = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="MailgunWebhook", daemon=True)
+        self._thread.start()
+        log_event('info', f"Mailgun webhook receiver listening on {self.host}:{self.port}")
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def verify_signature(self, timestamp, token, signature):
+        """Check the HMAC-SHA256 Mailgun signs every webhook with"""
+        if not (timestamp and token and signature):
+            return False
+        if abs(time.time() - float(timestamp)) > self.max_age:
+            return False
+        expected = hmac.new(self.signing_key.encode(), f"{timestamp}{token}".encode(), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature)
+
+    def handle_payload(self, payload):
+        """Verify and route one webhook payload, returning the HTTP status to answer"""
+        if isinstance(payload.get('signature'), dict):
+            # Event webhook: {"signature": {...}, "event-data": {...}}
+            signature = payload['signature']
+            event = payload.get('event-data', {})
+            if event.get('event') not in self.accepted_events:
+                return 200
+            recipient = event.get('recipient', '')
+            storage_key = event.get('storage', {}).get('key')
+            event_id = event.get('id')
+            body = None
+        else:
+            # Route forward / store(notify): flat form fields with the message itself
+            signature = payload
+            recipient = payload.get('recipient', '')
+            message_url = payload.get('message-url', '')
+            storage_key = message_url.rstrip('/').rsplit('/', 1)[-1] or payload.get('Message-Id')
+            event_id = None
+            body = payload.get('body-plain')
+
+        if not self.verify_signature(signature.get('timestamp'), signature.get('token'), signature.get('signature')):
+            log_event('error', "Rejected Mailgun webhook with an invalid signature")
+            return 406  # Mailgun does not retry on 406
+
+        if storage_key or body:
+            self.route(recipient, storage_key, body, event_id)
+        return 200
+
+    def route(self, recipient, storage_key, body=None, event_id=None):
+        listener_email = recipient.split('@')[0]
+        bots = bot_registry.by_listener(listener_email)
+        # Mailgun retries webhooks, skip alerts that were already handed to the bots
+        if not bots or not get_signal_index().claim(listener_email, (event_id, storage_key), len(bots)):
+            return 0
+        meta = {'received_at': time.time()} if signal_tracer.enabled else None
+        for thread in bots:
+            thread.deliver_signal(storage_key, body, meta=meta, keys=(event_id, storage_key))
+        return len(bots)
+
+webhook_receiver = None
+
+class MailgunEventPoller:
+    """Single events API poller per Mailgun domain.
+
+    Pages forward through ``stored`` events with a persistent cursor (the
+    ``paging.next`` URL) and fans every event out, in order, to the bots of
+    the bot registry listening on its recipient. Mailgun indexes some events
+    late, behind the cursor, so every ``trailing_interval`` seconds the last
+    ``trailing_window`` seconds are read again; the signal index drops what
+    was already handed out. One API call per interval when idle, no matter
+    how many bots are listening. Every page waits for its own events token
+    on the loop.
+    """
+    def __init__(self, domain, interval=1.0, page_limit=300, trailing_window=30.0, trailing_interval=10.0):
+        self.domain = domain
+        self.interval = interval
+        self.page_limit = page_limit
+        self.trailing_window = trailing_window
+        self.trailing_interval = trailing_interval
+        self._trailing_at = 0.0
+        self._index = get_signal_index()
+        self._next_url, self._begin = self._index.get_cursor(domain)
+        if self._begin is None:
+            self._begin = time.time()
+        self._lock = threading.Lock()
+        self._task = None
+
+    def _bots(self, listener_email=None):
+        if listener_email is None:
+            return bot_registry.by_domain(self.domain)
+        return [bot for bot in bot_registry.by_listener(listener_email) if bot.domain_name == self.domain]
+
+    def ensure_running(self):
+        """Start the poll loop if it is not running yet"""
+        with self._lock:
+            if self._task is None:
+                self._task = bot_runtime.spawn(self._run())
+
+    async def _run(self):
+        while True:
+            with self._lock:
+                if not self._bots():
+                    self._task = None
+                    return
+            started = time.time()
+            try:
+                trailing = bool(self.trailing_window) and started - self._trailing_at >= self.trailing_interval
+                if trailing:
+                    self._trailing_at = started
+                await self.poll_once(trailing)
+            except Exception as e:
+                log_event('error', f"Mailgun poller for {self.domain} failed: {e}")
+            await asyncio.sleep(max(0.0, self.interval - (time.time() - started)))
+
+    def _fetch_email_events(self, url, params=None):
+        response = http_transport.get(url, auth=("api", API_KEY), params=params)
+        if response.status_code != 200:
+            raise requests.exceptions.RequestException(f"Events API returned status code {response.status_code}")
+        return response.json()
+
+    async def poll_once(self, trailing=True):
+        """Read the new events, then the trailing window if asked, and dispatch them; returns how many were handed to bots"""
+        delivered = await self._poll_forward()
+        if trailing and self.trailing_window:
+            delivered += await self._poll_trailing()
+        return delivered
+
+    def _events_query(self, begin):
+        url = f"{MAILGUN_API_BASE}/{self.domain}/events"
+        return url, {"event": "stored", "ascending": "yes", "begin": begin, "limit": self.page_limit}
+
+    async def _poll_trailing(self):
+        url, params = self._events_query(time.time() - self.trailing_window)
+        return await self._poll_pages(url, params, forward=False)
+
+    async def _poll_forward(self):
+        if self._next_url is None:
+            url, params = self._events_query(self._begin)
+        else:
+            url, params = self._next_url, None
+        return await self._poll_pages(url, params, forward=True)
+
+    async def _poll_pages(self, url, params, forward):
+        # A page shorter than the limit is the last one, so an idle poll is a single call
+        bucket = rate_limiters["mailgun_events"]
+        delivered = 0
+        while True:
+            await bucket.acquire_async()
+            count, next_url, page_delivered = await bot_runtime.run_blocking(
+                run_with_tokens, [bucket], self._read_page, url, params, forward)
+            delivered += page_delivered
+            if count < self.page_limit or not next_url:
+                return delivered
+            url, params = next_url, None
+
+    def _read_page(self, url, params, forward):
+        """Fetch one page and dispatch its events; returns ``(events, next url, delivered)``"""
+        started = time.perf_counter()
+        data = self._fetch_email_events(url, params)
+        meta = None
+        if forward and signal_tracer.enabled:
+            meta = {'received_at': time.time(), 'fetch_ms': (time.perf_counter() - started) * 1000}
+        items = data.get("items", [])
+        next_url = data.get("paging", {}).get("next")
+        delivered = sum(self._dispatch(item, meta) for item in items)
+        if forward and next_url and next_url != self._next_url:
+            # Keep the cursor even on an empty page, it is where new events appear
+            self._next_url = next_url
+            self._index.save_cursor(self.domain, self._next_url, self._begin)
+        return len(items), next_url, delivered
+
+    def _dispatch(self, item, meta=None):
+        storage_key = item.get('storage', {}).get('key')
+        if not storage_key:
+            return 0
+        event_id = item.get('id')
+        listener_email = item.get('recipient', '').split('@')[0]
+        bots = self._bots(listener_email)
+        if not bots or not self._index.claim(listener_email, (event_id, storage_key), len(bots)):
+            return 0
+        for bot in bots:
+            bot.deliver_signal(storage_key, meta=meta, keys=(event_id, storage_key))
+        return 1
+
+_event_pollers = {}
+_event_pollers_lock = threading.Lock()
+
+def get_event_poller(domain):
+    """Return the shared events poller of a Mailgun domain"""
+    with _event_pollers_lock:
+        poller = _event_pollers.get(domain)
+        if poller is None:
+            poller = _event_pollers[domain] = MailgunEventPoller(domain)
+        return poller
+
+def _start_event_poller(event, bot):
+    """Registry subscriber: a new bot makes sure the poller of its domain runs"""
+    if event == 'added' and signal_source == "polling":
+        get_event_poller(bot.domain_name).ensure_running()
+
+bot_registry.subscribe(_start_event_poller)
+
+class FxRateService:
+    """USD conversion rates cached with a TTL.
+
+    The whole ``conversion_rates`` table is fetched at once. Stale tables keep
+    being served while a background refresh runs, and the last good table is
+    saved to disk so a restart does not fall back to a fixed rate. After a
+    failed download no new one is tried for ``failure_backoff`` seconds.
+    """
+    fallback_rates = {"RUB": 75.0}
+
+    def __init__(self, ttl=3600, cache_path=None, failure_backoff=60, cold_timeout=3):
+        self.ttl = ttl
+        self.cache_path = cache_path
+        self.failure_backoff = failure_backoff
+        self.cold_timeout = cold_timeout
+        self._rates = {}
+        self._fetched_at = 0.0
+        self._failed_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                saved = json.load(f)
+            self._rates = {currency: float(rate) for currency, rate in saved['rates'].items()}
+            self._fetched_at = float(saved['fetched_at'])
+        except (OSError, KeyError, ValueError) as e:
+            log_event('error', f"Ignoring unreadable FX cache {self.cache_path}: {e}")
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": self._fetched_at, "rates": self._rates}, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def refresh(self, timeout=None):
+        """Download the whole USD conversion table"""
+        url = f"https://v6.exchangerate-api.com/v6/{EXCHANGE_RATE_API_KEY}/latest/USD"
+        kwargs = {} if timeout is None else {'timeout': timeout}
+        try:
+            response = http_transport.get(url, **kwargs)
+            if response.status_code != 200:
+                raise requests.exceptions.RequestException(f"API returned status code {response.status_code}")
+            rates = {currency: float(rate) for currency, rate in response.json()['conversion_rates'].items()}
+            with self._lock:
+                self._rates = rates
+                self._fetched_at = time.time()
+                self._failed_at = None
+                self._save()
+        except Exception:
+            with self._lock:
+                self._failed_at = time.time()
+            raise
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _backing_off(self):
+        return self._failed_at is not None and time.time() - self._failed_at < self.failure_backoff
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing or self._backing_off():
+                return
+            self._refreshing = True
+        future = bot_runtime.submit_blocking(self.refresh)
+        future.add_done_callback(self._log_failure)
+
+    def _log_failure(self, future):
+        if future.exception() is not None:
+            log_event('error', f"Error refreshing exchange rates: {future.exception()}")
+
+    def rate(self, currency):
+        """Rate of 1 USD in ``currency``; never waits on the network once a table is known"""
+        if not self._rates and not self._backing_off():
+            try:
+                with self._lock:
+                    self._refreshing = True
+                self.refresh(timeout=self.cold_timeout)
+            except Exception as e:
+                log_event('error', f"Error fetching exchange rate data: {e}")
+        elif time.time() - self._fetched_at > self.ttl:
+            self._refresh_in_background()
+        rate = self._rates.get(currency)
+        if rate is None:
+            rate = self.fallback_rates[currency]
+            log_event('info', f"Using fallback conversion rate: {rate}")
+        return rate
+
+fx_rates = FxRateService(cache_path=fx_cache_path)
+
 def get_usdt_to_rub(amount):
-    """Convert USDT amount to RUB using exchange rate API"""
+    """Convert USDT amount to RUB using the cached exchange rate"""
     if amount is None or amount <= 0:
         log_event('error', f"Invalid amount for conversion: {amount}")
         return 0
-        
-    try:
-        return _fetch_and_calculate_rub_value(amount)
-    except requests.exceptions.RequestException as e:
-        log_event('error', f"Error fetching exchange rate data: {e}")
-        return _fallback_conversion(amount)
-    except (KeyError, ValueError) as e:
-        log_event('error', f"Error processing exchange rate data: {e}")
-        return _fallback_conversion(amount)
-    except Exception as e:
-        log_event('error', f"Unexpected error in currency conversion: {e}")
-        return _fallback_conversion(amount)
+    return amount * fx_rates.rate("RUB")
+
+class TelegramDispatcher:
+    """Background sender for Telegram notifications.
+
+    ``submit`` only enqueues, so the trading path never waits on Telegram.
+    Messages for the same chat arriving within ``coalesce_window`` are merged,
+    sends are paced to Telegram's per-chat limit (the global one is the
+    ``telegram`` rate limiter), and 429 answers are retried after the
+    ``retry_after`` Telegram asks for. A merged message Telegram rejects
+    with 400 (usually broken Markdown in one part) is resent part by part.
+    """
+    max_length = 4096
+
+    def __init__(self, maxsize=1000, coalesce_window=0.5, per_chat_interval=1.0, max_retries=3):
+        self.coalesce_window = coalesce_window
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self.sent = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize)
+        self._last_sent = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, chat, text, parse_mode="Markdown"):
+        """Queue a message without blocking; returns False if the queue is full"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="TelegramDispatcher", daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait((chat, parse_mode, text))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            log_event('error', "Telegram queue is full, message dropped")
+            return False
 
-def _fetch_and_calculate_rub_value(amount):
-    """Fetch exchange rate and calculate RUB value"""
-    usdt_to_rub_url = f"https://v6.exchangerate-api.com/v6/{EXCHANGE_RATE_API_KEY}/latest/USD" 
-    rub_response = requests.get(usdt_to_rub_url)
-    
-    if rub_response.status_code != 200:
-        raise requests.exceptions.RequestException(f"API returned status code {rub_response.status_code}")
-        
-    exchange_data = rub_response.json()
-    usd_to_rub_rate = float(exchange_data['conversion_rates']['RUB'])
-    return amount * usd_to_rub_rate
-
-def _fallback_conversion(amount):
-    """Fallback conversion using a fixed rate when API fails"""
-    # Use a fixed fallback rate (should be updated periodically)
-    fallback_rate = 75.0  # Example fallback rate
-    log_event('info', f"Using fallback conversion rate: {fallback_rate}")
-    return amount * fallback_rate
-
-@rate_limit(calls_per_second=5)
-def send_telegram_message(message):
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    payload = {
-        "chat_id": chat_id,
-        "text": message,
-        "parse_mode": "Markdown"  # Optional, use "Markdown" or "HTML" for formatting
-    }
-    response = requests.post(url, json=payload)
-    
-    if response.status_code == 200:
-        print("telegram Message sent successfully")
-    else:
+    def _run(self):
+        while True:
+            pending = OrderedDict()
+            chat, parse_mode, text = self._queue.get()
+            pending.setdefault((chat, parse_mode), []).append(text)
+            deadline = time.monotonic() + self.coalesce_window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    chat, parse_mode, text = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.setdefault((chat, parse_mode), []).append(text)
+            for (chat, parse_mode), texts in pending.items():
+                for group in self._merge(texts):
+                    try:
+                        self._deliver(chat, group, parse_mode)
+                    except Exception as e:
+                        log_event('error', f"Failed to send telegram message: {e}")
+
+    def _merge(self, texts):
+        """Split ``texts`` into groups that fit in one message"""
+        groups, length = [], 0
+        for text in texts:
+            if groups and length + 1 + len(text) <= self.max_length:
+                groups[-1].append(text)
+                length += 1 + len(text)
+            else:
+                groups.append([text])
+                length = len(text)
+        return groups
+
+    def _deliver(self, chat, texts, parse_mode):
+        if self._send(chat, "\n".join(texts), parse_mode) == 400 and len(texts) > 1:
+            for text in texts:
+                self._send(chat, text, parse_mode)
+
+    def _wait_for_slot(self, chat):
+        wait = self._last_sent.get(chat, 0.0) + self.per_chat_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_sent[chat] = time.monotonic()
+
+    def _send(self, chat, text, parse_mode):
+        url = f"{TELEGRAM_API_BASE}/bot{bot_token}/sendMessage"
+        payload = {
+            "chat_id": chat,
+            "text": text,
+            "parse_mode": parse_mode
+        }
+        response = None
+        for _ in range(self.max_retries + 1):
+            self._wait_for_slot(chat)
+            try:
+                response = http_transport.post(url, json=payload)
+            except RateLimitExceeded as e:
+                # Our own thread, so waiting for the global limit here holds up nobody else
+                time.sleep(e.retry_after)
+                continue
+            if response.status_code == 200:
+                self.sent += 1
+                print("telegram Message sent successfully")
+                return 200
+            if response.status_code != 429:
+                break
+            retry_after = response.json().get('parameters', {}).get('retry_after', 1)
+            time.sleep(retry_after)
         log_event('error', f"Failed to send message")
-        print("Failed to send message:", response.text)
+        print("Failed to send message:", response.text if response is not None else "rate limited")
+        return response.status_code if response is not None else None
+
+telegram_dispatcher = TelegramDispatcher()
+
+def send_telegram_message(message):
+    """Queue a notification for the configured chat; never blocks on Telegram"""
+    telegram_dispatcher.submit(chat_id, message)
+
+class _Span:
+    """Times one stage of the current trace"""
+    __slots__ = ("trace", "stage", "started")
+
+    def __init__(self, trace, stage):
+        self.trace = trace
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.trace.add(self.stage, (time.perf_counter() - self.started) * 1000)
+        return False
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+class SignalTrace:
+    """Stage timings (ms) of one alert handled by one bot"""
+    __slots__ = ("bot", "storage_key", "received_at", "stages")
+
+    def __init__(self, bot, storage_key, received_at):
+        self.bot = bot
+        self.storage_key = storage_key
+        self.received_at = received_at
+        self.stages = {}
+
+    def add(self, stage, elapsed_ms):
+        self.stages[stage] = self.stages.get(stage, 0.0) + elapsed_ms
+
+    def to_dict(self):
+        return {"bot": self.bot, "storage_key": self.storage_key, "received_at": self.received_at,
+                "total_ms": round((time.time() - self.received_at) * 1000, 3),
+                "stages": {stage: round(ms, 3) for stage, ms in self.stages.items()}}
+
+class SignalTracer:
+    """Latency tracing from alert arrival to exchange ack, correlated by storage key and bot.
+
+    The trace of the signal being handled lives in a thread-local, so spans can
+    be opened anywhere down the call chain. When disabled every span is a
+    shared no-op object. Finished traces go to a ring buffer and a JSONL file.
+    """
+    def __init__(self, enabled=False, capacity=1000, path=None):
+        self.enabled = enabled
+        self.path = path
+        self._traces = deque(maxlen=capacity)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def start(self, bot_name, storage_key, meta=None):
+        if not self.enabled:
+            return None
+        meta = meta or {}
+        trace = SignalTrace(bot_name, storage_key, meta.get('received_at', time.time()))
+        if 'fetch_ms' in meta:
+            trace.add('fetch_events', meta['fetch_ms'])
+        trace.add('queued', (time.time() - trace.received_at) * 1000)
+        self._local.trace = trace
+        return trace
+
+    def span(self, stage):
+        trace = getattr(self._local, 'trace', None) if self.enabled else None
+        if trace is None:
+            return _NO_SPAN
+        return _Span(trace, stage)
+
+    def finish(self):
+        trace = getattr(self._local, 'trace', None)
+        if trace is None:
+            return None
+        self._local.trace = None
+        record = trace.to_dict()
+        with self._lock:
+            self._traces.append(record)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+        return record
+
+    def percentiles(self, last_n=100):
+        """p50/p95/p99 per stage (and total) over the last ``last_n`` traces"""
+        with self._lock:
+            traces = list(self._traces)[-last_n:]
+        samples = {}
+        for record in traces:
+            for stage, ms in record["stages"].items():
+                samples.setdefault(stage, []).append(ms)
+            samples.setdefault("total", []).append(record["total_ms"])
+        result = {}
+        for stage, values in samples.items():
+            values.sort()
+            result[stage] = {f"p{q}": values[int(q / 100 * (len(values) - 1))] for q in (50, 95, 99)}
+            result[stage]["count"] = len(values)
+        return result
+
+signal_tracer = SignalTracer(enabled=tracing_enabled, path=trace_log_path)
 
 def command_filter(command): 
 
@@ -483,14 +2863,34 @@ def command_filter(command):
         return 0
 
 # Update Traderbot to implement the common interface
-class Traderbot(threading.Thread, Trader):
-    _active_threads = []  # Class-level list to store all active threads
+class Traderbot(Trader):
+    # Trading state saved to the bot journal next to the bot's configuration
+    state_fields = ('_last_command_received', '_last_price', '_last_buy_price', '_accumulated_percentage_change',
+                    '_skip_next_signal', '_order_counter', '_wins', '_loses', 'paused',
+                    'take_profit_percent', 'stop_loss_percent')
+
+    amount = _bot_state('amount')
+    take_profit_percent = _bot_state('take_profit_percent')
+    stop_loss_percent = _bot_state('stop_loss_percent')
+    _last_price = _bot_state('last_price')
+    _last_buy_price = _bot_state('last_buy_price')
+    _accumulated_percentage_change = _bot_state('accumulated_percentage_change')
+    _order_counter = _bot_state('order_counter')
+    _wins = _bot_state('wins')
+    _loses = _bot_state('losses')
+
     def __init__(self,id_t="Undefined",symbol="BTCUSDT",tp=0.0,sl=0.0,amount=0.00011,mode="Simulation",listener_email="any"):
-        threading.Thread.__init__(self)
+        self.state = bot_states.allocate()
         Trader.__init__(self, symbol, amount)
-        self.stop_thread = False
         self.paused = False  # Flag to control pausing
-        self.pause_condition = threading.Condition()  # Condition to manage pausing
+        self._loop = None  # Event loop the bot coroutines run on
+        self._resume_event = None  # asyncio.Event used to wake the bot after a pause, made on first pause
+        self._signal_queue = None  # alerts pushed by the webhook receiver or the poller
+        self._draining = False  # a task is handling the queued alerts
+        self._task = None
+        # Alerts, SL/TP triggers, manual orders and fill rebooking run on different pool
+        # threads; they take turns on the bot's orders and counters
+        self._trade_lock = threading.RLock()
         self.name = id_t
         self.symbol = symbol #BTCUSDT , ETHUSDT
         self.amount = amount
@@ -514,18 +2914,41 @@ class Traderbot(threading.Thread, Trader):
             self._simulation_flag = 1
         self._cl = self._create_client()
         self.order_executor = OrderExecutor(self._cl, self.symbol, self.amount, self._simulation_flag)
-        self.market_monitor = MarketMonitor(self._cl, self.symbol)
-        self.market_analyzer = MarketAnalyzer(self._cl, self.symbol)
+        self.market_monitor, self.market_analyzer = get_market_helpers(self._cl, self.symbol)
 
-        Traderbot._active_threads.append(self)  # Add this thread to the active threads list
+    def __del__(self):
+        state = getattr(self, 'state', None)
+        if state is not None:
+            state._table.release(state.row)
 
     def _create_client(self):
-        """Factory method to create API client"""
-        return HTTP(
-            api_key=BB_API_KEY,
-            api_secret=BB_SECRET_KEY,
-            recv_window=60000
-        )
+        """Factory method returning the API client shared by all bots of this key"""
+        return get_bybit_client()
+
+    def export_state(self):
+        """Configuration and trading state as a JSON-ready dict, see ``from_state``"""
+        state = {'name': self.name, 'symbol': self.symbol, 'amount': self.amount, 'mode': self.mode,
+                 'listener_email': self.listener_email, 'domain_name': self.domain_name}
+        state.update((field, getattr(self, field)) for field in self.state_fields)
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        """Recreate a bot from ``export_state`` output without asking the exchange anything"""
+        bot = cls(id_t=state['name'], symbol=state['symbol'], tp=state['take_profit_percent'],
+                  sl=state['stop_loss_percent'], amount=state['amount'], mode=state['mode'],
+                  listener_email=state['listener_email'])
+        bot.domain_name = state.get('domain_name', bot.domain_name)
+        for field in cls.state_fields:
+            if field in state:
+                setattr(bot, field, state[field])
+        return bot
+
+    def _journal_state(self):
+        journal = get_bot_journal()
+        # A stopped bot was already removed from the journal
+        if journal is not None and bot_registry.get(self.name) is self:
+            journal.record(self.name, self.export_state())
 
     def get_last_price(self):
         return self._last_price
@@ -548,77 +2971,131 @@ class Traderbot(threading.Thread, Trader):
     def is_simulation(self):
         return self._simulation_flag == 1
 
-    def truncate_float(self,value, precision):
-        if ( precision > 4):
-            precision = precision - 2
-        # Convert to string with enough precision
-        str_value = f"{value:.{precision + 2}f}"  # Add extra space to avoid rounding
-        # Find the decimal point
-        if '.' in str_value:
-            integer_part, decimal_part = str_value.split('.')
-            # Truncate the decimal part
-            truncated_decimal = decimal_part[:precision]
-            # Combine back the integer and truncated decimal parts
-            return f"{integer_part}.{truncated_decimal}" if truncated_decimal else integer_part
-        return str_value
-
-    @rate_limit(calls_per_second=5)  
-    def Send_Orders(self):
-        while self.running:
-            with self.pause_condition:
-                while self.paused:
-                    self.pause_condition.wait()
-            
+    def truncate_float(self, value, precision):
+        """Round ``value`` down to ``precision`` decimals"""
+        return quantize_down(value, Decimal(1).scaleb(-int(precision)))
+
+    async def _wait_if_paused(self):
+        while self.paused and self.running:
+            if self._resume_event is None:
+                self._resume_event = asyncio.Event()
+            self._resume_event.clear()
+            await self._resume_event.wait()
+
+    def _wake(self):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._set_resume_event)
+
+    def _set_resume_event(self):
+        # Runs on the loop, so it cannot slip between the paused check and the wait
+        if self._resume_event is not None:
+            self._resume_event.set()
+
+    def deliver_signal(self, storage_key, body=None, meta=None, keys=None):
+        """Queue an alert for this bot (poller or webhook); safe to call from any thread.
+
+        ``keys`` are the alert's signal index keys, released once the alert is handled.
+        """
+        if self._loop is None or self._loop.is_closed():
+            self._release_signal(keys)
+            return False
+        self._loop.call_soon_threadsafe(self._push_signal, (storage_key, body, meta, keys))
+        return True
+
+    def _release_signal(self, keys):
+        if keys:
+            get_signal_index().release(self.listener_email, *keys)
+
+    def _push_signal(self, item):
+        # Runs on the loop; an idle bot has no task, one is started for the first queued alert
+        self._signal_queue.append(item)
+        if not self._draining:
+            self._draining = True
+            self._task = self._loop.create_task(self.Send_Orders())
+
+    async def _consume_pushed_signals(self):
+        """Handle the queued alerts in order and return once the queue is empty"""
+        try:
+            while self.running and self._signal_queue:
+                storage_key, body, meta, keys = self._signal_queue.pop(0)
+                if self.paused:
+                    await self._wait_if_paused()
+                    # Like polling after a resume, only the newest alert counts
+                    while self._signal_queue:
+                        self._release_signal(keys)
+                        storage_key, body, meta, keys = self._signal_queue.pop(0)
+                    if not self.running:
+                        break
                 try:
-                    events = self._fetch_email_events()
-                    if events:
-                        self._process_email_events(events)
+                    if body is None:
+                        body = await self._load_body(storage_key)
+                    buckets = await self._reserve_tokens(storage_key, body)
+                    await bot_runtime.run_blocking(run_with_tokens, buckets, self._process_storage_item,
+                                                   storage_key, body, meta, keys)
                 except Exception as e:
                     log_event('error', f"Exception happened in Send_Orders{e}")
                     send_telegram_message(f"Exception happened in Send_Orders{e}")
+        finally:
+            self._draining = False
+            self._task = None
 
-            time.sleep(1)
-
-    def _fetch_email_events(self):
-        events_url = f"https://api.mailgun.net/v3/{domain_name}/events"
-        params = {
-            "event": "stored",
-            "ascending": "no",
-            "recipients": f"{self.listener_email}@{domain_name}",
-            "limit": 1
-        }
-        response = requests.get(events_url, auth=("api", API_KEY), params=params)
-        
-        if response.status_code == 200:
-            return response.json()
-        return None
+    async def _load_body(self, storage_key):
+        try:
+            return await load_message_body(storage_key)
+        except Exception as e:
+            # _process_storage_item downloads it again on its own
+            log_event('error', f"_{self.name}_ shared download of {storage_key} failed: {e}")
+            return None
+
+    async def _reserve_tokens(self, storage_key, body):
+        """Wait here, on the loop, for the rate limits the alert's requests will hit"""
+        buckets = []
+        if body is None and storage_key not in message_cache:
+            buckets.append(rate_limiters["mailgun_storage"])
+        buckets.extend(self._order_buckets())
+        for bucket in buckets:
+            await bucket.acquire_async()
+        return buckets
+
+    def _order_buckets(self):
+        return [] if self.is_simulation() else [rate_limiter_for("/v5/order/create")]
+
+    async def Send_Orders(self):
+        await self._consume_pushed_signals()
+
+    def _process_storage_item(self, storage_key, Body_plain_New=None, meta=None, keys=None):
+        signal_tracer.start(self.name, storage_key, meta)
+        try:
+            self._handle_signal(storage_key, Body_plain_New)
+        finally:
+            signal_tracer.finish()
+            with self._trade_lock:
+                self._journal_state()
+            # Only now may a restart skip this alert
+            self._release_signal(keys)
+
+    def _handle_signal(self, storage_key, Body_plain_New):
+        if Body_plain_New is None:
+            with signal_tracer.span('getmessagedata'):
+                Body_plain_New = getmessagedata(storage_key)
+        with signal_tracer.span('command_filter'):
+            command = command_filter(Body_plain_New)
+
+        with self._trade_lock:
+            if command != self._last_command_received:
+                if self._skip_next_signal == 0:
+                    result = self.Execute_Orders(command)
+                    if result == 1:
+                        return
+                    send_telegram_message("----------------------------------------")
+                else:
+                    self._skip_next_signal = 0
 
-    def _process_email_events(self, data):
-        for item in data.get("items", []):
-            storage = item.get('storage', {})
-            if storage:
-                storage_key = storage.get('key')
-                if storage_key:
-                    self._process_storage_item(storage_key)
-
-    def _process_storage_item(self, storage_key):
-        Body_plain_New = getmessagedata(storage_key)
-        command = command_filter(Body_plain_New)
-        
-        if command != self._last_command_received:
-            if self._skip_next_signal == 0:
-                result = self.Execute_Orders(command)
-                if result == 1:
-                    return
-                send_telegram_message("----------------------------------------")
-            else:
-                self._skip_next_signal = 0
-        
-        self._last_command_received = command
+            self._last_command_received = command
 
-    @rate_limit(calls_per_second=5)  
     def Execute_Orders(self,command):
-        success, message = self.order_executor.execute_order(command, self._last_price)
+        with signal_tracer.span('execute_order'):
+            success, message, fill = self.order_executor.execute_order(command, self._last_price)
         if not success:
             send_telegram_message(f"_{self.name}_ *{self.mode} Mode* : {message}")
             log_event('error', f"_{self.name}_ *{self.mode} Mode* : {message}")
@@ -628,28 +3105,29 @@ class Traderbot(threading.Thread, Trader):
         gmt_plus_7_time = current_utc_time + timedelta(hours=7)
         timestamp_of_order = gmt_plus_7_time.strftime("%Y-%m-%d %H:%M:%S")
         self._order_counter = self._order_counter + 1 
+        entry_price = self._last_price
 
+        # The order is at the exchange now, everything below is bookkeeping
         try:
-            response = self._cl.get_tickers(category="spot", symbol=f"{self.symbol}")
-            current_price = float(response['result']['list'][0]['lastPrice'])
-            resultoftrade = "" 
+            with signal_tracer.span('fill_price'):
+                current_price = self.order_executor.get_fill_price(fill)
             if(command == "Sell" ):
                 percentage_change = ((current_price - self._last_price) / self._last_price) * 100
                 self._accumulated_percentage_change += percentage_change
                 if percentage_change > 0:
-                    resultoftrade = f"☘☘ Profit: +{percentage_change:.2f}%"
                     self._wins+=1
                 else:
-                    resultoftrade = f"❗❗ Loss: {percentage_change:.2f}%"
                     self._loses+=1
-
-                accumulated_percentage_change_str = f"{self._accumulated_percentage_change:.2f}%"
-                send_telegram_message(f"_{self.name}_ Executed `{command}` {self.symbol} at price *{current_price}* . _{resultoftrade}_ || all time : *{accumulated_percentage_change_str}* || Time : *{timestamp_of_order}* ")
-
             else:
-                send_telegram_message(f"_{self.name}_ Executed `{command}` {self.symbol} at price *{current_price}* . last price : *{self._last_price}* || Time : *{timestamp_of_order}*")
                 self._last_buy_price = current_price
             self._last_price = current_price
+            self._reindex_triggers()
+            if fill.get('order_id') is None:
+                send_telegram_message(self._order_message(command, current_price, entry_price, timestamp_of_order))
+            else:
+                # Reported once the exchange tells the average fill price
+                self.order_executor.resolve_fill_in_background(
+                    fill, partial(self._on_fill, command, self._order_counter, entry_price, current_price, timestamp_of_order))
 
         except Exception as e:
             send_telegram_message(f"_{self.name}_ *{self.mode} Mode* Unexpected error: {e}")
@@ -657,40 +3135,90 @@ class Traderbot(threading.Thread, Trader):
             return 1
 
         return 0
+
+    def _order_message(self, command, price, entry_price, timestamp_of_order):
+        if command == "Sell":
+            percentage_change = ((price - entry_price) / entry_price) * 100
+            if percentage_change > 0:
+                resultoftrade = f"☘☘ Profit: +{percentage_change:.2f}%"
+            else:
+                resultoftrade = f"❗❗ Loss: {percentage_change:.2f}%"
+            accumulated_percentage_change_str = f"{self._accumulated_percentage_change:.2f}%"
+            return f"_{self.name}_ Executed `{command}` {self.symbol} at price *{price}* . _{resultoftrade}_ || all time : *{accumulated_percentage_change_str}* || Time : *{timestamp_of_order}* "
+        return f"_{self.name}_ Executed `{command}` {self.symbol} at price *{price}* . last price : *{entry_price}* || Time : *{timestamp_of_order}*"
+
+    def _on_fill(self, command, order_number, entry_price, booked_price, timestamp_of_order, fill_price):
+        """Rebook an order at the exchange's average fill price once it is known, then report it"""
+        if fill_price is None or fill_price == booked_price:
+            send_telegram_message(self._order_message(command, booked_price, entry_price, timestamp_of_order))
+            return
+        with self._trade_lock:
+            if command == "Sell":
+                booked_change = ((booked_price - entry_price) / entry_price) * 100
+                percentage_change = ((fill_price - entry_price) / entry_price) * 100
+                self._accumulated_percentage_change += percentage_change - booked_change
+                if (booked_change > 0) != (percentage_change > 0):
+                    self._wins += 1 if percentage_change > 0 else -1
+                    self._loses += -1 if percentage_change > 0 else 1
+            # A later order already moved the entry price on
+            if self._order_counter == order_number:
+                if command == "Buy":
+                    self._last_buy_price = fill_price
+                self._last_price = fill_price
+                self._reindex_triggers()
+            self._journal_state()
+            send_telegram_message(self._order_message(command, fill_price, entry_price, timestamp_of_order))
         
     def Monitor_SL_TP(self):
-        while self.running:
-            with self.pause_condition:
-                while self.paused:
-                    self.pause_condition.wait()
-                try:
-                    current_price = self.market_monitor.get_current_price()
-                    if self.market_monitor.check_stop_loss(self._last_price, current_price, self.stop_loss_percent):
-                        send_telegram_message(f" _{self.name}_ *Stop LOSS* 🔴! : hit by *{self.stop_loss_percent}%*")
-                        self.Execute_Orders("Sell")
-                        self._skip_next_signal = 1
-                    if self.market_monitor.check_take_profit(self._last_price, current_price, self.take_profit_percent):
-                        send_telegram_message(f" _{self.name}_ *TAKE PROFIT* 🟦 ! : hit by *{self.take_profit_percent}%*")
-                        self.Execute_Orders("Sell")
-                        self._skip_next_signal = 1
-                except Exception as e:
-                    send_telegram_message(f"{e}")
-            time.sleep(10)
+        """Arm this bot's SL/TP levels in the shared trigger engine"""
+        trigger_engine.arm(self)
+        self.order_executor.prepare_sell_in_background()
+
+    def _reindex_triggers(self):
+        if trigger_engine.is_armed(self):
+            trigger_engine.index(self)
+
+    def on_trigger(self, kind):
+        """Called by the trigger engine when the price crossed one of our levels"""
+        if not self.running or self.paused:
+            return
+        with self._trade_lock:
+            try:
+                if kind == 'stop_loss':
+                    send_telegram_message(f" _{self.name}_ *Stop LOSS* 🔴! : hit by *{self.stop_loss_percent}%*")
+                else:
+                    send_telegram_message(f" _{self.name}_ *TAKE PROFIT* 🟦 ! : hit by *{self.take_profit_percent}%*")
+                self.Execute_Orders("Sell")
+                self._skip_next_signal = 1
+            except Exception as e:
+                send_telegram_message(f"{e}")
+            # Re-arm even if the sell failed so the next price update retries it
+            self._reindex_triggers()
+            self._journal_state()
 
     def manual_trigger(self,command):
-        if (command == "Buy"):
-            self.Execute_Orders("Buy")
-            self._skip_next_signal = 1
-            send_telegram_message(f" _{self.name}_ Executed manual_trigger)")
-        elif(command == "Sell"):
-            self.Execute_Orders("Sell")
-            self._skip_next_signal = 1
-            send_telegram_message(f" _{self.name}_ Executed manual_trigger)")
-
-    @rate_limit(calls_per_second=5)  
-    def listlast_commands(self):
+        with self._trade_lock:
+            if (command == "Buy"):
+                self.Execute_Orders("Buy")
+                self._skip_next_signal = 1
+                send_telegram_message(f" _{self.name}_ Executed manual_trigger)")
+            elif(command == "Sell"):
+                self.Execute_Orders("Sell")
+                self._skip_next_signal = 1
+                send_telegram_message(f" _{self.name}_ Executed manual_trigger)")
+            self._journal_state()
+
+    async def run_manual_trigger(self, command):
+        """``manual_trigger`` on the worker pool, its order's rate limit awaited on the loop"""
+        buckets = self._order_buckets()
+        for bucket in buckets:
+            await bucket.acquire_async()
+        await bot_runtime.run_blocking(run_with_tokens, buckets, self.manual_trigger, command)
+
+    async def listlast_commands(self):
+        """Last stored alerts of this bot; every Mailgun call waits for its rate limiter on the loop"""
         listlast_commands = []
-        events_url = f"https://api.mailgun.net/v3/{domain_name}/events"
+        events_url = f"{MAILGUN_API_BASE}/{domain_name}/events"
 
         params = {
             "event": "stored",  
@@ -698,7 +3226,7 @@ class Traderbot(threading.Thread, Trader):
             "recipients": f"{self.listener_email}@{self.domain_name}",
             "limit": 20
         }
-        response = requests.get(events_url, auth=("api", API_KEY), params=params)
+        response = await bot_runtime.run_limited(http_transport.get, events_url, auth=("api", API_KEY), params=params)
 
         if response.status_code == 200:
             data = response.json()
@@ -710,7 +3238,7 @@ class Traderbot(threading.Thread, Trader):
                 if storage:
                     storage_key = storage.get('key')  # Get the storage key
                     if storage_key:
-                        Body_plain_New = getmessagedata(storage_key)
+                        Body_plain_New = await bot_runtime.run_limited(getmessagedata, storage_key)
                         command = Body_plain_New
                         dt_object = datetime.fromtimestamp(timestamp)  
                         dt_object += timedelta(hours=4)
@@ -718,49 +3246,71 @@ class Traderbot(threading.Thread, Trader):
 
         return listlast_commands
 
-    def run(self):
+    async def run_async(self):
+        """Coroutine body of the bot, scheduled on the shared runtime loop"""
+        self._loop = asyncio.get_running_loop()
+        # A plain list, not an asyncio.Queue: an idle bot holds no task, queue or event
+        self._signal_queue = []
+        try:
+            # Pollers and the webhook receiver find the bot from here on
+            bot_registry.add(self)
+        except ValueError as e:
+            send_telegram_message(f"{e}")
+            return
         send_telegram_message(f"BOT *{self.name}* Started ```{self.symbol} {self.amount} {self.mode} {self.listener_email} ```")
 
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            future1 = executor.submit(self.Send_Orders)
-            future2 = executor.submit(self.Monitor_SL_TP)
-
-            while True:
-                try:
-                    future1.result(timeout=None)  
-                except Exception as e:
-                    send_telegram_message(f"Error occurred in send orders: {e}")
-                    
-                try:
-                    future2.result(timeout=None)
-                except Exception as e:
-                    send_telegram_message(f"Error occurred in monitor sl tp: {e}")
+        try:
+            self.Monitor_SL_TP()
+        except Exception as e:
+            send_telegram_message(f"Error occurred in monitor sl tp: {e}")
 
-                time.sleep(0.1)  
+    def run(self):
+        """Run the bot in the calling thread until it is stopped"""
+        async def run_until_stopped():
+            await self.run_async()
+            while self.running:
+                await asyncio.sleep(1)
+        asyncio.run(run_until_stopped())
+
+    def start(self):
+        """Schedule the bot on the shared runtime loop"""
+        self._task = bot_runtime.spawn(self.run_async())
+        # Started bots sit without a task until an alert arrives
+        self._task.add_done_callback(self._forget_task)
+
+    def _forget_task(self, task):
+        if self._task is task:
+            self._task = None
 
     def stop(self):
         self.running = False
-        Traderbot._active_threads.remove(self)  
+        # Registry subscribers drop the SL/TP levels and the price subscription
+        bot_registry.remove(self)
         self.resume()  
         send_telegram_message(f"*{self.name}* is Stopping ...")
 
     def pause(self):
-        with self.pause_condition:
-            self.paused = True
-            send_telegram_message(f"*{self.name}* is Paused")
+        self.paused = True
+        send_telegram_message(f"*{self.name}* is Paused")
+        self._journal_state()
 
     def resume(self):
-        with self.pause_condition:
-            self.paused = False
-            self.pause_condition.notify()  
-            self.pause_condition.notify()  
-            send_telegram_message(f"*{self.name}* is resumed")
+        self.paused = False
+        self._wake()
+        send_telegram_message(f"*{self.name}* is resumed")
+        # Levels that fired while paused were dropped from the book
+        self._reindex_triggers()
+        self._journal_state()
 
     def set_TP(self, take_profit_percent):
         self.take_profit_percent = take_profit_percent
+        self._reindex_triggers()
+        self._journal_state()
 
     def set_ST(self, stop_loss_percent):
         self.stop_loss_percent = stop_loss_percent
+        self._reindex_triggers()
+        self._journal_state()
 
     def update_parameter(self, parameter_type, value):
         """Update trading parameters (Observer pattern)"""
@@ -770,6 +3320,8 @@ class Traderbot(threading.Thread, Trader):
         elif parameter_type == 'stop_loss':
             self.stop_loss_percent = value
             log_event('info', f"Bot {self.name}: Stop loss updated to {value}%")
+        self._reindex_triggers()
+        self._journal_state()
 
     def execute_buy(self):
         """Execute a buy order using ByBit API"""
@@ -781,8 +3333,7 @@ class Traderbot(threading.Thread, Trader):
     
     def get_current_price(self):
         """Get current price from ByBit"""
-        response = self._cl.get_tickers(category="spot", symbol=self.symbol)
-        return float(response['result']['list'][0]['lastPrice'])
+        return price_hub.get_price(self.symbol)
     
     def get_account_balance(self):
         """Get account balance from ByBit"""
@@ -794,13 +3345,13 @@ class TelegramNotifier:
         self.chat_id = chat_id
 
     def send_message(self, message, parse_mode="Markdown"):
-        url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
+        url = f"{TELEGRAM_API_BASE}/bot{self.bot_token}/sendMessage"
         payload = {
             "chat_id": self.chat_id,
             "text": message,
             "parse_mode": parse_mode
         }
-        response = requests.post(url, json=payload)
+        response = call_rate_limited(http_transport.post, url, json=payload)
         return response.status_code == 200
 
 class MessageService:
@@ -811,14 +3362,14 @@ class MessageService:
         
     def send_message(self, message, parse_mode="Markdown"):
         """Send a message directly without using a notifier"""
-        url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
+        url = f"{TELEGRAM_API_BASE}/bot{self.bot_token}/sendMessage"
         payload = {
             "chat_id": self.chat_id,
             "text": message,
             "parse_mode": parse_mode
         }
         try:
-            response = requests.post(url, json=payload)
+            response = call_rate_limited(http_transport.post, url, json=payload)
             return response.status_code == 200
         except Exception as e:
             log_event('error', f"Error sending message: {e}")
@@ -837,11 +3388,21 @@ class MessageService:
         return self.send_message(message)
 
 def get_active_threads():
-    if not Traderbot._active_threads:
+    return bot_registry.names()
+
+def restore_bots():
+    """Recreate the bots saved in the state journal; the caller starts them"""
+    journal = get_bot_journal()
+    if journal is None:
         return []
-    return [thread.name for thread in Traderbot._active_threads]
+    restored = []
+    for name, state in journal.bots().items():
+        try:
+            restored.append(Traderbot.from_state(state))
+        except Exception as e:
+            log_event('error', f"Could not restore bot {name}: {e}")
+    return restored
 
-botlists = []
 selected_bot_name = None
 NAME, DETAILS, EMAIL, SIMORREAL, GET_TP, GET_SL, CHOICE = range(7)
 
@@ -854,8 +3415,10 @@ def start_new_bot(user_data):
     get_sl = user_data['get_sl']
     symbol, amount_str = details.split()
     amount = float(amount_str)
+    if name in bot_registry:
+        send_telegram_message(f"A bot named *{name}* is already running")
+        return
     new_bot = Traderbot(id_t=name,symbol=symbol,tp=get_tp, sl=get_sl , amount=amount,mode=simorreal,listener_email=email)
-    botlists.append(user_data['name'])
     new_bot.start()
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -921,13 +3484,15 @@ async def cancel(update: Update, context: CallbackContext) -> int:
 
 async def balance(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None: 
     if str(update.message.chat_id) in user_manager.users:
-        balance = get_account_balance()
-        balance_rub = get_usdt_to_rub(balance)
-        send_telegram_message(f"```Account USD : {balance}\n RUB : {balance_rub} ```")            
-
+        await bot_runtime.run_limited(balance_func)
     else:
         await update.message.reply_text("You're not authorized to use this bot.")
 
+def balance_func():
+    balance = get_account_balance()
+    balance_rub = get_usdt_to_rub(balance)
+    send_telegram_message(f"```Account USD : {balance}\n RUB : {balance_rub} ```")
+
 async def set_tp(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if str(update.message.chat_id) in user_manager.users:
         keyboard = [
@@ -953,7 +3518,7 @@ async def handle_takeprofit_selection(update: Update, context: ContextTypes.DEFA
 def set_tp_func(selected_take_profit):
     trading_params = TradingParameters()
     
-    for thread in Traderbot._active_threads:
+    for thread in bot_registry:
         trading_params.register_observer(thread)
     
     trading_params.set_take_profit(selected_take_profit)
@@ -983,29 +3548,30 @@ async def handle_stoploss_selection(update: Update, context: ContextTypes.DEFAUL
 def set_st_func(selected_stop_loss):
     trading_params = TradingParameters()
     
-    for thread in Traderbot._active_threads:
+    for thread in bot_registry:
         trading_params.register_observer(thread)
     
     trading_params.set_stop_loss(selected_stop_loss)
 
 async def list_signals(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None: 
     if str(update.message.chat_id) in user_manager.users:
-        list_signals_func(selected_bot_name)
+        await list_signals_func(selected_bot_name)
     else:
         await update.message.reply_text("You're not authorized to use this bot.")
 
-def list_signals_func(bot_name):
-    for thread in Traderbot._active_threads:
-        if thread.name==bot_name:
-            listx = thread.listlast_commands()
-            send_telegram_message(f"{listx}")
+async def list_signals_func(bot_name):
+    thread = bot_registry.get(bot_name)
+    if thread is not None:
+        listx = await thread.listlast_commands()
+        send_telegram_message(f"{listx}")
 
 async def list_bots(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if str(update.message.chat_id) in user_manager.users:
-        if not not botlists:
+        names = bot_registry.names()
+        if names:
             keyboard = [
                 [InlineKeyboardButton(f"{val}", callback_data=f"select_bot_{val}")]
-                for val in botlists
+                for val in names
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             await update.message.reply_text("List of running bots :", reply_markup=reply_markup)
@@ -1026,51 +3592,64 @@ async def select_bot_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 async def show_bot_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None: 
     if str(update.message.chat_id) in user_manager.users:
-        show_bot_status_func(selected_bot_name)
+        await bot_runtime.run_limited(show_bot_status_func, selected_bot_name)
     else:
         await update.message.reply_text("You're not authorized to use this bot.")
 
 def escape_markdown(text):
     return re.sub(r'([*_`\[\]])', r'\\\1', text)
 
+def unrealized_pl(amount, last_price, price, holding):
+    """Base-coin P/L of an open position at ``price``, less the fee of the sell closing it; 0 when flat.
+
+    Takes floats for one bot or arrays for the fleet, so ``/show_bot_status``
+    and ``/portfolio`` report the same figures.
+    """
+    return np.where(holding, amount * price / last_price - amount - amount * TRADING_FEE, 0.0)
+
+def realized_pl(amount, accumulated_percentage_change, orders):
+    """Base-coin P/L of the closed trades, less the fee of every order"""
+    return amount * (accumulated_percentage_change / 100 - orders * TRADING_FEE)
+
+def holds_position(bot):
+    return bot.get_last_command() == "Buy"
+
 def show_bot_status_func(bot_name):
-    for thread in Traderbot._active_threads:
-        if thread.name==bot_name:
-            cl = thread._cl
-            response = cl.get_tickers(category="spot", symbol=f"{thread.symbol}")
-            current_price = float(response['result']['list'][0]['lastPrice'])
-            if (thread.get_last_command() == "Buy" or thread.get_order_counter() != 0 ):      
-                current_pl = ((current_price*thread.amount) / thread.get_last_price()) - thread.amount
-                current_pl = current_pl - (thread.amount * (1 * 00.1 ))
-                current_pl_percentage = (current_pl / thread.amount) * 100
-                current_pl_percentage = round(current_pl_percentage,3)
-                current_pl = current_pl * current_price  
-                current_pl = round(current_pl,3)
-                current_pl_RUB = get_usdt_to_rub(current_pl)
-                current_pl_RUB = round(current_pl_RUB,2)
-            else:
-                current_pl = 0
-                current_pl_RUB = 0
-                current_pl_percentage = 0 
-
-            amount_of_trade_in_rub = thread.amount * current_price
-            amount_of_trade_in_rub = get_usdt_to_rub(amount_of_trade_in_rub)
-            amount_of_trade_in_rub = round(amount_of_trade_in_rub,2)
-            Realized_pl = thread.amount * ((thread.get_accumulated_percentage_change() / 100) - (thread.get_order_counter() * 0.001 ))
-            Realized_pl_percentage = (Realized_pl / thread.amount) * 100
-            Realized_pl_percentage = round(Realized_pl_percentage,3)
-            Realized_pl = Realized_pl * current_price
-            Realized_pl = round(Realized_pl,3)
-            Realized_pl_RUB = get_usdt_to_rub(Realized_pl)
-            Realized_pl_RUB = round(Realized_pl_RUB,2)
-            if thread.paused == True :
-                appended = "Paused🔄"
-            else :
-                appended = "Running 🟩"
-
-            escaped_email = escape_markdown(thread.listener_email)
-            escaped_name = escape_markdown(bot_name)
-            message = (f"""BOT *{escaped_name}* is *{appended}* : ```
+    thread = bot_registry.get(bot_name)
+    if thread is None:
+        return
+    current_price = price_hub.get_price(thread.symbol)
+    if holds_position(thread):
+        current_pl = float(unrealized_pl(thread.amount, thread.get_last_price(), current_price, True))
+        current_pl_percentage = (current_pl / thread.amount) * 100
+        current_pl_percentage = round(current_pl_percentage,3)
+        current_pl = current_pl * current_price  
+        current_pl = round(current_pl,3)
+        current_pl_RUB = get_usdt_to_rub(current_pl)
+        current_pl_RUB = round(current_pl_RUB,2)
+    else:
+        current_pl = 0
+        current_pl_RUB = 0
+        current_pl_percentage = 0 
+
+    amount_of_trade_in_rub = thread.amount * current_price
+    amount_of_trade_in_rub = get_usdt_to_rub(amount_of_trade_in_rub)
+    amount_of_trade_in_rub = round(amount_of_trade_in_rub,2)
+    Realized_pl = realized_pl(thread.amount, thread.get_accumulated_percentage_change(), thread.get_order_counter())
+    Realized_pl_percentage = (Realized_pl / thread.amount) * 100
+    Realized_pl_percentage = round(Realized_pl_percentage,3)
+    Realized_pl = Realized_pl * current_price
+    Realized_pl = round(Realized_pl,3)
+    Realized_pl_RUB = get_usdt_to_rub(Realized_pl)
+    Realized_pl_RUB = round(Realized_pl_RUB,2)
+    if thread.paused == True :
+        appended = "Paused🔄"
+    else :
+        appended = "Running 🟩"
+
+    escaped_email = escape_markdown(thread.listener_email)
+    escaped_name = escape_markdown(bot_name)
+    message = (f"""BOT *{escaped_name}* is *{appended}* : ```
         - symbol : {thread.symbol}
         - amount : {thread.amount}
         - amount RUB : {amount_of_trade_in_rub}
@@ -1093,7 +3672,130 @@ def show_bot_status_func(bot_name):
         - skip_next_signal : {thread._skip_next_signal}
 
                     ```""")
-            send_telegram_message(message)
+    send_telegram_message(message)
+
+def fleet_pnl(bots):
+    """P/L of many bots at once, as arrays in the order of ``bots``.
+
+    Reads the columns of the BotStateTable each bot lives in, one price hub
+    snapshot for every symbol and the cached RUB rate, then computes
+    everything as array operations with the ``/show_bot_status`` formulas.
+    Values are in USDT.
+    """
+    groups = {}
+    for position, bot in enumerate(bots):
+        positions, rows = groups.setdefault(bot.state._table, ([], []))
+        positions.append(position)
+        rows.append(bot.state.row)
+
+    def column(name):
+        values = np.empty(len(bots), dtype=BotStateTable.columns[name])
+        for table, (positions, rows) in groups.items():
+            values[positions] = np.asarray(table.column(name))[rows]
+        return values
+
+    amount, last_price = column('amount'), column('last_price')
+    orders, wins, losses = column('order_counter'), column('wins'), column('losses')
+    accumulated = column('accumulated_percentage_change')
+
+    symbols, symbol_index = np.unique([bot.symbol for bot in bots], return_inverse=True)
+    prices = price_hub.get_prices(list(symbols))
+    price = np.array([prices.get(symbol, np.nan) for symbol in symbols])[symbol_index]
+    holding = np.fromiter((holds_position(bot) for bot in bots), dtype=bool, count=len(bots))
+
+    unrealized = unrealized_pl(amount, last_price, price, holding) * price
+    realized = realized_pl(amount, accumulated, orders) * price
+    closed = wins + losses
+    with np.errstate(invalid='ignore', divide='ignore'):
+        win_rate = np.where(closed > 0, wins / closed * 100, np.nan)
+    return {
+        'name': [bot.name for bot in bots],
+        'symbol': symbols[symbol_index],
+        'price': price,
+        'orders': orders,
+        'unrealized': unrealized,
+        'realized': realized,
+        'total': unrealized + realized,
+        'win_rate': win_rate,
+        'rub_rate': fx_rates.rate("RUB"),
+        'fleet_win_rate': wins.sum() / closed.sum() * 100 if closed.sum() else None,
+    }
+
+def format_portfolio(pnl, page=1, page_size=20):
+    """One page of the fleet P/L table, best total first; returns ``(text, pages)``"""
+    count = len(pnl['name'])
+    pages = max(1, -(-count // page_size))
+    page = min(max(1, page), pages)
+    order = np.argsort(-np.nan_to_num(pnl['total'], nan=-np.inf), kind='stable')
+    shown = order[(page - 1) * page_size:page * page_size]
+    total = float(np.nansum(pnl['total']))
+    fleet_win_rate = "-" if pnl['fleet_win_rate'] is None else f"{pnl['fleet_win_rate']:.1f}%"
+    lines = [
+        f"Portfolio : {count} bots, page {page}/{pages}",
+        f"Total P/L : {total:.3f} USD ({total * pnl['rub_rate']:.2f} RUB)",
+        f"Realized : {float(np.nansum(pnl['realized'])):.3f} USD  Unrealized : {float(np.nansum(pnl['unrealized'])):.3f} USD",
+        f"Win rate : {fleet_win_rate}",
+        "",
+        f"{'bot':<12} {'symbol':<9} {'unreal':>9} {'real':>9} {'total':>9} {'win%':>6} {'orders':>6}",
+    ]
+    for i in shown:
+        win_rate = "-" if np.isnan(pnl['win_rate'][i]) else f"{pnl['win_rate'][i]:.1f}"
+        lines.append(f"{pnl['name'][i][:12]:<12} {pnl['symbol'][i]:<9} {pnl['unrealized'][i]:>9.3f} "
+                     f"{pnl['realized'][i]:>9.3f} {pnl['total'][i]:>9.3f} {win_rate:>6} {pnl['orders'][i]:>6}")
+    if page < pages:
+        lines.append(f"/portfolio {page + 1} for the next page")
+    return "\n".join(lines), pages
+
+def portfolio_func(page=1):
+    bots = bot_registry.snapshot()
+    if not bots:
+        send_telegram_message("You do not have any active bots")
+        return
+    text, _ = format_portfolio(fleet_pnl(bots), page)
+    send_telegram_message("```\n" + text + "\n```")
+
+async def portfolio(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if str(update.message.chat_id) in user_manager.users:
+        try:
+            page = int(context.args[0]) if context.args else 1
+        except ValueError:
+            await update.message.reply_text("Usage: /portfolio [page]")
+            return
+        await bot_runtime.run_blocking(portfolio_func, page)
+    else:
+        await update.message.reply_text("You're not authorized to use this bot.")
+
+async def http_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if str(update.message.chat_id) in user_manager.users:
+        lines = [f"{host} : calls {s['calls']} errors {s['errors']} p50 {s['p50_ms']} ms p99 {s['p99_ms']} ms"
+                 for host, s in sorted(http_transport.stats().items())]
+        cache = message_cache.stats()
+        lines.append(f"message cache : size {cache['size']} hits {cache['hits']} misses {cache['misses']}")
+        with _rate_limiters_lock:
+            buckets = sorted(rate_limiters.items())
+        for name, bucket in buckets:
+            b = bucket.stats()
+            lines.append(f"{name} : rate {b['rate']}/s calls {b['acquired']} rejected {b['rejected']} waited {b['waited']} avg {b['avg_wait_ms']} ms max {b['max_wait_ms']} ms")
+        send_telegram_message("```\n" + "\n".join(lines) + "\n```")
+    else:
+        await update.message.reply_text("You're not authorized to use this bot.")
+
+async def latency(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if str(update.message.chat_id) in user_manager.users:
+        try:
+            last_n = int(context.args[0]) if context.args else 100
+        except ValueError:
+            await update.message.reply_text("Usage: /latency [last_n]")
+            return
+        stats = signal_tracer.percentiles(last_n)
+        if not stats:
+            await update.message.reply_text("No traced signals yet (set tracing_enabled = True)")
+            return
+        lines = [f"{stage} : p50 {s['p50']:.1f} p95 {s['p95']:.1f} p99 {s['p99']:.1f} ms (n={s['count']})"
+                 for stage, s in stats.items()]
+        send_telegram_message("```\n" + "\n".join(lines) + "\n```")
+    else:
+        await update.message.reply_text("You're not authorized to use this bot.")
 
 async def echo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if str(update.message.chat_id) in user_manager.users:
@@ -1123,9 +3825,9 @@ async def handle_trigger_signal_selection(update: Update, context: ContextTypes.
         if (query.data == "trigger_signal_Green"):
             if selected_bot_name:
                 await query.edit_message_text(text=f"🔵 Buying ...")
-                for thread in Traderbot._active_threads:
-                    if thread.name==selected_bot_name:
-                        thread.manual_trigger("Buy")
+                thread = bot_registry.get(selected_bot_name)
+                if thread is not None:
+                    await thread.run_manual_trigger("Buy")
         
             else:
                 await update.message.reply_text("Select a bot first with /list_bots")
@@ -1133,9 +3835,9 @@ async def handle_trigger_signal_selection(update: Update, context: ContextTypes.
         if (query.data == "trigger_signal_Red"):
             if selected_bot_name:
                 await query.edit_message_text(text=f"🔴 Selling  ...")
-                for thread in Traderbot._active_threads:
-                    if thread.name==selected_bot_name:
-                        thread.manual_trigger("Sell")
+                thread = bot_registry.get(selected_bot_name)
+                if thread is not None:
+                    await thread.run_manual_trigger("Sell")
         
             else:
                 await update.message.reply_text("Select a bot first with /list_bots")
@@ -1145,10 +3847,9 @@ async def handle_trigger_signal_selection(update: Update, context: ContextTypes.
 async def stop_bot(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None: 
     if str(update.message.chat_id) in user_manager.users:
         if selected_bot_name:
-            for thread in Traderbot._active_threads:
-                if thread.name==selected_bot_name:
-                    thread.stop()
-                    botlists.remove(str(selected_bot_name))
+            thread = bot_registry.get(selected_bot_name)
+            if thread is not None:
+                thread.stop()
         
         else:
             await update.message.reply_text("Select a bot first with /list_bots")     
@@ -1159,9 +3860,9 @@ async def stop_bot(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 async def resume_bot(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None: 
     if str(update.message.chat_id) in user_manager.users:
         if selected_bot_name:
-            for thread in Traderbot._active_threads:
-                if thread.name==selected_bot_name:
-                    thread.resume()
+            thread = bot_registry.get(selected_bot_name)
+            if thread is not None:
+                thread.resume()
         
         else:
             await update.message.reply_text("Select a bot first with /list_bots")     
@@ -1179,10 +3880,13 @@ async def help_general(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
             /stop_bot: Stops and deletes the selected bot instance.\
             /list_bots: Lists all active bot instances.\
             /show_bot_status: Displays the current status of the selected bot.\
+            /portfolio [page]: Shows the P/L and win rate of every bot in one table.\
             /list_signals: Shows the last few received trading signals.\
             /set_st: Configures stop-loss for the selected bot instance.\
             /set_tp: Configures take-profit for the selected bot instance.\
             /trigger_signal: Manually triggers a buy or sell command. \
+            /http_stats: Shows connection pool latency per API host and rate limiter wait times. \
+            /latency [N]: Shows p50/p95/p99 per stage for the last N traced signals. \
             /secret_command : Changable command to a secret one. to authorize new telegram users to use the bot.")      
 
     else:
@@ -1195,8 +3899,19 @@ async def add_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     else:
         await update.message.reply_text("command failed")
 
+async def on_startup(application) -> None:
+    """Run the trading bots on the telegram Application loop and warm the shared caches"""
+    bot_runtime.attach(asyncio.get_running_loop())
+    bot_runtime.submit_blocking(instrument_cache._safe_refresh)
+    for trader in restore_bots():
+        trader.start()
+
 def run_bot() -> None:
-    application = Application.builder().token(bot_token).build()
+    global webhook_receiver
+    application = Application.builder().token(bot_token).post_init(on_startup).build()
+    if signal_source == "webhook":
+        webhook_receiver = MailgunWebhookReceiver(MAILGUN_WEBHOOK_SIGNING_KEY, webhook_host, webhook_port)
+        webhook_receiver.start()
     conversation_handler = ConversationHandler(
         entry_points=[CommandHandler('create_bot', create_bot)],
         states={
@@ -1219,11 +3934,14 @@ def run_bot() -> None:
     application.add_handler(CommandHandler("list_signals", list_signals))
     application.add_handler(CommandHandler("list_bots", list_bots))
     application.add_handler(CommandHandler("show_bot_status", show_bot_status))
+    application.add_handler(CommandHandler("portfolio", portfolio))
     application.add_handler(CommandHandler("set_st", set_st))
     application.add_handler(CommandHandler("set_tp", set_tp))
     application.add_handler(CommandHandler("stop_bot", stop_bot))
     application.add_handler(CommandHandler("resume_bot", resume_bot))
     application.add_handler(CommandHandler("trigger_signal", trigger_signal))
+    application.add_handler(CommandHandler("http_stats", http_stats))
+    application.add_handler(CommandHandler("latency", latency))
     application.add_handler(CommandHandler("help", help_general))
     application.add_handler(CommandHandler(f"{secret_command}", add_user))
     application.add_handler(CallbackQueryHandler(handle_stoploss_selection, pattern=r"stop_loss_"))
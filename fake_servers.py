@@ -0,0 +1,290 @@
+"""Local stand-ins for the Mailgun, Bybit and Telegram HTTP APIs used by bot.py.
+
+Each server answers only the routes the bot calls, with an injectable latency
+and error rate, and counts calls per route. Point bot.py at them with
+``MAILGUN_API_BASE``, ``BYBIT_ENDPOINT`` and ``TELEGRAM_API_BASE``.
+"""
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class FakeServer:
+    """Threaded HTTP server that serves JSON routes with simulated latency and failures"""
+    def __init__(self, latency=0.0, error_rate=0.0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = {}
+        self.call_times = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+        self._routes = self.routes()
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def call_counts(self):
+        with self._lock:
+            return dict(self.calls)
+
+    def times_of(self, route, since=0.0):
+        """Arrival times of the calls to ``route`` made after ``since``"""
+        with self._lock:
+            return [t for t in self.call_times.get(route, ()) if t >= since]
+
+    def routes(self):
+        """List of ``(method, compiled path regex, route name, handler)``"""
+        return []
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server._handle(self, "GET")
+
+            def do_POST(self):
+                server._handle(self, "POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _resolve(self, method, path):
+        for route_method, pattern, name, handler in self._routes:
+            match = pattern.fullmatch(path)
+            if route_method == method and match:
+                return name, handler, match
+        return None, None, None
+
+    def _handle(self, request, method):
+        parts = urlsplit(request.path)
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        length = int(request.headers.get('Content-Length') or 0)
+        body = request.rfile.read(length) if length else b""
+        name, handler, match = self._resolve(method, parts.path)
+        with self._lock:
+            self.calls[name or "unknown"] = self.calls.get(name or "unknown", 0) + 1
+            self.call_times.setdefault(name or "unknown", []).append(time.time())
+        if self.latency:
+            time.sleep(self.latency)
+        if handler is None:
+            status, payload = 404, {"message": f"No route for {method} {parts.path}"}
+        elif random.random() < self.error_rate:
+            status, payload = 503, {"message": "Injected failure"}
+        else:
+            status, payload = handler(match, query, body)
+        data = json.dumps(payload).encode("utf-8")
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+
+class FakeMailgun(FakeServer):
+    """Mailgun events and stored messages API of one domain.
+
+    ``publish`` stores an alert the way a Mailgun route would; the events API
+    pages it out with ``paging.next`` cursors like the real one.
+    """
+    def __init__(self, domain, **kwargs):
+        self.domain = domain
+        self.events = []
+        self.messages = {}
+        self._ids = itertools.count(1)
+        super().__init__(**kwargs)
+
+    @property
+    def api_base(self):
+        return f"{self.base_url}/v3"
+
+    def routes(self):
+        domain = re.escape(self.domain)
+        return [
+            ("GET", re.compile(rf"/v3/{domain}/events"), "events", self._events),
+            ("GET", re.compile(rf"/v3/domains/{domain}/messages/(?P<key>[^/]+)"), "messages", self._message),
+        ]
+
+    def publish(self, recipient, body):
+        """Store an alert for ``recipient`` (listener_email) and return its storage key"""
+        with self._lock:
+            number = next(self._ids)
+            storage_key = f"key-{number}"
+            self.messages[storage_key] = body
+            self.events.append({
+                "id": f"event-{number}",
+                "event": "stored",
+                "timestamp": time.time(),
+                "recipient": f"{recipient}@{self.domain}",
+                "storage": {"key": storage_key, "url": f"{self.api_base}/domains/{self.domain}/messages/{storage_key}"},
+            })
+        return storage_key
+
+    def _events(self, match, query, body):
+        limit = int(query.get("limit", 300))
+        with self._lock:
+            if "cursor" in query:
+                start = int(query["cursor"])
+                events = self.events[start:]
+            else:
+                begin = float(query.get("begin", 0))
+                start = next((i for i, event in enumerate(self.events) if event["timestamp"] >= begin), len(self.events))
+                events = self.events[start:]
+            if "recipients" in query:
+                events = [event for event in events if event["recipient"] == query["recipients"]]
+            if query.get("ascending") == "no":
+                events = events[::-1]
+            items = events[:limit]
+        next_start = start + len(items) if "recipients" not in query else start
+        next_url = f"{self.api_base}/{self.domain}/events?cursor={next_start}&limit={limit}"
+        return 200, {"items": items, "paging": {"next": next_url}}
+
+    def _message(self, match, query, body):
+        with self._lock:
+            text = self.messages.get(match.group("key"))
+        if text is None:
+            return 404, {"message": "Message not found"}
+        return 200, {"body-plain": text}
+
+
+class FakeBybit(FakeServer):
+    """Bybit v5 spot REST endpoints used by the bot.
+
+    Market orders fill immediately at the current price. Wallet balances are
+    fixed, so any number of bots can keep buying and selling on one key.
+    """
+    def __init__(self, prices=None, balances=None, **kwargs):
+        self.prices = dict(prices or {"BTCUSDT": 60000.0, "ETHUSDT": 3000.0})
+        self.balances = dict(balances or {"USDT": 100000.0, "BTC": 1.0, "ETH": 10.0})
+        self.orders = []
+        self._order_ids = itertools.count(1)
+        super().__init__(**kwargs)
+
+    def routes(self):
+        return [
+            ("GET", re.compile(r"/v5/market/tickers"), "get_tickers", self._tickers),
+            ("GET", re.compile(r"/v5/market/kline"), "get_kline", self._kline),
+            ("GET", re.compile(r"/v5/market/instruments-info"), "get_instruments_info", self._instruments),
+            ("POST", re.compile(r"/v5/order/create"), "place_order", self._place_order),
+            ("GET", re.compile(r"/v5/order/history"), "get_order_history", self._order_history),
+            ("GET", re.compile(r"/v5/account/wallet-balance"), "get_wallet_balance", self._wallet_balance),
+            ("GET", re.compile(r"/v5/asset/coin/query-info"), "get_coin_info", self._coin_info),
+        ]
+
+    def set_price(self, symbol, price):
+        with self._lock:
+            self.prices[symbol] = price
+
+    def order_times(self):
+        """Arrival time of every order received, in order"""
+        with self._lock:
+            return [order["received_at"] for order in self.orders]
+
+    @staticmethod
+    def _ok(result):
+        return 200, {"retCode": 0, "retMsg": "OK", "result": result, "retExtInfo": {}, "time": int(time.time() * 1000)}
+
+    def _tickers(self, match, query, body):
+        with self._lock:
+            prices = dict(self.prices)
+        if "symbol" in query:
+            prices = {query["symbol"]: prices.get(query["symbol"], 0.0)}
+        return self._ok({"category": "spot", "list": [{"symbol": symbol, "lastPrice": str(price)} for symbol, price in prices.items()]})
+
+    def _kline(self, match, query, body):
+        symbol = query.get("symbol", "BTCUSDT")
+        limit = int(query.get("limit", 200))
+        interval_ms = int(query.get("interval", 1)) * 60000 if str(query.get("interval", 1)).isdigit() else 86400000
+        with self._lock:
+            price = self.prices.get(symbol, 100.0)
+        now = int(time.time() * 1000) // interval_ms * interval_ms
+        rows = []
+        for i in range(limit):
+            # newest first, like Bybit
+            close = price * (1 + 0.001 * ((i * 7) % 11 - 5))
+            rows.append([str(now - i * interval_ms), str(close), str(close * 1.002), str(close * 0.998), str(close), "1", str(close)])
+        return self._ok({"category": "spot", "symbol": symbol, "list": rows})
+
+    def _instruments(self, match, query, body):
+        with self._lock:
+            symbols = list(self.prices)
+        return self._ok({"category": "spot", "nextPageCursor": "", "list": [{
+            "symbol": symbol,
+            "baseCoin": symbol[:-4],
+            "quoteCoin": "USDT",
+            "lotSizeFilter": {"basePrecision": "0.000001", "minOrderQty": "0.000048", "minOrderAmt": "1"},
+            "priceFilter": {"tickSize": "0.01"},
+        } for symbol in symbols]})
+
+    def _place_order(self, match, query, body):
+        params = json.loads(body or b"{}")
+        with self._lock:
+            order_id = str(next(self._order_ids))
+            self.orders.append({
+                "orderId": order_id,
+                "symbol": params.get("symbol"),
+                "side": params.get("side"),
+                "qty": params.get("qty"),
+                "avgPrice": str(self.prices.get(params.get("symbol"), 0.0)),
+                "cumExecQty": params.get("qty"),
+                "cumExecFee": "0",
+                "received_at": time.time(),
+            })
+        return self._ok({"orderId": order_id, "orderLinkId": ""})
+
+    def _order_history(self, match, query, body):
+        with self._lock:
+            orders = [dict(order) for order in self.orders if order["orderId"] == query.get("orderId")]
+        for order in orders:
+            order.pop("received_at")
+            order["orderStatus"] = "Filled"
+        return self._ok({"category": "spot", "list": orders})
+
+    def _wallet_balance(self, match, query, body):
+        with self._lock:
+            coins = [{"coin": coin, "walletBalance": str(amount), "availableToWithdraw": str(amount)}
+                     for coin, amount in self.balances.items()]
+        return self._ok({"list": [{"accountType": "UNIFIED", "coin": coins}]})
+
+    def _coin_info(self, match, query, body):
+        coin = query.get("coin", "BTC")
+        return self._ok({"rows": [{"coin": coin, "name": coin, "chains": [{"chain": coin, "minAccuracy": "8"}]}]})
+
+
+class FakeTelegram(FakeServer):
+    """Telegram Bot API ``sendMessage``; keeps every message it was sent"""
+    def __init__(self, **kwargs):
+        self.messages = []
+        super().__init__(**kwargs)
+
+    def routes(self):
+        return [("POST", re.compile(r"/bot[^/]+/sendMessage"), "sendMessage", self._send_message)]
+
+    def _send_message(self, match, query, body):
+        payload = json.loads(body or b"{}")
+        with self._lock:
+            self.messages.append(payload)
+            message_id = len(self.messages)
+        return 200, {"ok": True, "result": {"message_id": message_id, "text": payload.get("text")}}
@@ -0,0 +1,180 @@
+"""Scale test: how many Simulation-mode bots one process can run.
+
+Ramps the number of Traderbots through ``--steps`` against the local fakes of
+fake_servers.py. At every step it sends one Buy/Sell alert round to all bots,
+then samples for ``--duration`` seconds:
+
+- OS thread count, RSS and CPU % of the process
+- event-loop lag of the shared bot runtime loop (an ``asyncio.sleep`` probe)
+- GIL contention, as the oversleep of a thread waking every 5 ms
+- period drift of the Mailgun events poller and of the PriceHub refresh loop,
+  read from the arrival times of their calls at the fake servers
+- how long the alert round took until every bot had handled it
+
+Prints a table and writes one CSV row per step for plotting.
+
+    python scale_test.py --steps 10,100,500,1000 --csv scale_test.csv
+"""
+import argparse
+import asyncio
+import csv
+import sys
+import threading
+import time
+import tempfile
+
+from benchmark import configure_bot, cpu_seconds, current_rss_mb, wait_for
+from fake_servers import FakeBybit, FakeMailgun, FakeTelegram
+
+COLUMNS = [
+    "bots", "threads", "rss_mb", "cpu_percent",
+    "loop_lag_p50_ms", "loop_lag_max_ms", "gil_wait_p99_ms",
+    "poll_period_ms", "poll_drift_max_ms", "price_period_ms", "price_drift_max_ms",
+    "round_s", "handled",
+]
+
+
+class Probe:
+    """Samples event-loop lag and GIL wake-up delay in the background"""
+    def __init__(self, loop, loop_interval=0.1, thread_interval=0.005):
+        self.loop = loop
+        self.loop_interval = loop_interval
+        self.thread_interval = thread_interval
+        self.loop_lags = []
+        self.gil_waits = []
+        self.running = True
+        self._thread = threading.Thread(target=self._thread_probe, name="GilProbe", daemon=True)
+
+    def start(self):
+        asyncio.run_coroutine_threadsafe(self._loop_probe(), self.loop)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self._thread.join()
+
+    async def _loop_probe(self):
+        while self.running:
+            started = time.perf_counter()
+            await asyncio.sleep(self.loop_interval)
+            self.loop_lags.append((time.perf_counter() - started - self.loop_interval) * 1000)
+
+    def _thread_probe(self):
+        while self.running:
+            started = time.perf_counter()
+            time.sleep(self.thread_interval)
+            self.gil_waits.append((time.perf_counter() - started - self.thread_interval) * 1000)
+
+
+def quantile(values, q):
+    values = sorted(values)
+    return round(values[int(q * (len(values) - 1))], 2) if values else None
+
+
+def period_stats(times, interval):
+    """Mean period and worst drift from ``interval`` of a periodic caller, in ms"""
+    # Calls right after each other are pages of one cycle, not cycles
+    periods = [(b - a) * 1000 for a, b in zip(times, times[1:]) if b - a > interval / 4]
+    if not periods:
+        return None, None
+    return round(sum(periods) / len(periods), 1), round(max(p - interval * 1000 for p in periods), 1)
+
+
+def run_step(bot, bots, mailgun, bybit, count, args):
+    for i in range(len(bots), count):
+        trader = bot.Traderbot(id_t=f"scale{i}", symbol=args.symbol, mode="Simulation", listener_email=f"scale{i}")
+        trader.start()
+        bots.append(trader)
+    wait_for(lambda: all(trader._signal_queue is not None for trader in bots), 60)
+
+    probe = Probe(bot.bot_runtime.get_loop()).start()
+    cpu_started, started = cpu_seconds(), time.time()
+    threads_peak, rss_peak = threading.active_count(), current_rss_mb()
+
+    counters = [trader.get_order_counter() for trader in bots]
+    for trader in bots:
+        # Repeating the last command is a no-op for a bot, so flip each one
+        command = "Sell" if trader.get_last_command() == "Buy" else "Buy"
+        mailgun.publish(trader.listener_email, f"TradingView alert: {command} {args.symbol}")
+    handled = lambda: sum(trader.get_order_counter() > before for trader, before in zip(bots, counters))
+    done = wait_for(lambda: handled() == len(bots), args.duration)
+    round_s = round(time.time() - started, 2) if done else None
+
+    while time.time() - started < args.duration:
+        time.sleep(0.5)
+        threads_peak = max(threads_peak, threading.active_count())
+        rss_peak = max(rss_peak, current_rss_mb())
+    elapsed = time.time() - started
+    cpu_used = cpu_seconds() - cpu_started
+    probe.stop()
+
+    poll_period, poll_drift = period_stats(mailgun.times_of("events", started), bot.get_event_poller(mailgun.domain).interval)
+    price_period, price_drift = period_stats(bybit.times_of("get_tickers", started), bot.price_hub.interval)
+    return {
+        "bots": len(bots),
+        "threads": threads_peak,
+        "rss_mb": round(rss_peak, 1),
+        "cpu_percent": round(100 * cpu_used / elapsed, 1),
+        "loop_lag_p50_ms": quantile(probe.loop_lags, 0.50),
+        "loop_lag_max_ms": quantile(probe.loop_lags, 1.0),
+        "gil_wait_p99_ms": quantile(probe.gil_waits, 0.99),
+        "poll_period_ms": poll_period,
+        "poll_drift_max_ms": poll_drift,
+        "price_period_ms": price_period,
+        "price_drift_max_ms": price_drift,
+        "round_s": round_s,
+        "handled": handled(),
+    }
+
+
+def print_table(rows):
+    widths = [max(len(column), *(len(str(row[column])) for row in rows)) for column in COLUMNS]
+    print("  ".join(column.rjust(width) for column, width in zip(COLUMNS, widths)))
+    for row in rows:
+        print("  ".join(str(row[column]).rjust(width) for column, width in zip(COLUMNS, widths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", default="10,100,500,1000", help="comma separated bot counts")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds sampled per step")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Mailgun events poll interval")
+    parser.add_argument("--price-interval", type=float, default=5.0, help="PriceHub refresh interval")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="added latency of every fake API call")
+    parser.add_argument("--symbol", default="BTCUSDT")
+    parser.add_argument("--csv", default="scale_test.csv")
+    args = parser.parse_args(argv)
+    steps = sorted(int(step) for step in args.steps.split(","))
+
+    mailgun = FakeMailgun("scale.example.com", latency=args.latency_ms / 1000).start()
+    bybit = FakeBybit(latency=args.latency_ms / 1000).start()
+    telegram = FakeTelegram(latency=args.latency_ms / 1000).start()
+
+    import bot
+    configure_bot(bot, mailgun, bybit, telegram, tempfile.mkdtemp(prefix="bot-scale-"), args.poll_interval)
+    bot.signal_tracer.enabled = False
+    bot.price_hub.interval = args.price_interval
+
+    bots, rows = [], []
+    with open(args.csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        for count in steps:
+            row = run_step(bot, bots, mailgun, bybit, count, args)
+            rows.append(row)
+            writer.writerow(row)
+            f.flush()
+            print(f"{count} bots: {row}", file=sys.stderr)
+
+    for trader in bots:
+        trader.stop()
+    for server in (mailgun, bybit, telegram):
+        server.stop()
+    print_table(rows)
+    print(f"CSV written to {args.csv}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
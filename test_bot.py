@@ -8,7 +8,11 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.modules['telegram'] = MagicMock()
 sys.modules['telegram.ext'] = MagicMock()
 
-from bot import Traderbot, get_assets, start_new_bot, UserManager, set_tp_func, TelegramNotifier, MessageService
+from bot import Traderbot, get_assets, start_new_bot, set_tp_func, TelegramNotifier, MessageService
+try:
+    from bot import UserManager
+except ImportError:  # removed from bot.py; test_user_manager_anemic_domain_model fails without it
+    UserManager = None
 
 # ANSI color codes for terminal output
 GREEN = '\033[92m'
@@ -0,0 +1,940 @@
+import unittest
+from unittest.mock import patch, MagicMock, AsyncMock
+import sys
+import os
+import time
+import threading
+import hmac
+import hashlib
+import json
+import re
+import asyncio
+import random
+import tempfile
+import urllib.request
+import urllib.error
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+import requests
+from fake_servers import FakeBybit, FakeMailgun
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+sys.modules['telegram'] = MagicMock()
+sys.modules['telegram.ext'] = MagicMock()
+
+import bot
+import scale_test
+import backtest
+from benchmark import wait_for
+from bot import Traderbot
+from bot import PriceHub, TriggerBook, BotRuntime, MailgunWebhookReceiver, MailgunEventPoller, MessageCache, SignalIndex, HttpTransport, TelegramDispatcher, TokenBucket, FxRateService, InstrumentCache, WalletSnapshot, SignalTracer, KlineIndicators, MarketAnalyzer, KlineStore, MarketScanner, BotRegistry, BotJournal, BotStateTable
+
+def _mock_telegram():
+    """Initializer of spawned scanner workers, which import bot afresh"""
+    sys.modules['telegram'] = MagicMock()
+    sys.modules['telegram.ext'] = MagicMock()
+
+# ANSI color codes for terminal output
+GREEN = '\033[92m'
+RESET = '\033[0m'
+CHECK_MARK = '✓'
+
+class TestPerformance(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_response = {
+            'result': {
+                'list': [{
+                    'coin': [
+                        {'coin': 'USDT', 'availableToWithdraw': '100.0'},
+                        {'coin': 'BTC', 'availableToWithdraw': '1.0'}
+                    ]
+                }]
+            }
+        }
+
+    def tearDown(self):
+        test_name = self.id().split('.')[-1]
+        print(f"{GREEN}{CHECK_MARK} {test_name} - PASSED{RESET}")
+
+    def test_price_hub_batches_ticker_requests(self):
+        """Price hub test: Verifies that all symbols are served from one batched get_tickers call"""
+        hub = PriceHub()
+        hub._client = MagicMock()
+        hub._client.get_tickers.return_value = {
+            'result': {'list': [
+                {'symbol': 'BTCUSDT', 'lastPrice': '60000.0', 'volume24h': '10'},
+                {'symbol': 'ETHUSDT', 'lastPrice': '3000.0', 'volume24h': '20'},
+            ]}
+        }
+
+        self.assertEqual(hub.get_price("BTCUSDT"), 60000.0)
+        self.assertEqual(hub.get_price("ETHUSDT"), 3000.0)
+        hub._client.get_tickers.assert_called_once_with(category="spot")
+
+    def test_trigger_book_fires_only_crossed_levels(self):
+        """Trigger book test: Verifies that a price update pops only the crossed SL/TP levels"""
+        book = TriggerBook("BTCUSDT")
+        low, mid, high = MagicMock(), MagicMock(), MagicMock()
+        book.index(low, 90.0, 110.0)
+        book.index(mid, 95.0, 105.0)
+        book.index(high, None, 120.0)
+
+        self.assertEqual(book.evaluate(100.0), [])
+        self.assertEqual(book.evaluate(94.0), [(mid, 'stop_loss')])
+        self.assertEqual(book.evaluate(115.0), [(low, 'take_profit')])
+        self.assertEqual(len(book), 1)
+
+        book.index(high, None, 130.0)
+        self.assertEqual(book.evaluate(125.0), [])
+
+    @patch('bot.send_telegram_message')
+    @patch('bot.HTTP')
+    def test_trigger_alert_and_manual_order_take_turns(self, mock_http, mock_send):
+        """Bot serialization test: Verifies that a SL/TP sell, an alert and a manual order never trade one bot at once"""
+        trader = Traderbot(id_t="turns", mode="Simulation")
+        active, overlaps = [0], []
+
+        def execute(command):
+            active[0] += 1
+            overlaps.append(active[0])
+            time.sleep(0.05)
+            trader._order_counter = trader._order_counter + 1
+            active[0] -= 1
+            return 0
+
+        with patch.object(trader, 'Execute_Orders', side_effect=execute):
+            workers = [threading.Thread(target=trader.on_trigger, args=('stop_loss',)),
+                       threading.Thread(target=trader._handle_signal, args=("k1", "Buy")),
+                       threading.Thread(target=trader.manual_trigger, args=("Sell",))]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        self.assertEqual(max(overlaps), 1)
+        self.assertEqual(trader.get_order_counter(), len(overlaps))
+
+    @patch('bot.HTTP')
+    def test_runtime_keeps_thread_count_flat(self, mock_http):
+        """Bot runtime test: Verifies that many bots run as coroutines without one thread per bot"""
+        runtime = BotRuntime(max_workers=4)
+        threads_before = threading.active_count()
+        with patch('bot.bot_runtime', runtime), \
+             patch('bot.send_telegram_message'), \
+             patch('bot.MailgunEventPoller.ensure_running'), \
+             patch.object(Traderbot, 'Monitor_SL_TP'), \
+             patch.object(Traderbot, '_process_storage_item') as mock_process:
+            bots = [Traderbot(id_t=f"bot{i}", mode="Simulation") for i in range(200)]
+            for trader in bots:
+                trader.start()
+            time.sleep(0.5)
+            for trader in bots:
+                trader.deliver_signal("key", "Buy")
+            time.sleep(0.5)
+            self.assertEqual(mock_process.call_count, 200)
+            self.assertLessEqual(threading.active_count(), threads_before + 5)
+            for trader in bots:
+                trader.stop()
+
+    @patch('bot.HTTP')
+    def test_telegram_handlers_keep_blocking_calls_off_the_loop(self, mock_http):
+        """Handler offloading test: Verifies that /balance, /show_bot_status and manual orders run on the worker pool"""
+        trader = Traderbot(id_t="manual", mode="Simulation")
+        registry = BotRegistry()
+        registry.add(trader)
+        update = MagicMock()
+        update.message.chat_id = 7
+        update.callback_query.message.chat_id = 7
+        update.callback_query.data = "trigger_signal_Green"
+        update.callback_query.answer = AsyncMock()
+        update.callback_query.edit_message_text = AsyncMock()
+        threads = []
+        record = lambda *args: threads.append(threading.current_thread())
+
+        async def handle_commands():
+            await bot.balance(update, None)
+            await bot.show_bot_status(update, None)
+            await bot.handle_trigger_signal_selection(update, None)
+            return threading.current_thread()
+
+        with patch('bot.user_manager', MagicMock(users={"7"}), create=True), \
+             patch('bot.bot_registry', registry), patch('bot.selected_bot_name', "manual"), \
+             patch('bot.balance_func', side_effect=record), patch('bot.show_bot_status_func', side_effect=record), \
+             patch.object(trader, 'manual_trigger', side_effect=record):
+            loop_thread = asyncio.run(handle_commands())
+
+        self.assertEqual(len(threads), 3)
+        self.assertNotIn(loop_thread, threads)
+
+    def _post_webhook(self, port, payload):
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{port}/mailgun", data=json.dumps(payload).encode(),
+            headers={'Content-Type': 'application/json'}, method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def test_webhook_receiver_routes_signed_alerts(self):
+        """Webhook receiver test: Verifies that signed Mailgun webhooks are pushed to the matching bot only"""
+        receiver = MailgunWebhookReceiver("signing-key", host="127.0.0.1", port=0)
+        receiver.start()
+        listener = MagicMock(listener_email="alerts", symbol="BTCUSDT")
+        listener.name = "listener"
+        other = MagicMock(listener_email="other", symbol="BTCUSDT")
+        other.name = "other"
+        registry = BotRegistry()
+        registry.add(listener)
+        registry.add(other)
+        timestamp, token = str(int(time.time())), "token123"
+        signature = hmac.new(b"signing-key", f"{timestamp}{token}".encode(), hashlib.sha256).hexdigest()
+        payload = {
+            'signature': {'timestamp': timestamp, 'token': token, 'signature': signature},
+            'event-data': {'event': 'stored', 'recipient': 'alerts@example.com', 'storage': {'key': 'key1'}},
+        }
+        try:
+            with patch('bot.bot_registry', registry), \
+                 patch('bot.get_signal_index', return_value=SignalIndex(":memory:")):
+                self.assertEqual(self._post_webhook(receiver.port, payload), 200)
+                payload['signature']['signature'] = "forged"
+                self.assertEqual(self._post_webhook(receiver.port, payload), 406)
+        finally:
+            receiver.stop()
+
+        listener.deliver_signal.assert_called_once_with('key1', None, meta=None, keys=(None, 'key1'))
+        other.deliver_signal.assert_not_called()
+
+    def test_event_poller_pages_and_fans_out_every_event(self):
+        """Event poller test: Verifies that one poller pages through a burst, catches late-indexed events and delivers each once"""
+        with patch('bot.get_signal_index', return_value=SignalIndex(":memory:")):
+            poller = MailgunEventPoller("example.com", page_limit=2)
+        registry = BotRegistry()
+        for name in ("first", "second"):
+            bot_mock = MagicMock(listener_email="alerts", symbol="BTCUSDT", domain_name="example.com")
+            bot_mock.name = name
+            registry.add(bot_mock)
+        first, second = registry.by_listener("alerts")
+        pages = [
+            {'items': [{'id': 'e1', 'recipient': 'alerts@example.com', 'storage': {'key': 'k1'}},
+                       {'id': 'e2', 'recipient': 'alerts@example.com', 'storage': {'key': 'k2'}}],
+             'paging': {'next': 'https://mailgun/page2'}},
+            # A short page ends the poll without asking for an empty one
+            {'items': [{'id': 'e3', 'recipient': 'other@example.com', 'storage': {'key': 'k3'}}],
+             'paging': {'next': 'https://mailgun/page3'}},
+            # Trailing window: e0 was indexed late, behind the cursor
+            {'items': [{'id': 'e0', 'recipient': 'alerts@example.com', 'storage': {'key': 'k0'}},
+                       {'id': 'e1', 'recipient': 'alerts@example.com', 'storage': {'key': 'k1'}}]},
+        ]
+        with patch('bot.bot_registry', registry), \
+             patch.object(poller, '_fetch_email_events', side_effect=pages) as mock_fetch:
+            self.assertEqual(asyncio.run(poller.poll_once()), 3)
+
+        self.assertEqual(mock_fetch.call_count, 3)
+        self.assertAlmostEqual(mock_fetch.call_args.args[1]['begin'], time.time() - poller.trailing_window, delta=5)
+        self.assertEqual(poller._next_url, 'https://mailgun/page3')
+        for bot_mock in (first, second):
+            self.assertEqual([c.args for c in bot_mock.deliver_signal.call_args_list], [('k1',), ('k2',), ('k0',)])
+        # Nobody listens on "other", and the alerts stay unprocessed until both bots handled them
+        self.assertFalse(poller._index.is_processed("other", "k3"))
+        with patch('bot.bot_registry', registry):
+            self.assertEqual(poller._dispatch(pages[0]['items'][0]), 0)
+        self.assertEqual(first.deliver_signal.call_count, 3)
+        poller._index.release("alerts", "e1", "k1")
+        self.assertFalse(poller._index.is_processed("alerts", "k1"))
+        poller._index.release("alerts", "e1", "k1")
+        self.assertTrue(poller._index.is_processed("alerts", "k1"))
+        self.assertTrue(poller._index.is_processed("alerts", "e1"))
+
+        # Idle, a poll between two trailing re-reads is a single call
+        idle_page = {'items': [], 'paging': {'next': 'https://mailgun/page3'}}
+        with patch('bot.bot_registry', registry), \
+             patch.object(poller, '_fetch_email_events', return_value=idle_page) as mock_fetch:
+            self.assertEqual(asyncio.run(poller.poll_once(trailing=False)), 0)
+        mock_fetch.assert_called_once_with('https://mailgun/page3', None)
+
+    @patch('bot._fetch_message_body', return_value="Buy BTCUSDT")
+    def test_message_body_fetched_once_per_storage_key(self, mock_fetch):
+        """Message cache test: Verifies that a stored message body is downloaded only once"""
+        with patch('bot.message_cache', MessageCache(maxsize=2)) as cache:
+            for _ in range(5):
+                self.assertEqual(bot.getmessagedata("key1"), "Buy BTCUSDT")
+
+        mock_fetch.assert_called_once_with("key1")
+        self.assertEqual(cache.stats(), {"size": 1, "hits": 4, "misses": 1})
+
+        # Bots asking for a missing body at the same time share one download
+        def slow_fetch(storage_key):
+            time.sleep(0.05)
+            return "Sell BTCUSDT"
+
+        async def twenty_bots():
+            return await asyncio.gather(*(bot.load_message_body("key2") for _ in range(20)))
+        with patch('bot.message_cache', MessageCache()), \
+             patch('bot._fetch_message_body', side_effect=slow_fetch) as mock_slow_fetch:
+            self.assertEqual(asyncio.run(twenty_bots()), ["Sell BTCUSDT"] * 20)
+            self.assertIn("key2", bot.message_cache)
+        mock_slow_fetch.assert_called_once_with("key2")
+
+        # The disk tier is written through a tmp file and pruned to max_files bodies
+        with tempfile.TemporaryDirectory() as directory:
+            disk = MessageCache(maxsize=2, directory=directory, max_files=3, prune_every=5)
+            for i in range(5):
+                disk.put(f"key{i}", f"Buy {i}")
+                os.utime(disk._path(f"key{i}"), (time.time() - 100 + i,) * 2)
+            self.assertEqual(len(os.listdir(directory)), 3)
+            reloaded = MessageCache(directory=directory)
+            self.assertEqual(reloaded.get("key4"), "Buy 4")
+            self.assertIsNone(reloaded.get("key0"))
+
+    def test_signal_index_survives_restart(self):
+        """Signal index test: Verifies that handled alerts and the poller cursor are reloaded after a restart"""
+        import tempfile
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "signals.db")
+            index = SignalIndex(path)
+            index.mark_processed("alerts", "event1", "key1")
+            index.save_cursor("example.com", "https://mailgun/next", 123.0)
+
+            reloaded = SignalIndex(path)
+            self.assertTrue(reloaded.is_processed("alerts", "key1"))
+            self.assertTrue(reloaded.is_processed("alerts", "event1"))
+            self.assertFalse(reloaded.is_processed("other", "key1"))
+            self.assertEqual(reloaded.get_cursor("example.com"), ("https://mailgun/next", 123.0))
+
+    def test_http_transport_reuses_connections(self):
+        """HTTP transport test: Verifies that calls to one host share a keep-alive session and are measured"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class OkHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            connections = set()
+
+            def do_GET(self):
+                OkHandler.connections.add(self.client_address)
+                self.send_response(200)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b"ok")
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), OkHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        transport = HttpTransport()
+        url = f"http://127.0.0.1:{server.server_address[1]}/ping"
+        try:
+            for _ in range(5):
+                self.assertEqual(transport.get(url).status_code, 200)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        host_stats = transport.stats()[f"127.0.0.1:{server.server_address[1]}"]
+        self.assertEqual(host_stats["calls"], 5)
+        self.assertEqual(host_stats["errors"], 0)
+        self.assertEqual(len(OkHandler.connections), 1)
+
+    @patch('bot.HTTP')
+    def test_bybit_client_shared_per_api_key(self, mock_http):
+        """Shared client test: Verifies that every bot of one API key reuses the same pybit client"""
+        with patch.dict('bot._bybit_clients', clear=True):
+            first = Traderbot(id_t="a", mode="Simulation")
+            second = Traderbot(id_t="b", mode="Simulation")
+            self.assertIs(first._cl, second._cl)
+            mock_http.assert_called_once()
+
+    def test_telegram_dispatcher_coalesces_and_retries(self):
+        """Telegram dispatcher test: Verifies that bursts are merged into one send and 429s are retried"""
+        dispatcher = TelegramDispatcher(coalesce_window=0.2, per_chat_interval=0)
+        too_many = MagicMock(status_code=429)
+        too_many.json.return_value = {'ok': False, 'parameters': {'retry_after': 0}}
+        ok = MagicMock(status_code=200)
+        with patch('bot.http_transport') as mock_transport:
+            mock_transport.post.side_effect = [too_many, ok]
+            started = time.time()
+            for i in range(3):
+                self.assertTrue(dispatcher.submit(42, f"message {i}"))
+            self.assertLess(time.time() - started, 0.1)
+            time.sleep(0.6)
+
+        self.assertEqual(mock_transport.post.call_count, 2)
+        payload = mock_transport.post.call_args.kwargs['json']
+        self.assertEqual(payload['chat_id'], 42)
+        self.assertEqual(payload['text'], "message 0\nmessage 1\nmessage 2")
+        self.assertEqual(dispatcher.sent, 1)
+
+        # A parse error in one merged message does not drop the others
+        bad_request = MagicMock(status_code=400)
+        with patch('bot.http_transport') as mock_transport:
+            mock_transport.post.side_effect = [bad_request, ok, bad_request]
+            dispatcher._deliver(42, ["fine", "broken *markdown"], "Markdown")
+        self.assertEqual([c.kwargs['json']['text'] for c in mock_transport.post.call_args_list],
+                         ["fine\nbroken *markdown", "fine", "broken *markdown"])
+        self.assertEqual(dispatcher.sent, 2)
+
+    def test_token_bucket_is_shared_across_threads(self):
+        """Token bucket test: Verifies burst capacity, async refill waits, per-endpoint buckets and Bybit header adjustment"""
+        bucket = TokenBucket("test", rate=20, capacity=2)
+        results = []
+        workers = [threading.Thread(target=lambda: results.append(bucket.try_acquire())) for _ in range(6)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        # Pool threads never sleep: the burst is served, the rest is told when to come back
+        self.assertEqual(results.count(0.0), 2)
+        self.assertEqual(bucket.stats()["rejected"], 4)
+
+        async def burst():
+            return await asyncio.gather(*(bucket.acquire_async() for _ in range(4)))
+        started = time.time()
+        asyncio.run(burst())
+        self.assertGreaterEqual(time.time() - started, 0.15)
+        self.assertEqual(bucket.stats()["acquired"], 6)
+
+        self.assertIs(bot.rate_limiter_for("https://api.bybit.com/v5/order/create"), bot.rate_limiter_for("/v5/order/create"))
+        self.assertIsNot(bot.rate_limiter_for("/v5/order/create"), bot.rate_limiter_for("/v5/order/history"))
+        self.assertIs(bot.rate_limiter_for("/v5/market/tickers"), bot.rate_limiters["bybit_market"])
+
+        reset_at = str(int((time.time() + 0.3) * 1000))
+        bucket.update_from_headers({'X-Bapi-Limit': '10', 'X-Bapi-Limit-Status': '0',
+                                    'X-Bapi-Limit-Reset-Timestamp': reset_at})
+        self.assertEqual(bucket.rate, 8.0)
+        self.assertGreater(bucket.try_acquire(), 0.2)
+        with patch('bot.rate_limiter_for', return_value=bucket):
+            with self.assertRaises(bot.RateLimitExceeded):
+                bot.RateLimitedAdapter().send(MagicMock(url="https://api.bybit.com/v5/order/create"))
+            # A token reserved on the loop lets the request through
+            with patch('requests.adapters.HTTPAdapter.send', return_value=MagicMock(headers={})) as send:
+                bot.run_with_tokens([bucket], bot.RateLimitedAdapter().send, MagicMock())
+            send.assert_called_once()
+
+    def test_fx_rates_cached_and_persisted(self):
+        """FX rate test: Verifies that conversions reuse one cached table, also after a restart"""
+        import tempfile
+        response = MagicMock(status_code=200)
+        response.json.return_value = {'conversion_rates': {'RUB': 90.0, 'EUR': 0.9}}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "fx.json")
+            with patch('bot.http_transport') as mock_transport:
+                mock_transport.get.return_value = response
+                service = FxRateService(cache_path=path)
+                self.assertEqual(service.rate("RUB"), 90.0)
+                self.assertEqual(service.rate("EUR"), 0.9)
+                mock_transport.get.assert_called_once()
+
+            with patch('bot.http_transport') as mock_transport:
+                restarted = FxRateService(cache_path=path)
+                self.assertEqual(restarted.rate("RUB"), 90.0)
+                mock_transport.get.assert_not_called()
+
+        # With a cold cache and the API down, one failed call is made per backoff window
+        with patch('bot.http_transport') as mock_transport:
+            mock_transport.get.side_effect = requests.exceptions.ConnectionError("down")
+            cold = FxRateService(failure_backoff=60)
+            for _ in range(3):
+                self.assertEqual(cold.rate("RUB"), FxRateService.fallback_rates["RUB"])
+            mock_transport.get.assert_called_once()
+            self.assertEqual(mock_transport.get.call_args.kwargs['timeout'], cold.cold_timeout)
+
+    def test_instrument_cache_quantizes_sell_quantity(self):
+        """Instrument cache test: Verifies exact Decimal rounding to the exchange step and minimum checks"""
+        client = MagicMock()
+        client.get_instruments_info.return_value = {'result': {'list': [{
+            'symbol': 'BTCUSDT',
+            'lotSizeFilter': {'basePrecision': '0.000001', 'minOrderQty': '0.000048', 'minOrderAmt': '1'},
+            'priceFilter': {'tickSize': '0.01'},
+        }], 'nextPageCursor': ''}}
+        cache = InstrumentCache()
+        with patch('bot.get_bybit_client', return_value=client):
+            self.assertEqual(cache.quantize_qty("BTCUSDT", 0.0012349999), "0.001234")
+            self.assertEqual(cache.quantize_qty("BTCUSDT", 0.1 + 0.2), "0.300000")
+            self.assertIsNone(cache.quantize_qty("BTCUSDT", 0.00004))
+            self.assertIsNone(cache.quantize_qty("BTCUSDT", 0.0001, price=5000))
+            self.assertEqual(cache.quantize_price("BTCUSDT", 60000.129), "60000.12")
+
+            # A dust balance fails the sell instead of reaching place_order(qty=None)
+            manager = bot.OrderManager(client, "BTCUSDT", 0.001, simulation_flag=0)
+            with patch('bot.instrument_cache', cache), patch('bot.get_assets', return_value=0.00001):
+                success, message = manager.execute_sell_order("dust", "Real", 100.0)
+        self.assertFalse(success)
+        self.assertIn("minimum order size", message)
+        client.place_order.assert_not_called()
+        client.get_instruments_info.assert_called_once_with(category="spot")
+
+    def test_wallet_snapshot_shared_until_invalidated(self):
+        """Wallet snapshot test: Verifies that concurrent balance reads share one wallet call until a fill"""
+        def slow_wallet(**kwargs):
+            time.sleep(0.1)
+            return self.mock_response
+
+        client = MagicMock()
+        client.get_wallet_balance.side_effect = slow_wallet
+        snapshot = WalletSnapshot(client)
+        readers = [threading.Thread(target=snapshot.get_balance, args=("BTC",)) for _ in range(10)]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        self.assertEqual(snapshot.get_balances("USDT", "BTC", "ETH"), {"USDT": 100.0, "BTC": 1.0, "ETH": 0.0})
+        self.assertEqual(client.get_wallet_balance.call_count, 1)
+
+        snapshot.invalidate()
+        self.assertEqual(snapshot.get_balance("USDT"), 100.0)
+        self.assertEqual(client.get_wallet_balance.call_count, 2)
+
+        # A fill landing while the balances are fetched is not lost
+        def wallet_with_fill(**kwargs):
+            snapshot.invalidate()
+            return self.mock_response
+
+        client.get_wallet_balance.side_effect = wallet_with_fill
+        snapshot.invalidate()
+        snapshot.get_balance("USDT")
+        snapshot.get_balance("USDT")
+        self.assertEqual(client.get_wallet_balance.call_count, 4)
+
+    @patch('bot.send_telegram_message')
+    @patch('bot.HTTP')
+    def test_sell_uses_prepared_quantity_and_fill_price(self, mock_http, mock_send):
+        """Order hot path test: Verifies that a Sell is a single place_order call sized and priced from the buy's fill"""
+        client = MagicMock()
+        mock_http.return_value = client
+        client.place_order.return_value = {'retMsg': 'OK', 'result': {'orderId': '42'}}
+        client.get_order_history.return_value = {'result': {'list': [
+            {'avgPrice': '101.5', 'cumExecQty': '0.00123', 'cumExecFee': '0.00002'}]}}
+        cache = MagicMock()
+        cache.quantize_qty.side_effect = lambda symbol, qty, price=None: bot.quantize_down(qty, bot.Decimal('0.0001'))
+        with patch.dict('bot._bybit_clients', clear=True), patch.dict('bot._wallet_snapshots', clear=True), \
+             patch('bot.instrument_cache', cache), patch('bot.price_hub') as hub, \
+             patch('bot.bot_runtime.spawn', side_effect=asyncio.run):
+            hub.get_price.return_value = 101.0
+            trader = Traderbot(id_t="hot", symbol="BTCUSDT", amount=0.001, mode="Real")
+            self.assertEqual(trader.Execute_Orders("Buy"), 0)
+            self.assertEqual(trader.get_last_price(), 101.5)
+
+            # The fill is booked at the last traded price without waiting on the order history
+            client.get_order_history.return_value = {'result': {'list': []}}
+            with patch('bot.bot_runtime.spawn', side_effect=lambda coro: coro.close()):
+                self.assertEqual(trader.Execute_Orders("Sell"), 0)
+
+        client.get_wallet_balance.assert_not_called()
+        client.get_order_history.assert_called_once()
+        self.assertEqual(client.place_order.call_args.kwargs['qty'], "0.0012")
+        # Booked from the hub snapshot, reported at the exchange's average fill price
+        self.assertNotIn(1.0, [c.kwargs.get('max_age') for c in hub.get_price.call_args_list])
+        messages = [c.args[0] for c in mock_send.call_args_list]
+        self.assertEqual(len(messages), 1)
+        self.assertIn("Executed `Buy` BTCUSDT at price *101.5*", messages[0])
+        self.assertEqual(trader.get_last_price(), 101.0)
+        self.assertEqual(trader.get_wins(), 0)
+        self.assertEqual(trader.get_losses(), 1)
+
+    def test_signal_tracer_records_stages(self):
+        """Latency tracing test: Verifies that spans are recorded per signal and are no-ops when tracing is off"""
+        tracer = SignalTracer(enabled=True)
+        tracer.start("bot1", "key1", {'received_at': time.time() - 0.01, 'fetch_ms': 5.0})
+        with tracer.span('execute_order'):
+            time.sleep(0.01)
+        record = tracer.finish()
+        self.assertEqual((record['bot'], record['storage_key']), ("bot1", "key1"))
+        self.assertEqual(record['stages']['fetch_events'], 5.0)
+        self.assertGreaterEqual(record['stages']['queued'], 10)
+        self.assertGreaterEqual(record['stages']['execute_order'], 10)
+        self.assertEqual(tracer.percentiles()['execute_order']['count'], 1)
+
+        off = SignalTracer()
+        self.assertIsNone(off.start("bot1", "key2"))
+        self.assertIs(off.span('execute_order'), bot._NO_SPAN)
+        self.assertIsNone(off.finish())
+
+    def test_fake_servers_serve_configured_endpoints(self):
+        """Benchmark harness test: Verifies that the bot reaches the fake Mailgun and Bybit servers through its base URL settings"""
+        mailgun = FakeMailgun("bench.example.com").start()
+        bybit = FakeBybit(prices={"BTCUSDT": 100.0}).start()
+        try:
+            with patch('bot.MAILGUN_API_BASE', mailgun.api_base), patch('bot.domain_name', "bench.example.com"), \
+                 patch('bot.BYBIT_ENDPOINT', bybit.base_url), patch.dict('bot._bybit_clients', clear=True):
+                storage_key = mailgun.publish("listener", "Buy BTCUSDT")
+                self.assertEqual(bot._fetch_message_body(storage_key), "Buy BTCUSDT")
+                client = bot.get_bybit_client("key", "secret")
+                self.assertEqual(client.get_tickers(category="spot")['result']['list'][0]['lastPrice'], "100.0")
+                order_id = client.place_order(category="spot", symbol="BTCUSDT", side="Buy", orderType="Market", qty="0.01")['result']['orderId']
+                self.assertEqual(client.get_order_history(category="spot", orderId=order_id)['result']['list'][0]['avgPrice'], "100.0")
+            self.assertEqual(mailgun.call_counts(), {"messages": 1})
+            self.assertEqual(bybit.call_counts(), {"get_tickers": 1, "place_order": 1, "get_order_history": 1})
+        finally:
+            mailgun.stop()
+            bybit.stop()
+
+    @patch('bot.HTTP')
+    def test_list_signals_waits_for_mailgun_tokens(self, mock_http):
+        """Interactive rate limit test: Verifies that /list_signals waits for tokens instead of failing on an empty bucket"""
+        mailgun = FakeMailgun("bench.example.com").start()
+        buckets = {"mailgun_events": TokenBucket("mailgun_events", rate=20, capacity=1),
+                   "mailgun_storage": TokenBucket("mailgun_storage", rate=20, capacity=2)}
+        try:
+            with patch('bot.MAILGUN_API_BASE', mailgun.api_base), patch('bot.domain_name', "bench.example.com"), \
+                 patch.dict('bot.rate_limiters', buckets), patch('bot.message_cache', MessageCache()):
+                for i in range(12):
+                    mailgun.publish("listener", f"Buy {i}")
+                buckets["mailgun_events"].try_acquire()
+                trader = Traderbot(id_t="lister", mode="Simulation", listener_email="listener")
+                commands = asyncio.run(trader.listlast_commands())
+        finally:
+            mailgun.stop()
+
+        self.assertEqual([command.split()[:2] for command in commands], [["Buy", str(i)] for i in range(11, -1, -1)])
+        self.assertEqual(mailgun.call_counts(), {"events": 1, "messages": 12})
+        self.assertEqual(buckets["mailgun_events"].stats()["waited"], 1)
+        self.assertGreater(buckets["mailgun_storage"].stats()["waited"], 0)
+
+    def test_scale_test_period_drift(self):
+        """Scale test: Verifies that loop drift is measured per poll cycle, not per page of a cycle"""
+        self.assertEqual(scale_test.period_stats([0.0, 0.05, 1.0, 1.02, 2.5], 1.0), (1215.0, 480.0))
+        self.assertEqual(scale_test.period_stats([0.0], 1.0), (None, None))
+        self.assertEqual(scale_test.quantile([3, 1, 2], 0.5), 2)
+
+    @patch('bot.send_telegram_message')
+    @patch('bot.HTTP')
+    def test_backtester_matches_simulation_bot(self, mock_http, mock_send):
+        """Backtest test: Verifies that the backtester reports the same orders, wins, losses and P/L as a Simulation bot"""
+        candles = {
+            "time":  [0, 60, 120, 180, 240, 300, 360, 420],
+            "open":  [100, 100, 102, 101, 99, 96, 97, 98],
+            "high":  [101, 103, 104, 102, 99.5, 97, 99, 109],
+            "low":   [99, 99, 100, 99, 94, 95.5, 96, 98],
+            "close": [100, 102, 101, 100, 96, 97, 98, 108],
+        }
+        signals = ([70, 130, 190, 310, 370], ["Buy", "Sell", "Buy", "Sell", "Buy"])
+        result = backtest.Backtester(candles, take_profit_percent=10, stop_loss_percent=5, amount=0.001).run(*signals)
+        self.assertEqual(list(result['trades']['reason']),
+                         ["take_profit", "signal", "signal", "stop_loss", "signal", "take_profit"])
+        # Exits found through small doubling windows are the same ones
+        windowed = backtest.Backtester(candles, take_profit_percent=10, stop_loss_percent=5, amount=0.001)
+        windowed.first_window = 1
+        windowed_result = windowed.run(*signals)
+        for column in ("time", "side", "price", "reason"):
+            self.assertEqual(list(windowed_result['trades'][column]), list(result['trades'][column]))
+
+        # The same alerts and level crossings, fed to a live bot
+        trader = Traderbot(id_t="backtest", symbol="BTCUSDT", tp=10, sl=5, amount=0.001, mode="Simulation")
+        with patch('bot.price_hub') as hub:
+            hub.get_price.return_value = 100.0  # levels start around _last_price = 1.0
+            trader.on_trigger('take_profit')
+            trader._handle_signal("k1", "Buy")
+            hub.get_price.return_value = 101.0
+            trader._handle_signal("k2", "Sell")
+            hub.get_price.return_value = 100.0
+            trader._handle_signal("k3", "Buy")
+            hub.get_price.return_value = trader.market_monitor.stop_loss_price(100.0, 5)
+            trader.on_trigger('stop_loss')
+            trader._handle_signal("k4", "Sell")
+            hub.get_price.return_value = 98.0
+            trader._handle_signal("k5", "Buy")
+            hub.get_price.return_value = trader.market_monitor.take_profit_price(98.0, 10)
+            trader.on_trigger('take_profit')
+
+        self.assertEqual((result['orders'], result['wins'], result['losses']),
+                         (trader.get_order_counter(), trader.get_wins(), trader.get_losses()))
+        self.assertAlmostEqual(result['accumulated_percentage_change'], trader.get_accumulated_percentage_change())
+        realized_pl = trader.amount * ((trader.get_accumulated_percentage_change() / 100) - (trader.get_order_counter() * bot.TRADING_FEE))
+        self.assertAlmostEqual(result['realized_pl'], realized_pl)
+
+        # Signals are read with the live command_filter rules, whole words only
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "signals.csv")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("time,command\n70,Buy BTC\n130,buyback news\n190,reselling\n250,SELL now\n")
+            times, commands = backtest.load_signals(path)
+        self.assertEqual(list(times), [70.0, 250.0])
+        self.assertEqual(commands, [bot.command_filter("Buy BTC"), bot.command_filter("SELL now")])
+
+    def test_incremental_indicators_match_batch_formulas(self):
+        """Rolling indicators test: Verifies that O(1) indicator updates match the batch kline formulas exactly"""
+        rng = random.Random(7)
+        candles, price = [], 100.0
+        for i in range(200):
+            price = round(price * (1 + rng.uniform(-0.02, 0.02)), 2)
+            candles.append([i * 60000, price, round(price * 1.01, 2), round(price * 0.99, 2), round(price * (1 + rng.uniform(-0.01, 0.01)), 2)])
+        period = 14
+        indicators = KlineIndicators(period)
+        for i, candle in enumerate(candles):
+            # the open candle is revised before it closes, like repeated get_kline calls
+            indicators.update(candle[0], candle[1], candle[2], candle[3], candle[1])
+            indicators.update(*candle)
+            window = candles[max(0, i - period + 1):i + 1][::-1]  # newest first, like Bybit
+            closes = [c[4] for c in window]
+            values = indicators.snapshot()
+            self.assertEqual(values['sma'], sum(closes) / len(closes))
+            self.assertEqual(values['head_sma'], sum(closes[-5:]) / 5 if len(closes) >= 5 else sum(closes) / len(closes))
+            self.assertEqual(values['high'], max(c[2] for c in window))
+            self.assertEqual(values['low'], min(c[3] for c in window))
+
+        seen = candles[:]
+        closes = [c[4] for c in seen]
+        changes = [b - a for a, b in zip(closes, closes[1:])]
+        avg_gain = sum(max(c, 0) for c in changes[:period]) / period
+        avg_loss = sum(max(-c, 0) for c in changes[:period]) / period
+        for change in changes[period:]:
+            avg_gain = (avg_gain * (period - 1) + max(change, 0)) / period
+            avg_loss = (avg_loss * (period - 1) + max(-change, 0)) / period
+        self.assertEqual(indicators.snapshot()['rsi'], 100 - 100 / (1 + avg_gain / avg_loss))
+        ranges = [seen[0][2] - seen[0][3]] + [max(c[2] - c[3], abs(c[2] - p[4]), abs(c[3] - p[4])) for p, c in zip(seen, seen[1:])]
+        atr = sum(ranges[:period]) / period
+        for true_range in ranges[period:]:
+            atr = (atr * (period - 1) + true_range) / period
+        self.assertEqual(indicators.snapshot()['atr'], atr)
+        ema = sum(closes[:period]) / period
+        for close in closes[period:]:
+            ema = 2 / (period + 1) * close + (1 - 2 / (period + 1)) * ema
+        self.assertEqual(indicators.snapshot()['ema'], ema)
+
+    def test_market_analyzer_fetches_only_new_klines(self):
+        """Rolling indicators test: Verifies that repeated trend analysis only downloads the candles it has not seen"""
+        now = int(time.time() * 1000) // 60000 * 60000
+        rows = [[str(now - i * 60000), "1", str(110 - i), str(90 - i), str(100 - i)] for i in range(14)]
+        client = MagicMock()
+        client.get_kline.return_value = {'result': {'list': rows}}
+        with patch('bot.indicator_engine', bot.IndicatorEngine()):
+            analyzer = MarketAnalyzer(client, "BTCUSDT")
+            first = analyzer.analyze_market_trends(timeframe="1", lookback_periods=14)
+            closes = [float(r[4]) for r in rows]
+            self.assertAlmostEqual(first['long_ma'], sum(closes) / len(closes))
+            self.assertAlmostEqual(first['short_ma'], sum(closes[-5:]) / 5)
+            client.get_kline.return_value = {'result': {'list': rows[:1]}}
+            analyzer.analyze_market_trends(timeframe="1", lookback_periods=14)
+        self.assertEqual([c.kwargs['limit'] for c in client.get_kline.call_args_list], [14, 1])
+
+    def test_kline_store_backfills_once_and_serves_zero_copy_views(self):
+        """Kline store test: Verifies paginated backfill, append-only catch-up after a restart and zero-copy reads"""
+        now = int(time.time() * 1000) // 60000 * 60000
+
+        def get_kline(category, symbol, interval, limit, start=None, end=None):
+            starts = range(start, min(end, now) + 1, 60000)
+            return {'result': {'list': [[str(t), "1", "2", "0.5", str(t / 60000), "10", "10"] for t in reversed(starts)]}}
+
+        client = MagicMock()
+        client.get_kline.side_effect = get_kline
+        with tempfile.TemporaryDirectory() as directory:
+            store = KlineStore(directory, "BTCUSDT", "1", capacity=16)
+            store.page_limit = 50
+            store.sync(client, since=now - 119 * 60000)
+            self.assertEqual(len(store), 120)
+            self.assertEqual(client.get_kline.call_count, 3)
+            self.assertEqual(list(store.column("time")), [float(now - i * 60000) for i in range(119, -1, -1)])
+
+            closes = backtest.candles_from_store(store)["close"]
+            self.assertEqual(closes[-1], now / 60000)
+            self.assertFalse(closes.flags['OWNDATA'])
+
+            client.get_kline.reset_mock()
+            reopened = KlineStore(directory, "BTCUSDT", "1")
+            reopened.page_limit = 50
+            reopened.sync(client)
+            self.assertEqual(len(reopened), 120)
+            self.assertEqual(client.get_kline.call_args.kwargs['start'], now)
+            self.assertEqual(list(reopened.tail(2)["time"]), [float(now - 60000), float(now)])
+
+    def test_market_scanner_returns_columnar_table(self):
+        """Market scan test: Verifies that a watchlist scan matches MarketAnalyzer per symbol and reports failed downloads"""
+        now = int(time.time() * 1000) // 60000 * 60000
+
+        def get_kline(category, symbol, interval, limit):
+            if symbol == "BADUSDT":
+                raise Exception("Not supported symbols")
+            base = {"BTCUSDT": 100, "ETHUSDT": 50}[symbol]
+            return {'result': {'list': [[str(now - i * 60000), "1", str(base + 5 - i), str(base - 5 - i), str(base - (i % 4))]
+                                        for i in range(limit)]}}
+
+        client = MagicMock()
+        client.get_kline.side_effect = get_kline
+        scanner = MarketScanner(client)
+        self.assertEqual(scanner.mp_context.get_start_method(), "spawn")
+        try:
+            table = scanner.scan(["BTCUSDT", "BADUSDT", "ETHUSDT"], indicators=('trend', 'levels'), timeframe="1", lookback_periods=14)
+        finally:
+            scanner.close()
+        self.assertEqual(table['symbol'], ["BTCUSDT", "BADUSDT", "ETHUSDT"])
+        self.assertEqual(table['error'], [None, "Not supported symbols", None])
+        self.assertIsNone(table['trend'][1])
+        with patch('bot.indicator_engine', bot.IndicatorEngine()):
+            expected = MarketAnalyzer(client, "ETHUSDT").analyze_market_trends(timeframe="1", lookback_periods=14)
+        self.assertEqual((table['trend'][2], table['strength'][2], table['long_ma'][2]),
+                         (expected['trend'], expected['strength'], expected['long_ma']))
+        self.assertEqual((table['support'][0], table['resistance'][0]), (100 - 5 - 13, 100 + 5))
+
+        # The same scan with the indicators computed by a spawned process pool
+        scanner = MarketScanner(client, processes=2)
+        try:
+            with patch('bot.ProcessPoolExecutor', partial(ProcessPoolExecutor, initializer=_mock_telegram)):
+                pooled = scanner.scan(["BTCUSDT", "BADUSDT", "ETHUSDT"], indicators=('trend', 'levels'), timeframe="1", lookback_periods=14)
+            self.assertEqual(scanner._pool._mp_context.get_start_method(), "spawn")
+        finally:
+            scanner.close()
+        self.assertEqual(pooled, table)
+
+    def test_bot_registry_indexes_snapshots_and_feed(self):
+        """Bot registry test: Verifies lookups by name, symbol, listener and domain, stable snapshots and change events"""
+        registry = BotRegistry()
+        events = []
+        registry.subscribe(lambda event, bot: events.append((event, bot.name)))
+        bots = []
+        for name, symbol, email in (("a", "BTCUSDT", "alerts"), ("b", "ETHUSDT", "alerts"), ("c", "BTCUSDT", "other")):
+            bot_mock = MagicMock(symbol=symbol, listener_email=email, domain_name=f"{email}.example.com")
+            bot_mock.name = name
+            registry.add(bot_mock)
+            bots.append(bot_mock)
+        with self.assertRaises(ValueError):
+            registry.add(bots[0])
+
+        self.assertIs(registry.get("b"), bots[1])
+        self.assertEqual([b.name for b in registry.by_symbol("BTCUSDT")], ["a", "c"])
+        self.assertEqual([b.name for b in registry.by_listener("alerts")], ["a", "b"])
+        self.assertEqual([b.name for b in registry.by_domain("other.example.com")], ["c"])
+        snapshot = registry.snapshot()
+        self.assertTrue(registry.remove(bots[0]))
+        self.assertFalse(registry.remove(bots[0]))
+        self.assertEqual(len(snapshot), 3)  # readers keep the snapshot they took
+        self.assertEqual(registry.names(), ["b", "c"])
+        self.assertIsNone(registry.get("a"))
+        self.assertEqual([b.name for b in registry.by_symbol("BTCUSDT")], ["c"])
+        self.assertEqual([b.name for b in registry.by_domain("alerts.example.com")], ["b"])
+        self.assertEqual(events, [("added", "a"), ("added", "b"), ("added", "c"), ("removed", "a")])
+
+        # Leaving the registry releases the bot's SL/TP levels and price subscription
+        engine, trader = bot.TriggerEngine(), MagicMock(symbol="BTCUSDT")
+        with patch('bot.price_hub') as hub:
+            engine.arm(trader)
+            engine.arm(trader)
+            engine.on_registry_change('removed', trader)
+        hub.subscribe.assert_called_once_with("BTCUSDT")
+        hub.unsubscribe.assert_called_once_with("BTCUSDT")
+        self.assertFalse(engine.is_armed(trader))
+
+    @patch('bot.HTTP')
+    def test_bot_journal_restores_fleet_after_crash(self, mock_http):
+        """Bot journal test: Verifies that journaled state survives a crash, a torn write and compaction"""
+        directory = tempfile.mkdtemp()
+        trader = Traderbot(id_t="saved", symbol="ETHUSDT", tp=3.0, sl=1.5, amount=0.01, mode="Real", listener_email="eth")
+        trader._last_price, trader._order_counter, trader._wins, trader.paused = 2500.5, 7, 4, True
+        journal = BotJournal(directory, compact_every=4)
+        journal.record("saved", trader.export_state())
+        journal.record("gone", {"name": "gone", "amount": 1.0})
+        journal.record("saved", trader.export_state())  # unchanged, nothing written
+        journal.remove("gone")
+        trader._order_counter = 8
+        journal.record("saved", trader.export_state())
+        journal.flush()
+        self.assertEqual(journal._pending, 0)  # the fourth line triggered a snapshot
+        trader._wins = 5
+        journal.record("saved", trader.export_state())
+        journal.flush()
+        with open(journal.journal_path, "a", encoding="utf-8") as f:
+            f.write('{"seq": 99, "op": "upd')  # crash in the middle of a write
+
+        reloaded = BotJournal(directory)
+        self.assertEqual(list(reloaded.bots()), ["saved"])
+        with patch('bot.get_bot_journal', return_value=reloaded):
+            restored, = bot.restore_bots()
+        self.assertEqual(restored.export_state(), trader.export_state())
+        self.assertEqual((restored.get_order_counter(), restored.get_wins(), restored.paused), (8, 5, True))
+        mock_http.return_value.get_wallet_balance.assert_not_called()
+        reloaded.close()
+        journal.close()
+
+    @patch('bot.HTTP')
+    def test_bot_state_table_backs_traderbot_state(self, mock_http):
+        """Bot state table test: Verifies that bot counters live in shared columns and idle bots hold no task"""
+        table = BotStateTable(capacity=2)
+        rows = [table.allocate() for _ in range(5)]  # grows twice
+        for i, row in enumerate(rows):
+            row.amount, row.order_counter = 0.5 * i, i
+        self.assertFalse(hasattr(rows[0], '__dict__'))
+        self.assertEqual(list(table.column('order_counter')), [0, 1, 2, 3, 4])
+        self.assertEqual(sum(table.column('amount')), 5.0)
+        table.release(rows[1].row)
+        self.assertEqual(table.allocate().row, 1)  # freed rows are reused, zeroed
+        self.assertEqual(table.get(1, 'amount'), 0.0)
+
+        runtime = BotRuntime(max_workers=2)
+        with patch('bot.bot_states', table), patch('bot.bot_runtime', runtime), \
+             patch('bot.send_telegram_message'), patch('bot.MailgunEventPoller.ensure_running'), \
+             patch.object(Traderbot, 'Monitor_SL_TP'), \
+             patch.object(Traderbot, '_process_storage_item') as mock_process:
+            trader = Traderbot(id_t="table", amount=0.25, tp=2.0, mode="Simulation")
+            trader._order_counter += 3
+            self.assertEqual(table.get(trader.state.row, 'order_counter'), 3)
+            self.assertEqual(table.get(trader.state.row, 'take_profit_percent'), 2.0)
+            trader.start()
+            self.assertTrue(wait_for(lambda: "table" in bot.bot_registry and trader._task is None, 5))
+            trader.pause()
+            for key in ("k1", "k2", "k3"):
+                trader.deliver_signal(key)
+            time.sleep(0.1)
+            mock_process.assert_not_called()
+            trader.resume()
+            self.assertTrue(wait_for(lambda: mock_process.call_count and trader._task is None, 5))
+            trader.stop()
+        # Only the newest alert received while paused counts
+        self.assertEqual([c.args[0] for c in mock_process.call_args_list], ["k3"])
+
+    @patch('bot.HTTP')
+    def test_portfolio_computes_fleet_pnl_in_one_pass(self, mock_http):
+        """Portfolio test: Verifies fleet P/L matches /show_bot_status per bot, with one price fetch and one FX lookup"""
+        # Bots of two state tables, so a row index alone would point at another bot
+        tables = [BotStateTable(), BotStateTable()]
+        bots = []
+        for i in range(300):
+            with patch('bot.bot_states', tables[i % 2]):
+                bots.append(Traderbot(id_t=f"p{i}", symbol="ETHUSDT" if i % 3 else "BTCUSDT", amount=0.01 * (i + 1),
+                                      mode="Simulation"))
+        for i, trader in enumerate(bots):
+            trader._last_price = 100.0 + i
+            trader._order_counter, trader._wins, trader._loses = 2 * i, i, i // 2
+            trader._accumulated_percentage_change = i * 0.5 - 20
+            trader._last_command_received = "Buy" if i % 2 else "Sell"
+        prices = {"BTCUSDT": 150.0, "ETHUSDT": 120.0}
+        hub, fx = MagicMock(), MagicMock()
+        hub.get_prices.return_value = prices
+        fx.rate.return_value = 90.0
+        with patch('bot.price_hub', hub), patch('bot.fx_rates', fx):
+            pnl = bot.fleet_pnl(bots)
+            text, pages = bot.format_portfolio(pnl, page=2, page_size=50)
+
+        hub.get_prices.assert_called_once()
+        fx.rate.assert_called_once_with("RUB")
+        for i in (0, 1, 2, 5, 299):
+            trader = bots[i]
+            hub.get_price.return_value = prices[trader.symbol]
+            with patch('bot.price_hub', hub), patch('bot.fx_rates', fx), \
+                 patch('bot.bot_registry', MagicMock(get=MagicMock(return_value=trader))), \
+                 patch('bot.send_telegram_message') as mock_send:
+                bot.show_bot_status_func(trader.name)
+            status = mock_send.call_args.args[0]
+            unrealized = float(re.search(r"Unrealized_PL : (\S+) USD", status).group(1))
+            realized = float(re.search(r"Realized_pl : (\S+) USD", status).group(1))
+            self.assertAlmostEqual(round(pnl['unrealized'][i], 3), unrealized)
+            self.assertAlmostEqual(round(pnl['realized'][i], 3), realized)
+        self.assertTrue(np.isnan(pnl['win_rate'][0]))
+        self.assertAlmostEqual(pnl['win_rate'][3], 3 / 4 * 100)
+        self.assertEqual(pages, 6)
+        self.assertIn("page 2/6", text)
+        self.assertIn("/portfolio 3", text)
+        self.assertEqual(len(text.splitlines()), 6 + 50 + 1)
+
+class CustomTextTestResult(unittest.TextTestResult):
+    def startTest(self, test):
+        super().startTest(test)
+        test_name = test.id().split('.')[-1]
+        test_doc = test._testMethodDoc.split(':')[0] if test._testMethodDoc else test_name
+        print(f"\nRunning: {test_doc}")
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(resultclass=CustomTextTestResult)
+    unittest.main(testRunner=runner)
\ No newline at end of file